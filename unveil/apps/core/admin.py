@@ -1,4 +1,7 @@
-"""Admin configuration for core app."""
+"""Admin configuration for core app.
+
+Imported by `admin.autodiscover()` when the URLconf loads (see unveil/urls.py), not at startup.
+"""
 
 from django.apps import apps
 from django.contrib import admin
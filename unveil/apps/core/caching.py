@@ -0,0 +1,246 @@
+"""Tag-based caching with version invalidation for the unveil core app.
+
+Cached values and responses depend on one or more tags such as `artwork:<uuid>:sentiment`. Each tag has a version
+token; `bump()` replaces it whenever the underlying rows change (see `apps.core.signals`). Every cache entry records
+the versions it was computed from, so a bump makes every stale entry unreachable at once without having to know
+which keys depended on the tag.
+
+Versions are random tokens rather than counters, so a version lost to eviction can never be recreated with a value
+an old entry or ETag was built from.
+
+Entries live in Redis when `REDIS_URL` is configured, so every worker shares them and sees each other's bumps, and
+otherwise in a bounded in-process LRU.
+"""
+
+import hashlib
+import json
+import pickle
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from functools import lru_cache, wraps
+
+from apps.core.connections import get_redis
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+from ninja.responses import NinjaJSONEncoder
+
+VERSION_PREFIX = "tag:"
+VALUE_PREFIX = "value:"
+RESPONSE_PREFIX = "response:"
+DEFAULT_TIMEOUT = 300
+
+
+class LocalLRUCache:
+    """A thread-safe, size-bounded in-process cache that evicts the least recently used entry."""
+
+    def __init__(self, max_entries=10_000):
+        self.max_entries = max_entries
+        self.metrics = Counter()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        """Return a dict of the keys that are present and unexpired."""
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and (entry[1] is None or entry[1] > now):
+                    self._entries.move_to_end(key)
+                    found[key] = entry[0]
+                elif entry is not None:
+                    del self._entries[key]
+            self.metrics["hits"] += len(found)
+            self.metrics["misses"] += len(keys) - len(found)
+        return found
+
+    def set_many(self, mapping, timeout=DEFAULT_TIMEOUT):
+        """Store every key in `mapping`. A `timeout` of None keeps entries until they are evicted."""
+        expires = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            for key, value in mapping.items():
+                self._entries[key] = (value, expires)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.metrics["evictions"] += 1
+
+    def get(self, key, default=None):
+        """Return the value stored at `key`, or `default`."""
+        return self.get_many([key]).get(key, default)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        """Store `value` at `key`."""
+        self.set_many({key: value}, timeout)
+
+    def pop(self, key, default=None):
+        """Remove and return the value stored at `key`, or `default`. Only one caller gets a given value."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            found = entry is not None and (entry[1] is None or entry[1] > time.monotonic())
+            self.metrics["hits" if found else "misses"] += 1
+        return entry[0] if found else default
+
+    def stats(self):
+        """Return hit/miss/eviction counts and the current size."""
+        return {**self.metrics, "entries": len(self._entries)}
+
+
+class RedisCache:
+    """A cache shared by every worker through Redis. Eviction is left to the server's `maxmemory-policy`."""
+
+    prefix = "cache:"
+
+    def __init__(self, client):
+        self.client = client
+        self.metrics = Counter()
+
+    def get_many(self, keys):
+        """Return a dict of the keys that are present."""
+        if not keys:
+            return {}
+        values = self.client.mget([self.prefix + key for key in keys])
+        found = {key: pickle.loads(value) for key, value in zip(keys, values) if value is not None}
+        self.metrics["hits"] += len(found)
+        self.metrics["misses"] += len(keys) - len(found)
+        return found
+
+    def set_many(self, mapping, timeout=DEFAULT_TIMEOUT):
+        """Store every key in `mapping` in one pipeline. A `timeout` of None stores without expiry."""
+        pipe = self.client.pipeline(transaction=False)
+        for key, value in mapping.items():
+            pipe.set(self.prefix + key, pickle.dumps(value), ex=timeout)
+        pipe.execute()
+
+    def get(self, key, default=None):
+        """Return the value stored at `key`, or `default`."""
+        return self.get_many([key]).get(key, default)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        """Store `value` at `key`."""
+        self.set_many({key: value}, timeout)
+
+    def pop(self, key, default=None):
+        """Remove and return the value stored at `key`, or `default`, with one atomic GETDEL."""
+        value = self.client.getdel(self.prefix + key)
+        self.metrics["hits" if value is not None else "misses"] += 1
+        return pickle.loads(value) if value is not None else default
+
+    def stats(self):
+        """Return this process's hit/miss counts."""
+        return dict(self.metrics)
+
+
+@lru_cache(maxsize=None)
+def get_cache():
+    """Return the cache backend for this process."""
+    client = get_redis()
+    if client is not None:
+        return RedisCache(client)
+    return LocalLRUCache(settings.TAG_CACHE_MAX_ENTRIES)
+
+
+def _new_version():
+    return uuid.uuid4().hex
+
+
+def _resolve_versions(keys, found):
+    """Fill in fresh versions for any version keys missing from `found`, and return them in order."""
+    missing = {key: _new_version() for key in keys if key not in found}
+    if missing:
+        get_cache().set_many(missing, None)
+        found.update(missing)
+    return [found[key] for key in keys]
+
+
+def get_versions(tags):
+    """Return the current version token of each tag, creating any that are missing."""
+    keys = [VERSION_PREFIX + tag for tag in tags]
+    return _resolve_versions(keys, get_cache().get_many(keys))
+
+
+def bump(*tags):
+    """Invalidate every cached entry that depends on any of `tags`."""
+    if tags:
+        get_cache().set_many({VERSION_PREFIX + tag: _new_version() for tag in set(tags)}, None)
+
+
+def cached(key, tags, compute, timeout=DEFAULT_TIMEOUT):
+    """Return the cached value for `key`, recomputing it if any of `tags` has been bumped since it was stored.
+
+    The entry and the tag versions are fetched together in a single cache round trip.
+
+    Usage:
+
+    ```python
+    count = cached(f"followers:{profile.uuid}", [f"profile:{profile.uuid}:followers"], profile.get_followers_count)
+    ```
+    """
+    version_keys = [VERSION_PREFIX + tag for tag in tags]
+    found = get_cache().get_many([VALUE_PREFIX + key, *version_keys])
+    entry = found.pop(VALUE_PREFIX + key, None)
+    versions = _resolve_versions(version_keys, found)
+    if entry is not None and entry[0] == versions:
+        return entry[1]
+
+    value = compute()
+    get_cache().set(VALUE_PREFIX + key, (versions, value), timeout)
+    return value
+
+
+def conditional_cache(tags, per_user=False, timeout=DEFAULT_TIMEOUT):
+    """Serve a ninja GET endpoint with ETag/304 support and a server-side response cache.
+
+    `tags` are format strings filled in from the endpoint's arguments plus `user`, e.g.
+    `["artwork:{artwork_uuid}:sentiment"]`. Set `per_user` for responses that differ between callers. Only
+    successful responses are cached.
+
+    The ETag is derived from the request path and the current versions of the tags, so a client presenting a
+    current ETag gets a 304 without the view (or the database) being touched.
+
+    Usage:
+
+    ```python
+    @router.get("/artwork/likes/count")
+    @conditional_cache(["artwork:{artwork_uuid}:sentiment"])
+    def get_likes_count(request, artwork_uuid: UUID):
+        ...
+    ```
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            versions = get_versions([tag.format(user=request.user, **kwargs) for tag in tags])
+            parts = [request.get_full_path(), *versions]
+            if per_user:
+                parts.append(str(request.user.pk))
+            etag = '"%s"' % hashlib.blake2b("|".join(parts).encode(), digest_size=16).hexdigest()
+
+            # Compression weakens the ETag (W/"..."), and If-None-Match compares weakly anyway.
+            presented = {tag.removeprefix("W/") for tag in parse_etags(request.headers.get("If-None-Match", ""))}
+            if etag in presented:
+                response = HttpResponseNotModified()
+            else:
+                body = get_cache().get(RESPONSE_PREFIX + etag)
+                if body is None:
+                    result = view(request, *args, **kwargs)
+                    if isinstance(result, HttpResponse) or not result.get("success"):
+                        return result
+                    body = json.dumps(result, cls=NinjaJSONEncoder)
+                    get_cache().set(RESPONSE_PREFIX + etag, body, timeout)
+                response = HttpResponse(body, content_type="application/json")
+
+            response["ETag"] = etag
+            # Clients may keep the response but must revalidate it, which is what makes the 304s possible.
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,19 @@
+"""Shared connections to external services for the unveil apps."""
+
+from functools import lru_cache
+
+from django.conf import settings
+
+
+@lru_cache(maxsize=None)
+def get_redis():
+    """Return a process-wide Redis client, or None if `REDIS_URL` is not configured.
+
+    The client owns a connection pool, so it is created once per process and shared by every caller.
+    """
+    if not settings.REDIS_URL:
+        return None
+
+    import redis
+
+    return redis.Redis.from_url(settings.REDIS_URL)
@@ -0,0 +1,139 @@
+"""Deleting accounts and artworks in the background, a chunk at a time.
+
+Deleting a Profile through the ORM makes Django's collector load every View, Sentiment, Comment, Follow and Artwork
+that cascades from it into memory and delete them in one transaction, which for a prolific profile can take long
+enough to time out while holding locks. Here the cascade is walked from the model metadata instead: each related
+table is emptied `CHUNK_SIZE` rows at a time, children before parents, each chunk in its own short transaction with
+a raw DELETE. A failed run can simply be run again; it carries on from whatever is left.
+
+Because raw deletes send no signals, the cache tags of the rows are bumped here (see `apps.core.signals`), deleted
+follows are logged for the follow graph (see `apps.core.graph`), deleted unread notifications are taken off their
+recipients' unread counts (see `apps.core.notifications`), and the media files of deleted rows are removed once their
+chunk commits. Progress is recorded on the DeletionJob after every chunk, so clients can poll it.
+"""
+
+import logging
+from collections import Counter
+
+from apps.core.feeds import get_feed_queues
+from apps.core.models import Artwork, Comment, DeletionJob, Follow, Notification, Profile, Sentiment, View
+from apps.core.notifications import discount
+from apps.core.signals import invalidate
+from apps.users.models import UserAccount
+from django.db import IntegrityError, models, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1000
+# A chunk whose parents gain new children while it runs is retried this many times.
+MAX_CHUNK_ATTEMPTS = 3
+# Models whose rows appear in cached responses.
+INVALIDATED_MODELS = {Artwork, Comment, Follow, Profile, Sentiment, View}
+
+
+def request_deletion(kind, target_id, requested_by):
+    """Create a DeletionJob and queue it to run once the current transaction commits."""
+    from apps.core.tasks import run_deletion
+
+    job = DeletionJob.objects.create(kind=kind, target_id=target_id, requested_by=requested_by)
+    transaction.on_commit(lambda: run_deletion.enqueue(job.pk, idempotency_key=f"deletion:{job.pk}"))
+    return job
+
+
+def delete_rows(queryset, progress):
+    """Delete every row of `queryset` and everything that cascades from it, `CHUNK_SIZE` rows at a time.
+
+    `progress` is called with each model and the number of its rows deleted.
+    """
+    queryset = queryset.order_by()
+    while pks := list(queryset.values_list("pk", flat=True)[:CHUNK_SIZE]):
+        for attempt in range(1, MAX_CHUNK_ATTEMPTS + 1):
+            _delete_children(queryset.model, pks, progress)
+            try:
+                _delete_chunk(queryset.model, pks, progress)
+                break
+            except IntegrityError:
+                # A child row was inserted after the children were cleared; clear them again.
+                if attempt == MAX_CHUNK_ATTEMPTS:
+                    raise
+
+
+def _delete_children(model, pks, progress):
+    for rel in model._meta.related_objects:
+        if rel.many_to_many:
+            # Through models are reached by their own foreign keys.
+            continue
+        children = rel.related_model._base_manager.filter(**{f"{rel.field.name}__in": pks})
+        if rel.on_delete is models.CASCADE:
+            delete_rows(children, progress)
+        elif rel.on_delete is models.SET_NULL:
+            children.update(**{rel.field.name: None})
+        elif rel.on_delete is not models.DO_NOTHING:
+            raise ValueError(f"Cannot delete through {rel.field} with on_delete={rel.on_delete.__name__}")
+
+
+def _delete_chunk(model, pks, progress):
+    rows = model._base_manager.filter(pk__in=pks)
+    file_fields = [field for field in model._meta.fields if isinstance(field, models.FileField)]
+    with transaction.atomic():
+        if model in INVALIDATED_MODELS:
+            invalidate(*rows)
+        if model is Follow:
+            from apps.core.graph import record_changes
+
+            record_changes(rows.values_list("following_profile_id", flat=True))
+        if model is Notification:
+            discount(rows.filter(is_read=False).values_list("recipient_id", flat=True))
+        if file_fields:
+            files = [
+                (field, name)
+                for names in rows.values_list(*(field.name for field in file_fields))
+                for field, name in zip(file_fields, names)
+                if name
+            ]
+            transaction.on_commit(lambda: _delete_files(files))
+        deleted = rows._raw_delete(rows.db)
+    progress(model, deleted)
+
+
+def _delete_files(files):
+    for field, name in files:
+        try:
+            field.storage.delete(name)
+        except OSError:
+            logger.warning("Could not delete media file %s", name, exc_info=True)
+
+
+def delete_account(account_id, progress):
+    """Delete an account, its profile and everything they own."""
+    delete_rows(Profile._base_manager.filter(pk=account_id), progress)
+    get_feed_queues().clear(account_id)
+    # What is left (admin log entries, group memberships) is small enough for the ORM's collector.
+    deleted, _ = UserAccount.objects.filter(pk=account_id).delete()
+    progress(UserAccount, deleted)
+
+
+def delete_artwork(artwork_id, progress):
+    """Delete an artwork and everything attached to it."""
+    delete_rows(Artwork._base_manager.filter(pk=artwork_id), progress)
+
+
+def run(job):
+    """Carry out a DeletionJob, recording progress after every chunk."""
+    counts = Counter(job.progress)
+
+    def progress(model, deleted):
+        counts[model._meta.label] += deleted
+        DeletionJob.objects.filter(pk=job.pk).update(progress=dict(counts))
+
+    DeletionJob.objects.filter(pk=job.pk).update(status=DeletionJob.Status.RUNNING)
+    try:
+        if job.kind == DeletionJob.Kind.ACCOUNT:
+            delete_account(job.target_id, progress)
+        else:
+            delete_artwork(job.target_id, progress)
+    except Exception as e:
+        DeletionJob.objects.filter(pk=job.pk).update(status=DeletionJob.Status.FAILED, error=repr(e))
+        raise
+    DeletionJob.objects.filter(pk=job.pk).update(status=DeletionJob.Status.DONE, error="", finished_at=timezone.now())
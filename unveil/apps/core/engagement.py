@@ -0,0 +1,113 @@
+"""Batched engagement ingestion for the unveil core app.
+
+Mobile clients queue likes, dislikes, views and follows while offline and replay them in one request. Events are
+deduplicated in Python, their targets are resolved with one query per model, and the writes are applied with one
+grouped statement per model inside a single transaction.
+"""
+
+import time
+
+from apps.core import live
+from apps.core.models import Artwork, Follow, Profile, Sentiment, View
+from apps.core.schemas import EventType
+from apps.core.signals import invalidate, remember_uuids
+from apps.core.tasks import rollup_exposure
+from django.conf import settings
+from django.db import transaction
+
+ARTWORK_EVENTS = {EventType.LIKE, EventType.DISLIKE, EventType.VIEW}
+PROFILE_EVENTS = {EventType.FOLLOW, EventType.UNFOLLOW}
+
+SENTIMENT_STATUS = {
+    EventType.LIKE: Sentiment.LikeChoices.LIKE,
+    EventType.DISLIKE: Sentiment.LikeChoices.DISLIKE,
+}
+
+
+def apply_events(profile_id, events):
+    """Apply a batch of engagement events on behalf of a profile.
+
+    Returns one result dict per event, in the same order as `events`. For likes/dislikes and follows/unfollows on
+    the same target the last event wins; repeated views are recorded once. Superseded events are reported as
+    successful duplicates.
+    """
+    results = [None] * len(events)
+
+    artwork_uuids = {event.uuid for event in events if event.type in ARTWORK_EVENTS}
+    profile_uuids = {event.uuid for event in events if event.type in PROFILE_EVENTS}
+    # An empty `__in` lookup short-circuits without touching the database.
+    artwork_ids = dict(Artwork.objects.filter(uuid__in=artwork_uuids).values_list("uuid", "id"))
+    profile_ids = dict(Profile.objects.filter(uuid__in=profile_uuids).values_list("uuid", "pk"))
+    # Spare cache invalidation from looking the same uuids up again.
+    remember_uuids(Artwork, [(pk, row_uuid) for row_uuid, pk in artwork_ids.items()])
+    remember_uuids(Profile, [(pk, row_uuid) for row_uuid, pk in profile_ids.items()])
+
+    # Target id -> (index of the winning event, value)
+    sentiments = {}
+    views = {}
+    follows = {}
+
+    for index, event in enumerate(events):
+        if event.type in ARTWORK_EVENTS:
+            target_id = artwork_ids.get(event.uuid)
+            if target_id is None:
+                results[index] = {"success": False, "error": "Artwork does not exist"}
+                continue
+        else:
+            target_id = profile_ids.get(event.uuid)
+            if target_id is None:
+                results[index] = {"success": False, "error": "Profile does not exist"}
+                continue
+
+        if event.type == EventType.VIEW:
+            if target_id in views:
+                results[index] = {"success": True, "duplicate": True}
+                continue
+            pending, value = views, None
+        elif event.type in SENTIMENT_STATUS:
+            pending, value = sentiments, SENTIMENT_STATUS[event.type]
+        else:
+            pending, value = follows, event.type == EventType.FOLLOW
+
+        if target_id in pending:
+            previous_index, _ = pending[target_id]
+            results[previous_index] = {"success": True, "duplicate": True}
+        pending[target_id] = (index, value)
+
+    with transaction.atomic():
+        if sentiments:
+            Sentiment.objects.upsert_many(
+                [
+                    Sentiment(profile_id=profile_id, artwork_id=artwork_id, status=status)
+                    for artwork_id, (_, status) in sentiments.items()
+                ]
+            )
+        if views:
+            # Views already recorded are skipped by the insert, and do not count again.
+            seen = set(
+                View.objects.filter(profile_id=profile_id, artwork_id__in=views).values_list("artwork_id", flat=True)
+            )
+            # bulk_create sends no signals, so invalidate the cached view counts directly.
+            invalidate(
+                *View.objects.bulk_create(
+                    [View(profile_id=profile_id, artwork_id=artwork_id) for artwork_id in views],
+                    ignore_conflicts=True,
+                )
+            )
+            live.publish({artwork_id: {"views": 1} for artwork_id in views if artwork_id not in seen})
+            # At most one exposure rollup per interval, however many batches of views arrive in it.
+            window = int(time.time()) // settings.EXPOSURE_ROLLUP_INTERVAL
+            transaction.on_commit(lambda: rollup_exposure.enqueue(idempotency_key=f"rollup_exposure:{window}"))
+        followed = [target_id for target_id, (_, is_follow) in follows.items() if is_follow]
+        unfollowed = [target_id for target_id, (_, is_follow) in follows.items() if not is_follow]
+        if followed:
+            Follow.objects.upsert_many(
+                [Follow(following_profile_id=profile_id, followed_profile_id=target_id) for target_id in followed]
+            )
+        if unfollowed:
+            Follow.objects.filter(following_profile_id=profile_id, followed_profile_id__in=unfollowed).delete()
+
+    for pending in (sentiments, views, follows):
+        for index, _ in pending.values():
+            results[index] = {"success": True}
+    return results
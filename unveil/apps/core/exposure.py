@@ -0,0 +1,60 @@
+"""The exposure ledger: how often each artist's work has been seen.
+
+View rows are append-only, so the ledger is rolled up incrementally. A watermark (the single ExposureRollup row)
+records the last view id counted; each rollup aggregates only newer views, grouped by artist, and adds them to the
+artists' ArtistExposure totals. The watermark row is locked for the duration, so concurrent rollups serialize
+instead of double counting.
+
+Ids are assigned before a transaction commits, so a view with a lower id can still become visible after a higher one.
+Rollups therefore leave the newest `EXPOSURE_ROLLUP_LAG` seconds of views for the next run.
+
+Views removed later (e.g. with their artwork) stay counted: the ledger records exposure that actually happened.
+"""
+
+from datetime import timedelta
+
+from apps.core.models import ArtistExposure, ExposureRollup, View
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+
+
+def rollup(rebuild=False):
+    """Add views since the last rollup to the exposure ledger, and return how many were counted.
+
+    With `rebuild`, the ledger is recomputed from every view instead.
+    """
+    with transaction.atomic():
+        state, _ = ExposureRollup.objects.select_for_update().get_or_create(pk=1)
+        if rebuild:
+            ArtistExposure.objects.all().delete()
+            state.last_view_id = 0
+
+        cutoff = timezone.now() - timedelta(seconds=settings.EXPOSURE_ROLLUP_LAG)
+        last_view_id = View.objects.filter(pk__gt=state.last_view_id, created_at__lte=cutoff).aggregate(last=Max("pk"))[
+            "last"
+        ]
+        if last_view_id is None:
+            if rebuild:
+                state.save(update_fields=["last_view_id", "modified_at"])
+            return 0
+
+        counts = dict(
+            View.objects.filter(pk__gt=state.last_view_id, pk__lte=last_view_id)
+            .values("artwork__profile_id")
+            .annotate(views=Count("pk"))
+            .order_by()
+            .values_list("artwork__profile_id", "views")
+        )
+        totals = dict(ArtistExposure.objects.filter(pk__in=counts).values_list("pk", "view_count"))
+        # Only rollups write the ledger, and they hold the watermark lock, so read-modify-write is safe here.
+        ArtistExposure.objects.bulk_create(
+            [ArtistExposure(profile_id=pk, view_count=totals.get(pk, 0) + n) for pk, n in counts.items()],
+            update_conflicts=True,
+            unique_fields=["profile"],
+            update_fields=["view_count", "modified_at"],
+        )
+        state.last_view_id = last_view_id
+        state.save(update_fields=["last_view_id", "modified_at"])
+        return sum(counts.values())
@@ -0,0 +1,238 @@
+"""Feed queues and prefetch bundles for the unveil feeds.
+
+Each profile has a ready queue of upcoming artwork ids per feed mode (`random` and `ordered`), so serving a page is a
+pop plus one `in_bulk` hydrate instead of a walk over the unseen artworks. A background job tops the queue back up to
+`FEED_QUEUE_SIZE` whenever a pop leaves it below `FEED_QUEUE_LOW_WATER`; a cold queue is filled inline. The ordered
+queue also keeps the cursor its next refill continues from. Refills of one queue take turns under a lock, so an
+inline refill and a background one never both read the same cursor and push the same artworks.
+
+Queued ids are not chased down when an artwork is deleted, censored, or viewed through another feed. The hydrate
+query filters those out, and the page is topped up from the queue if it comes up short.
+
+The app shows artworks a page at a time and preloads the next page. Rather than making the client ask for that
+page separately, a feed response draws two pages in one go: it returns the first and holds the second server-side
+as a bundle. The response carries the bundle's token and image URLs, so the client can start fetching images
+straight away; presenting the token then serves the page from the cache with no database work, while the page after
+it is drawn.
+
+Bundles live in the tag cache's backend (Redis when configured), keyed by the account and a random token, so a
+token is useless to anyone else. A bundle is served once: taking it deletes it. Bundles expire after
+`PREFETCH_TIMEOUT` seconds; a token that has expired or already been used simply falls back to drawing fresh pages.
+"""
+
+import secrets
+import threading
+import time
+from collections import OrderedDict, deque
+from functools import lru_cache
+
+from apps.core.caching import get_cache
+from apps.core.connections import get_redis
+from apps.core.models import Artwork, Profile
+from apps.core.pagination import encode_cursor
+from django.conf import settings
+
+RANDOM = "random"
+ORDERED = "ordered"
+PREFETCH_PREFIX = "prefetch:"
+PREFETCH_TIMEOUT = 10 * 60
+# Seconds a refill may hold a queue's lock before another refill may take it.
+REFILL_LOCK_TIMEOUT = 30
+# A page that comes up short on live artworks goes back to the queue at most this many times.
+MAX_TOP_UPS = 3
+
+
+class LocalFeedQueues:
+    """Feed queues held in process, for development and tests. Only the most recently used queues are kept."""
+
+    def __init__(self, max_queues=10_000):
+        self.max_queues = max_queues
+        self._queues = OrderedDict()
+        self._lock = threading.Lock()
+        self._refill_lock = threading.Lock()
+
+    def _entry(self, profile_pk, mode):
+        key = (profile_pk, mode)
+        entry = self._queues.get(key)
+        if entry is None:
+            entry = self._queues[key] = {"ids": deque(), "cursor": None}
+            while len(self._queues) > self.max_queues:
+                self._queues.popitem(last=False)
+        self._queues.move_to_end(key)
+        return entry
+
+    def pop(self, profile_pk, mode, count):
+        """Take up to `count` ids from the front of the queue, and return them with how many are left."""
+        with self._lock:
+            ids = self._entry(profile_pk, mode)["ids"]
+            popped = [ids.popleft() for _ in range(min(count, len(ids)))]
+            return popped, len(ids)
+
+    def length(self, profile_pk, mode):
+        """Return how many ids are queued."""
+        with self._lock:
+            return len(self._entry(profile_pk, mode)["ids"])
+
+    def push(self, profile_pk, mode, ids, cursor=None):
+        """Append `ids` to the queue and record the cursor the next refill continues from."""
+        with self._lock:
+            entry = self._entry(profile_pk, mode)
+            entry["ids"].extend(ids)
+            entry["cursor"] = cursor
+
+    def get_cursor(self, profile_pk, mode):
+        """Return the cursor the next refill continues from."""
+        with self._lock:
+            return self._entry(profile_pk, mode)["cursor"]
+
+    def lock(self, profile_pk, mode):
+        """Return a lock that one refill of the queue at a time holds; here, one refill of any queue."""
+        return self._refill_lock
+
+    def clear(self, profile_pk):
+        """Drop every queue of a profile."""
+        with self._lock:
+            for mode in (RANDOM, ORDERED):
+                self._queues.pop((profile_pk, mode), None)
+
+
+class RedisFeedQueues:
+    """Feed queues shared by every worker through Redis, as one list of ids per profile and mode."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def _key(self, profile_pk, mode):
+        return f"feedq:{profile_pk}:{mode}"
+
+    def pop(self, profile_pk, mode, count):
+        """Take up to `count` ids from the front of the queue, and return them with how many are left."""
+        key = self._key(profile_pk, mode)
+        pipe = self.client.pipeline()
+        pipe.lrange(key, 0, count - 1)
+        pipe.ltrim(key, count, -1)
+        pipe.llen(key)
+        popped, _, remaining = pipe.execute()
+        return [int(pk) for pk in popped], remaining
+
+    def length(self, profile_pk, mode):
+        """Return how many ids are queued."""
+        return self.client.llen(self._key(profile_pk, mode))
+
+    def push(self, profile_pk, mode, ids, cursor=None):
+        """Append `ids` to the queue and record the cursor the next refill continues from."""
+        key = self._key(profile_pk, mode)
+        pipe = self.client.pipeline()
+        if ids:
+            pipe.rpush(key, *ids)
+        if cursor is None:
+            pipe.delete(f"{key}:cursor")
+        else:
+            pipe.set(f"{key}:cursor", cursor)
+        pipe.execute()
+
+    def get_cursor(self, profile_pk, mode):
+        """Return the cursor the next refill continues from."""
+        cursor = self.client.get(f"{self._key(profile_pk, mode)}:cursor")
+        return cursor.decode() if cursor is not None else None
+
+    def lock(self, profile_pk, mode):
+        """Return a lock that one refill of the queue at a time holds."""
+        return self.client.lock(f"{self._key(profile_pk, mode)}:lock", timeout=REFILL_LOCK_TIMEOUT)
+
+    def clear(self, profile_pk):
+        """Drop every queue of a profile."""
+        keys = [self._key(profile_pk, mode) for mode in (RANDOM, ORDERED)]
+        self.client.delete(*keys, *(f"{key}:cursor" for key in keys))
+
+
+@lru_cache(maxsize=None)
+def get_feed_queues():
+    """Return the feed queue backend for this process."""
+    client = get_redis()
+    if client is not None:
+        return RedisFeedQueues(client)
+    return LocalFeedQueues()
+
+
+def refill(profile_pk, mode):
+    """Top a profile's queue for `mode` back up to `FEED_QUEUE_SIZE`."""
+    queues = get_feed_queues()
+    # A refill that waited for the lock finds the queue already topped up.
+    with queues.lock(profile_pk, mode):
+        _refill(queues, profile_pk, mode)
+
+
+def _refill(queues, profile_pk, mode):
+    need = settings.FEED_QUEUE_SIZE - queues.length(profile_pk, mode)
+    if need <= 0:
+        return
+    profile = Profile.objects.get(pk=profile_pk)
+    artworks = Artwork.objects.only("id", "profile_id", "created_at")
+    if mode == RANDOM:
+        queues.push(profile_pk, mode, [a.pk for a in artworks.get_random_artwork_for_profile(profile, limit=need)])
+        return
+
+    cursor = queues.get_cursor(profile_pk, mode)
+    found = list(artworks.get_ordered_artwork_for_profile(profile, limit=need, cursor=cursor))
+    # Past the oldest artwork, start over from the newest: only what is still unseen comes round again.
+    cursor = encode_cursor(found[-1].created_at, found[-1].pk) if len(found) == need else None
+    queues.push(profile_pk, mode, [a.pk for a in found], cursor=cursor)
+
+
+def draw(profile, mode, count):
+    """Take the next `count` unseen artworks of a feed from the profile's queue, with their artists loaded."""
+    from apps.core.tasks import refill_feed_queue
+
+    queues = get_feed_queues()
+    artworks = []
+    refilled = False
+    for _ in range(MAX_TOP_UPS + 1):
+        ids, remaining = queues.pop(profile.pk, mode, count - len(artworks))
+        if not ids and not refilled:
+            # The queue ran dry before a background refill got to it.
+            refill(profile.pk, mode)
+            refilled = True
+            ids, remaining = queues.pop(profile.pk, mode, count - len(artworks))
+        if remaining < settings.FEED_QUEUE_LOW_WATER:
+            # One refill per profile and mode per interval, however many pages are served in it.
+            window = int(time.time()) // settings.FEED_QUEUE_REFILL_INTERVAL
+            refill_feed_queue.enqueue(profile.pk, mode, idempotency_key=f"refill_feed:{profile.pk}:{mode}:{window}")
+        if not ids:
+            break
+
+        found = (
+            Artwork.objects.select_related("profile").filter(is_censored=False).exclude(viewed_by=profile).in_bulk(ids)
+        )
+        # A small catalogue can come round again within one page; serve each artwork once.
+        served = {artwork.pk for artwork in artworks}
+        artworks.extend(found[pk] for pk in dict.fromkeys(ids) if pk in found and pk not in served)
+        if len(artworks) >= count:
+            break
+    return artworks
+
+
+def hold(user_pk, feed, artworks, cursor=None, queued=False):
+    """Hold `artworks` (serialized) as the next page of `feed`, and return the bundle to send the client.
+
+    `cursor` is the cursor past the bundle's last artwork, for feeds that page by cursor. `queued` marks a bundle
+    drawn from the feed queue, whose following page is drawn from the queue too rather than read from `cursor`.
+    Returns None if there is nothing to hold.
+    """
+    if not artworks:
+        return None
+    token = secrets.token_urlsafe(16)
+    get_cache().set(
+        f"{PREFETCH_PREFIX}{user_pk}:{feed}:{token}",
+        {"artwork": artworks, "cursor": cursor, "queued": queued},
+        PREFETCH_TIMEOUT,
+    )
+    return {"token": token, "images": [artwork["image"] for artwork in artworks]}
+
+
+def take(user_pk, feed, token):
+    """Remove and return the bundle held under `token` as `{"artwork": [...], "cursor": ..., "queued": ...}`, or None.
+
+    A replayed token finds nothing, so it can neither serve the held page twice nor hold another page each time.
+    """
+    return get_cache().pop(f"{PREFETCH_PREFIX}{user_pk}:{feed}:{token}")
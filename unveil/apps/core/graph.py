@@ -0,0 +1,280 @@
+"""The follow graph, held in memory for queries beyond one hop.
+
+Mutual follows, friends-of-friends suggestions and follower overlap all walk two hops of the graph, which in SQL
+means self-joins of Follow that grow with the square of a profile's degree. Instead each process keeps a snapshot of
+the whole graph as compressed sparse rows (CSR) in NumPy arrays: the profiles one follows are a slice of one array,
+its followers a slice of another, and a two-hop walk is a handful of vectorized array operations. A snapshot takes
+about 24 bytes per follow, plus 4 per profile.
+
+Snapshots are kept current incrementally. Every write to Follow logs the follower in FollowChange, in the same
+transaction. A refresh reads the changes since its watermark, reloads the current follows of just those profiles, and
+splices them in place of their old rows. Refreshes happen on access, at most once per `GRAPH_REFRESH_INTERVAL`
+seconds, so a follow shows up in two-hop results within that long. The snapshot is rebuilt from scratch every
+`GRAPH_REBUILD_INTERVAL` seconds, and changes older than twice that are pruned. Both build new arrays over every
+follow, so they run on a background thread that swaps the new snapshot in when it is ready, and requests carry on
+with the old one meanwhile; only the first snapshot of a process is waited for. With `JOBS_EAGER` set, as in
+development and tests, they run inline instead.
+
+Change ids, like View ids in `apps.core.exposure`, are assigned before their transaction commits, so the watermark
+stays `GRAPH_CHANGE_LAG` seconds behind: the newest changes are read again by the next refresh, which is harmless,
+as reloading a profile's follows is idempotent.
+
+Results are profile primary keys. Deactivated profiles are still in the graph; callers leave them out when loading
+the profiles.
+"""
+
+import itertools
+import logging
+import threading
+import time
+from datetime import timedelta
+from functools import lru_cache
+
+import numpy as np
+from apps.core.models import Follow, FollowChange
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+LOAD_CHUNK_SIZE = 10_000
+
+
+def _csr(rows, cols, size):
+    """Return the `(indptr, indices)` of a CSR matrix with an entry at each `(rows[i], cols[i])`, columns sorted."""
+    # Sorting one combined key is several times faster than an argsort over two, and needs no gather after.
+    keys = np.sort(rows * size + cols)
+    indptr = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=size), out=indptr[1:])
+    return indptr, (keys % size).astype(np.int32)
+
+
+def _gather(indptr, indices, rows):
+    """Return the concatenated CSR rows `rows` as one array, without a Python loop."""
+    starts = indptr[rows]
+    lengths = indptr[rows + 1] - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=indices.dtype)
+    # For each output slot, its offset into `indices`: the row's start plus the slot's place within the row.
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+    return indices[offsets]
+
+
+class FollowGraph:
+    """An immutable snapshot of the follow graph.
+
+    Profiles are renumbered densely in primary key order (`nodes[i]` is the pk of node `i`, and `_index[pk]` is
+    `i`). `out_*` is the CSR of who each node follows and `in_*` of who follows it; the edge list itself is kept for
+    splicing in changes.
+    """
+
+    def __init__(self, src, dst):
+        self.src = src
+        self.dst = dst
+        # Primary keys are dense enough that a mask over them beats sorting to find the distinct ones.
+        present = np.zeros(int(max(src.max(initial=0), dst.max(initial=0))) + 1, dtype=bool)
+        present[src] = True
+        present[dst] = True
+        self.nodes = np.flatnonzero(present)
+        self._index = (np.cumsum(present) - 1).astype(np.int32)
+        rows = self._index[src].astype(np.int64)
+        cols = self._index[dst].astype(np.int64)
+        self.out_indptr, self.out_indices = _csr(rows, cols, len(self.nodes))
+        self.in_indptr, self.in_indices = _csr(cols, rows, len(self.nodes))
+
+    @classmethod
+    def from_edges(cls, edges):
+        """Build a snapshot from `(follower_pk, followed_pk)` pairs."""
+        flat = np.fromiter(itertools.chain.from_iterable(edges), dtype=np.int64)
+        return cls(flat[0::2].copy(), flat[1::2].copy())
+
+    def __len__(self):
+        return len(self.src)
+
+    def with_changes(self, profile_pks, edges):
+        """Return a new snapshot in which the follows of `profile_pks` are replaced by `edges`."""
+        changed = np.fromiter(profile_pks, dtype=np.int64)
+        mask = np.zeros(max(len(self._index), int(changed.max(initial=0)) + 1), dtype=bool)
+        mask[changed] = True
+        keep = ~mask[self.src]
+        fresh = FollowGraph.from_edges(edges)
+        return FollowGraph(np.concatenate([self.src[keep], fresh.src]), np.concatenate([self.dst[keep], fresh.dst]))
+
+    def _node(self, pk):
+        if not 0 <= pk < len(self._index):
+            return None
+        i = int(self._index[pk])
+        return i if i >= 0 and self.nodes[i] == pk else None
+
+    def _following(self, i):
+        return self.out_indices[self.out_indptr[i] : self.out_indptr[i + 1]]
+
+    def _followers(self, i):
+        return self.in_indices[self.in_indptr[i] : self.in_indptr[i + 1]]
+
+    def mutuals(self, pk):
+        """Return the pks of the profiles that `pk` follows and that follow it back."""
+        i = self._node(pk)
+        if i is None:
+            return []
+        return self.nodes[np.intersect1d(self._following(i), self._followers(i), assume_unique=True)].tolist()
+
+    def suggestions(self, pk, limit=10):
+        """Return up to `limit` profiles followed by the profiles `pk` follows, as `(pk, count)` pairs.
+
+        `count` is how many of the profiles `pk` follows follow the suggestion; the most followed come first, and
+        profiles `pk` already follows are left out.
+        """
+        i = self._node(pk)
+        if i is None:
+            return []
+        following = self._following(i)
+        candidates, counts = np.unique(_gather(self.out_indptr, self.out_indices, following), return_counts=True)
+        fresh = ~np.isin(candidates, following, assume_unique=True) & (candidates != i)
+        candidates, counts = candidates[fresh], counts[fresh]
+        if len(candidates) > limit:
+            top = np.argpartition(-counts, limit)[:limit]
+            candidates, counts = candidates[top], counts[top]
+        # Most shared first, then by pk so the order is stable.
+        order = np.lexsort((candidates, -counts))
+        return list(zip(self.nodes[candidates[order]].tolist(), counts[order].tolist()))
+
+    def follower_overlap(self, pk, other_pk):
+        """Return how many followers two profiles share, and that as a share of their combined followers."""
+        i, j = self._node(pk), self._node(other_pk)
+        if i is None or j is None:
+            return 0, 0.0
+        a, b = self._followers(i), self._followers(j)
+        shared = len(np.intersect1d(a, b, assume_unique=True))
+        union = len(a) + len(b) - shared
+        return shared, shared / union if union else 0.0
+
+    def reach(self, pk):
+        """Return how many profiles are within two follows of `pk`, not counting itself."""
+        i = self._node(pk)
+        if i is None:
+            return 0
+        following = self._following(i)
+        reached = np.union1d(following, _gather(self.out_indptr, self.out_indices, following))
+        return len(reached) - int(np.isin(i, reached))
+
+
+def _edges(profile_pks=None):
+    """Stream `(follower_pk, followed_pk)` pairs for every follow, or for the follows of `profile_pks`."""
+    follows = Follow.objects.order_by()
+    if profile_pks is not None:
+        follows = follows.filter(following_profile__in=profile_pks)
+    return follows.values_list("following_profile_id", "followed_profile_id").iterator(chunk_size=LOAD_CHUNK_SIZE)
+
+
+def _settled_watermark():
+    """Return the id of the newest change old enough that no lower id can still be uncommitted."""
+    cutoff = timezone.now() - timedelta(seconds=settings.GRAPH_CHANGE_LAG)
+    return FollowChange.objects.filter(created_at__lt=cutoff).aggregate(last=Max("id"))["last"] or 0
+
+
+class GraphStore:
+    """Holds this process's snapshot of the follow graph and keeps it current.
+
+    With `background` set, refreshes and rebuilds after the first snapshot run on a thread of their own.
+    """
+
+    def __init__(self, background=True):
+        self.background = background
+        self.graph = None
+        self.watermark = 0
+        self.built_at = self.refreshed_at = 0.0
+        self._lock = threading.Lock()
+        self._updater = None
+
+    def rebuild(self):
+        """Load a fresh snapshot of the whole graph."""
+        watermark = _settled_watermark()
+        self.graph = FollowGraph.from_edges(_edges())
+        self.watermark = watermark
+        self.built_at = self.refreshed_at = time.monotonic()
+
+    def refresh(self):
+        """Splice in the follows of every profile that changed since the last refresh."""
+        watermark = max(self.watermark, _settled_watermark())
+        changes = FollowChange.objects.filter(id__gt=self.watermark)
+        changed = set(changes.values_list("profile_id", flat=True).distinct())
+        if changed:
+            self.graph = self.graph.with_changes(changed, _edges(changed))
+        self.watermark = watermark
+        self.refreshed_at = time.monotonic()
+
+    def update(self):
+        """Rebuild the snapshot if that is due, and otherwise refresh it."""
+        if time.monotonic() - self.built_at >= settings.GRAPH_REBUILD_INTERVAL:
+            self.rebuild()
+        else:
+            self.refresh()
+
+    def get(self):
+        """Return the current snapshot, starting a refresh or rebuild first if one is due.
+
+        Only the first call waits for a snapshot to be built. After that, while one update brings the snapshot up to
+        date, callers carry on with the one before.
+        """
+        if self.graph is None:
+            with self._lock:
+                if self.graph is None:
+                    self.rebuild()
+            return self.graph
+        due = time.monotonic() - self.refreshed_at >= settings.GRAPH_REFRESH_INTERVAL
+        if due and self._lock.acquire(blocking=False):
+            if self.background:
+                self._updater = threading.Thread(target=self._update_in_background, name="graph-update", daemon=True)
+                self._updater.start()
+            else:
+                try:
+                    self.update()
+                finally:
+                    self._lock.release()
+        return self.graph
+
+    def _update_in_background(self):
+        try:
+            self.update()
+        except Exception:
+            # The old snapshot is still served, and the next request past the interval tries again.
+            logger.exception("Could not update the follow graph")
+        finally:
+            self._lock.release()
+            # Connections belong to the thread that opened them, and this one is done.
+            connections.close_all()
+
+
+@lru_cache(maxsize=None)
+def get_graph_store():
+    """Return the follow graph store for this process."""
+    return GraphStore(background=not settings.JOBS_EAGER)
+
+
+def get_graph():
+    """Return this process's current snapshot of the follow graph."""
+    return get_graph_store().get()
+
+
+def record_changes(profile_pks):
+    """Log that the follows of `profile_pks` changed, in the current transaction."""
+    from apps.core.tasks import prune_follow_changes
+
+    profile_pks = set(profile_pks)
+    if not profile_pks:
+        return
+    FollowChange.objects.bulk_create([FollowChange(profile_id=pk) for pk in profile_pks])
+    # At most one prune per rebuild interval, however many changes come in.
+    window = int(time.time()) // settings.GRAPH_REBUILD_INTERVAL
+    transaction.on_commit(lambda: prune_follow_changes.enqueue(idempotency_key=f"prune_follow_changes:{window}"))
+
+
+def prune_changes():
+    """Delete changes every snapshot has had time to rebuild past, and return how many there were."""
+    cutoff = timezone.now() - timedelta(seconds=2 * settings.GRAPH_REBUILD_INTERVAL)
+    deleted, _ = FollowChange.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,76 @@
+"""Perceptual image hashes for finding duplicate and near-duplicate artworks.
+
+A pHash is 64 bits taken from the lowest frequencies of an image's discrete cosine transform, each bit recording
+whether a coefficient is above the median. It survives rescaling, recompression and small edits, so copies of an
+image land within a few bits of each other in Hamming distance.
+
+For lookup the hash is also stored as four 16-bit segments, each in an indexed column (multi-index hashing). If two
+hashes differ in at most `MAX_DISTANCE` bits, by the pigeonhole principle at least one segment differs in at most
+`MAX_DISTANCE // SEGMENTS` bits, so candidates are exactly the rows matching some segment of the query within that
+many bit flips. That is a handful of index lookups whatever the table size; candidates are then checked in full.
+
+NumPy and Pillow are imported only when an image is hashed: the models import this module for the segment helpers,
+and every web worker would otherwise load both at startup.
+"""
+
+from functools import lru_cache
+
+HASH_SIZE = 8
+DCT_SIZE = 32
+SEGMENTS = 4
+SEGMENT_BITS = 64 // SEGMENTS
+SEGMENT_MASK = (1 << SEGMENT_BITS) - 1
+# Segments are probed with at most one bit flipped, which finds every hash up to this distance.
+MAX_DISTANCE = 2 * SEGMENTS - 1
+
+
+@lru_cache(maxsize=None)
+def _dct_matrix(n):
+    """Return the orthonormal DCT-II matrix of size `n`."""
+    import numpy as np
+
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.sqrt(2 / n) * np.cos(np.pi * (2 * i + 1) * k / (2 * n))
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+
+def phash(image):
+    """Return the 64-bit perceptual hash of a PIL image, as an unsigned int."""
+    import numpy as np
+    from PIL import Image
+
+    pixels = np.asarray(image.convert("L").resize((DCT_SIZE, DCT_SIZE), Image.Resampling.LANCZOS), dtype=np.float64)
+    dct = _dct_matrix(DCT_SIZE)
+    low = (dct @ pixels @ dct.T)[:HASH_SIZE, :HASH_SIZE].flatten()
+    # The DC term is the overall brightness, which would skew the median.
+    bits = low > np.median(low[1:])
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def to_signed(value):
+    """Fit an unsigned 64-bit hash into a signed BigIntegerField."""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def to_unsigned(value):
+    """Undo `to_signed`."""
+    return value + (1 << 64) if value < 0 else value
+
+
+def segments(value):
+    """Split an unsigned 64-bit hash into `SEGMENTS` integers, most significant first."""
+    return [(value >> (SEGMENT_BITS * (SEGMENTS - 1 - i))) & SEGMENT_MASK for i in range(SEGMENTS)]
+
+
+def neighbours(segment, flips):
+    """Return `segment` and every value within `flips` (0 or 1) bits of it."""
+    if flips == 0:
+        return [segment]
+    return [segment, *(segment ^ (1 << bit) for bit in range(SEGMENT_BITS))]
+
+
+def distance(a, b):
+    """Return the Hamming distance between two hashes."""
+    return (to_unsigned(a) ^ to_unsigned(b)).bit_count()
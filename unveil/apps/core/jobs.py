@@ -0,0 +1,305 @@
+"""A lightweight background job queue for the unveil apps.
+
+Functions decorated with `@task` can be enqueued from a request handler, which returns immediately while a worker
+(`python manage.py runworker`) runs the job. Failed jobs are retried with exponential backoff up to the task's
+`max_retries`, then moved to a dead-letter list. Passing an `idempotency_key` enqueues a job at most once per key,
+so client retries of the same request don't duplicate side effects.
+
+Jobs are brokered through Redis when `REDIS_URL` is configured. Otherwise a local in-process broker stands in; with
+`JOBS_EAGER` enabled it runs each job inline as soon as it is enqueued, which keeps development and tests simple.
+
+Delivery is at most once if a worker process dies mid-job; tasks should be safe to re-run but need not be exactly-once.
+
+Usage:
+
+```python
+from apps.core.jobs import task
+
+@task(max_retries=5)
+def send_welcome_email(account_id):
+    ...
+
+send_welcome_email.enqueue(account.pk, idempotency_key=f"welcome:{account.pk}")
+```
+"""
+
+import heapq
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+
+from apps.core.connections import get_redis
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+logger = logging.getLogger(__name__)
+
+REGISTRY = {}
+
+
+@dataclass
+class Job:
+    """A single invocation of a task, as stored by the broker."""
+
+    task: str
+    args: list
+    kwargs: dict
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    attempt: int = 0
+    idempotency_key: str = None
+
+    def dumps(self):
+        """Serialize the job for the broker."""
+        return json.dumps(asdict(self))
+
+    @classmethod
+    def loads(cls, payload):
+        """Deserialize a job read from the broker."""
+        return cls(**json.loads(payload))
+
+
+class Task:
+    """A function registered to run in the background."""
+
+    def __init__(self, func, name, max_retries, retry_backoff):
+        self.func = func
+        self.name = name
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def enqueue(self, *args, idempotency_key=None, delay=0, **kwargs):
+        """Queue the task to run in the background. Returns the Job, or None if `idempotency_key` was already used.
+
+        Arguments must be JSON-serializable; pass primary keys rather than model instances. With `delay`, the job
+        runs no sooner than that many seconds from now.
+        """
+        job = Job(task=self.name, args=list(args), kwargs=kwargs, idempotency_key=idempotency_key)
+        return job if get_broker().enqueue(job, delay=delay) else None
+
+    def retry_delay(self, attempt):
+        """Seconds to wait before retry number `attempt` (starting at 1)."""
+        return self.retry_backoff * 2 ** (attempt - 1)
+
+
+def task(name=None, max_retries=3, retry_backoff=2.0):
+    """Register a function as a background task."""
+
+    def decorator(func):
+        task_name = name or f"{func.__module__}.{func.__qualname__}"
+        REGISTRY[task_name] = Task(func, task_name, max_retries, retry_backoff)
+        return REGISTRY[task_name]
+
+    return decorator
+
+
+def run_job(payload):
+    """Run a serialized job. Module-level so process pools can pickle it.
+
+    Jobs send no `request_started` or `request_finished`, so the database connections they leave behind are checked
+    here instead, before and after each job, as Django does around requests: one dropped by a database restart or an
+    idle timeout, or older than `CONN_MAX_AGE`, is closed, and the next query opens a fresh one.
+    """
+    job = Job.loads(payload)
+    _close_old_connections()
+    try:
+        REGISTRY[job.task].func(*job.args, **job.kwargs)
+    finally:
+        _close_old_connections()
+
+
+def _close_old_connections():
+    # An eager job runs inside whatever transaction enqueued it, whose connection must be left open.
+    if not any(conn.in_atomic_block for conn in connections.all(initialized_only=True)):
+        close_old_connections()
+
+
+class LocalBroker:
+    """An in-process broker for development and tests.
+
+    With `eager` set, jobs run inline in `enqueue()` without waiting out any delay, retries included, since nothing
+    else would run them; otherwise they wait until `drain()` or a worker thread takes them, and retries are held until
+    they are due. Idempotency keys are forgotten after `JOBS_IDEMPOTENCY_TTL` seconds, as in Redis.
+    """
+
+    def __init__(self, eager=False):
+        self.eager = eager
+        self.dead = []
+        self._ready = []
+        self._scheduled = []
+        # Key -> when it expires. Every key lives as long, so the oldest is always first.
+        self._claimed_keys = OrderedDict()
+        self._condition = threading.Condition()
+
+    def _claim(self, key):
+        now = time.monotonic()
+        while self._claimed_keys and next(iter(self._claimed_keys.values())) <= now:
+            self._claimed_keys.popitem(last=False)
+        if key in self._claimed_keys:
+            return False
+        self._claimed_keys[key] = now + settings.JOBS_IDEMPOTENCY_TTL
+        return True
+
+    def enqueue(self, job, delay=0):
+        """Queue `job`, returning False if its idempotency key has already been used."""
+        with self._condition:
+            if job.idempotency_key and job.attempt == 0 and not self._claim(job.idempotency_key):
+                return False
+            if delay and not self.eager:
+                heapq.heappush(self._scheduled, (time.monotonic() + delay, job.id, job))
+                self._condition.notify()
+                return True
+            if not self.eager:
+                self._ready.append(job)
+                self._condition.notify()
+                return True
+        Worker(self).process(job)
+        return True
+
+    def reserve(self, timeout=1.0):
+        """Take the next ready job, waiting up to `timeout` seconds. Returns None if there is none."""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                while self._scheduled and self._scheduled[0][0] <= now:
+                    self._ready.append(heapq.heappop(self._scheduled)[2])
+                if self._ready:
+                    return self._ready.pop(0)
+                if now >= deadline:
+                    return None
+                wake_at = min(deadline, self._scheduled[0][0]) if self._scheduled else deadline
+                self._condition.wait(wake_at - now)
+
+    def fail(self, job, error):
+        """Record a job that has exhausted its retries."""
+        self.dead.append((job, error))
+
+    def drain(self):
+        """Run every job that is ready now, including retries that have come due, in the calling thread."""
+        worker = Worker(self)
+        while (job := self.reserve(timeout=0)) is not None:
+            worker.process(job)
+
+
+class RedisBroker:
+    """A broker shared by every worker through Redis.
+
+    Ready jobs are kept in a list, delayed retries in a sorted set scored by due time, and jobs that exhaust their
+    retries in a capped dead-letter list.
+    """
+
+    promote_script = """
+        local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, 100)
+        for _, payload in ipairs(due) do
+            redis.call('ZREM', KEYS[1], payload)
+            redis.call('LPUSH', KEYS[2], payload)
+        end
+        return #due
+    """
+
+    def __init__(self, client, queue="default"):
+        self.client = client
+        self.ready_key = f"jobs:{queue}:ready"
+        self.scheduled_key = f"jobs:{queue}:scheduled"
+        self.dead_key = f"jobs:{queue}:dead"
+        self._promote = client.register_script(self.promote_script)
+
+    def enqueue(self, job, delay=0):
+        """Queue `job`, returning False if its idempotency key has already been used."""
+        if job.idempotency_key and job.attempt == 0:
+            claimed = self.client.set(
+                f"jobs:idempotency:{job.idempotency_key}", job.id, nx=True, ex=settings.JOBS_IDEMPOTENCY_TTL
+            )
+            if not claimed:
+                return False
+        if delay:
+            self.client.zadd(self.scheduled_key, {job.dumps(): time.time() + delay})
+        else:
+            self.client.lpush(self.ready_key, job.dumps())
+        return True
+
+    def reserve(self, timeout=1.0):
+        """Take the next ready job, waiting up to `timeout` seconds. Returns None if there is none."""
+        self._promote(keys=[self.scheduled_key, self.ready_key], args=[time.time()])
+        item = self.client.brpop([self.ready_key], timeout=max(1, int(timeout)))
+        return Job.loads(item[1]) if item else None
+
+    def fail(self, job, error):
+        """Record a job that has exhausted its retries."""
+        pipe = self.client.pipeline(transaction=False)
+        pipe.lpush(self.dead_key, json.dumps({"job": json.loads(job.dumps()), "error": error}))
+        pipe.ltrim(self.dead_key, 0, 999)
+        pipe.execute()
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    """Return the broker for this process."""
+    client = get_redis()
+    if client is not None:
+        return RedisBroker(client)
+    return LocalBroker(eager=settings.JOBS_EAGER)
+
+
+class Worker:
+    """Takes jobs from a broker and runs them on a thread or process pool, retrying failures with backoff."""
+
+    def __init__(self, broker, concurrency=1, pool="thread"):
+        self.broker = broker
+        self.concurrency = concurrency
+        self.pool = pool
+        self._slots = threading.BoundedSemaphore(concurrency)
+
+    def process(self, job):
+        """Run a job in the calling thread."""
+        try:
+            run_job(job.dumps())
+        except Exception as e:
+            self._handle_failure(job, e)
+
+    def _handle_failure(self, job, error):
+        task_ = REGISTRY.get(job.task)
+        if task_ is not None and job.attempt < task_.max_retries:
+            job.attempt += 1
+            delay = task_.retry_delay(job.attempt)
+            logger.warning("Job %s (%s) failed, retry %s in %ss: %r", job.id, job.task, job.attempt, delay, error)
+            self.broker.enqueue(job, delay=delay)
+        else:
+            logger.error("Job %s (%s) failed permanently: %r", job.id, job.task, error)
+            self.broker.fail(job, repr(error))
+
+    def _finished(self, job, future):
+        self._slots.release()
+        error = future.exception()
+        if error is not None:
+            self._handle_failure(job, error)
+
+    def run(self, stop_event=None, initializer=None):
+        """Run jobs until `stop_event` is set.
+
+        At most `concurrency` jobs are reserved at once, so a busy worker leaves queued jobs for its peers.
+        """
+        stop_event = stop_event or threading.Event()
+        if self.pool == "process":
+            executor = ProcessPoolExecutor(self.concurrency, initializer=initializer)
+        else:
+            executor = ThreadPoolExecutor(self.concurrency)
+        with executor:
+            while not stop_event.is_set():
+                if not self._slots.acquire(timeout=1):
+                    continue
+                job = self.broker.reserve(timeout=1)
+                if job is None:
+                    self._slots.release()
+                    continue
+                future = executor.submit(run_job, job.dumps())
+                future.add_done_callback(lambda future, job=job: self._finished(job, future))
@@ -0,0 +1,37 @@
+"""Compute perceptual hashes for artworks uploaded before they were recorded."""
+
+from apps.core import imagehash
+from apps.core.models import Artwork
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+PHASH_FIELDS = ["phash", "phash_0", "phash_1", "phash_2", "phash_3"]
+
+
+class Command(BaseCommand):
+    help = "Hash the images of artworks without a perceptual hash, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Artworks to load and save at a time.")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        pending = Artwork.all_objects.filter(phash__isnull=True).only("id", "image").order_by("pk")
+        hashed = failed = 0
+        last_pk = 0
+        while batch := list(pending.filter(pk__gt=last_pk)[:batch_size]):
+            last_pk = batch[-1].pk
+            done = []
+            for artwork in batch:
+                try:
+                    with artwork.image.open() as f:
+                        artwork.set_phash(imagehash.phash(Image.open(f)))
+                except OSError as e:
+                    failed += 1
+                    self.stderr.write(f"Skipping artwork {artwork.pk}: {e}")
+                    continue
+                done.append(artwork)
+            Artwork.all_objects.bulk_update(done, PHASH_FIELDS)
+            hashed += len(done)
+            self.stdout.write(f"Hashed {hashed} artwork(s) so far")
+        self.stdout.write(f"Done: {hashed} hashed, {failed} skipped")
@@ -0,0 +1,81 @@
+"""Measure collection writes, reorders and paged reads at scale."""
+
+import random
+import time
+import uuid
+
+from apps.core.models import Artwork, Collection, CollectionItem, Profile
+from apps.core.schemas import MAX_COLLECTION_BATCH
+from apps.users.models import UserAccount
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+
+class Rollback(Exception):
+    """Raised to discard the benchmark's rows."""
+
+
+class Command(BaseCommand):
+    help = "Benchmark adding, moving, reading and removing collection items. Nothing is kept."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--items", type=int, default=10_000, help="Artworks in the collection.")
+        parser.add_argument("--moves", type=int, default=1_000, help="Random reorders to make.")
+        parser.add_argument("--page-size", type=int, default=50)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options["items"], options["moves"], options["page_size"])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def report(self, label, count, elapsed, unit):
+        self.stdout.write(f"{label:>8}: {count} {unit} in {elapsed:.3f}s, {elapsed / max(count, 1) * 1000:.3f}ms each")
+
+    def run(self, count, moves, page_size):
+        prefix = uuid.uuid4().hex[:8]
+        account = UserAccount.objects.create_user(f"benchmark-{prefix}@example.com", "Benchmark", None)
+        profile = Profile.objects.create(account=account)
+        artworks = Artwork.objects.bulk_create(
+            [Artwork(profile=profile, title=f"{prefix}-{i}", content="", image="benchmark.png") for i in range(count)],
+            batch_size=1000,
+        )
+        artwork_ids = [artwork.pk for artwork in artworks]
+        collection = Collection.objects.create(profile=profile, title=f"benchmark-{prefix}")
+
+        start = time.perf_counter()
+        for i in range(0, count, MAX_COLLECTION_BATCH):
+            CollectionItem.objects.add_many(collection, artwork_ids[i : i + MAX_COLLECTION_BATCH])
+        self.report("add", count, time.perf_counter() - start, "items")
+
+        rng = random.Random(0)
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            for _ in range(moves):
+                artwork_id, after_id = rng.sample(artwork_ids, 2)
+                CollectionItem.objects.move(collection, artwork_id, after_artwork_id=after_id)
+            elapsed = time.perf_counter() - start
+        self.report("move", moves, elapsed, "moves")
+        self.stdout.write(f"{'':>8}  {len(queries) / max(moves, 1):.1f} queries per move")
+
+        pages = 0
+        after = None
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            while True:
+                items, after = CollectionItem.objects.page(collection, after=after, limit=page_size)
+                pages += 1
+                if after is None:
+                    break
+            elapsed = time.perf_counter() - start
+        self.report("read", pages, elapsed, f"pages of {page_size}")
+        self.stdout.write(f"{'':>8}  {len(queries) / pages:.1f} queries per page")
+
+        start = time.perf_counter()
+        removed = 0
+        for i in range(0, count, MAX_COLLECTION_BATCH):
+            removed += CollectionItem.objects.remove_many(collection, artwork_ids[i : i + MAX_COLLECTION_BATCH])
+        self.report("remove", removed, time.perf_counter() - start, "items")
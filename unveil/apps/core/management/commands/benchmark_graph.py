@@ -0,0 +1,58 @@
+"""Measure follow graph snapshots and two-hop queries on a synthetic graph."""
+
+import time
+
+import numpy as np
+from apps.core.graph import FollowGraph
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Benchmark building, refreshing and querying an in-memory follow graph. Touches no database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--profiles", type=int, default=100_000)
+        parser.add_argument("--follows", type=int, default=50, help="Average follows per profile.")
+        parser.add_argument("--queries", type=int, default=1_000, help="Queries of each kind to time.")
+        parser.add_argument("--changed", type=int, default=1_000, help="Profiles whose follows change per refresh.")
+
+    def report(self, label, count, elapsed):
+        self.stdout.write(f"{label:>12}: {count} in {elapsed:.3f}s, {elapsed / max(count, 1) * 1000:.3f}ms each")
+
+    def edges(self, rng, sources, profiles, follows):
+        # Popularity follows a power law, as it does on the real site: a few profiles have most of the followers.
+        src = np.repeat(sources, rng.poisson(follows, len(sources)))
+        dst = (rng.pareto(1.2, len(src)) * profiles / 50).astype(np.int64) % profiles + 1
+        keep = src != dst
+        pairs = np.unique(np.stack([src[keep], dst[keep]], axis=1), axis=0)
+        return pairs[:, 0].copy(), pairs[:, 1].copy()
+
+    def handle(self, *args, **options):
+        profiles, queries = options["profiles"], options["queries"]
+        rng = np.random.default_rng(0)
+        src, dst = self.edges(rng, np.arange(1, profiles + 1), profiles, options["follows"])
+
+        start = time.perf_counter()
+        graph = FollowGraph(src, dst)
+        self.report("build", 1, time.perf_counter() - start)
+        size = sum(a.nbytes for a in (graph.src, graph.dst, graph.nodes, graph.out_indptr, graph.out_indices))
+        size += graph.in_indptr.nbytes + graph.in_indices.nbytes
+        self.stdout.write(f"{'':>12}  {len(graph)} follows, {size / 2**20:.1f} MiB")
+
+        changed = rng.choice(np.arange(1, profiles + 1), options["changed"], replace=False)
+        fresh_src, fresh_dst = self.edges(rng, changed, profiles, options["follows"])
+        start = time.perf_counter()
+        graph = graph.with_changes(changed.tolist(), zip(fresh_src.tolist(), fresh_dst.tolist()))
+        self.report("refresh", 1, time.perf_counter() - start)
+
+        sample = rng.integers(1, profiles + 1, queries).tolist()
+        for label, query in (
+            ("mutuals", graph.mutuals),
+            ("suggestions", graph.suggestions),
+            ("reach", graph.reach),
+            ("overlap", lambda pk: graph.follower_overlap(pk, pk % profiles + 1)),
+        ):
+            start = time.perf_counter()
+            for pk in sample:
+                query(pk)
+            self.report(label, queries, time.perf_counter() - start)
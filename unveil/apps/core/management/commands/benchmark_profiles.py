@@ -0,0 +1,112 @@
+"""Compare serving requests under the development and production settings profiles."""
+
+import json
+import resource
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+PROFILES = ["unveil.settings.dev", "unveil.settings.prod"]
+# Endpoints every client polls; {artwork} and {profile} are filled in from the seeded data.
+PATHS = [
+    "/artwork/ordered?start=0&limit=20",
+    "/artwork/comments/list?artwork_uuid={artwork}",
+    "/profile/summary?profile_uuid={profile}",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the same requests under each settings profile, each in a fresh process against its own test "
+        "database: throughput, bytes sent, database connections opened and RSS growth."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2_000)
+        parser.add_argument("--profiles", nargs="+", default=PROFILES, help="Settings modules to compare.")
+        parser.add_argument("--accept-encoding", default="br, gzip", help="What the simulated client accepts.")
+        parser.add_argument("--measure", action="store_true", help="Measure the current profile and print JSON.")
+
+    def handle(self, *args, **options):
+        if options["measure"]:
+            self.stdout.write(json.dumps(self.measure(options["requests"], options["accept_encoding"])))
+            return
+
+        self.stdout.write(f"{'profile':<24} {'req/s':>8} {'bytes/req':>10} {'connections':>12} {'rss +MiB':>9}")
+        for profile in options["profiles"]:
+            result = subprocess.run(
+                [
+                    sys.executable,
+                    "manage.py",
+                    "benchmark_profiles",
+                    "--measure",
+                    f"--settings={profile}",
+                    f"--requests={options['requests']}",
+                    f"--accept-encoding={options['accept_encoding']}",
+                ],
+                cwd=settings.BASE_DIR,
+                capture_output=True,
+                text=True,
+            )
+            if result.returncode:
+                raise CommandError(f"{profile} failed:\n{result.stderr}")
+            measured = json.loads(result.stdout.splitlines()[-1])
+            self.stdout.write(
+                f"{profile:<24} {measured['rate']:>8.0f} {measured['bytes']:>10.0f} {measured['connections']:>12} "
+                f"{measured['rss'] / 1024:>9.1f}"
+            )
+
+    def measure(self, count, accept_encoding):
+        from apps.core.models import Artwork, Comment, Profile
+        from apps.users.models import UserAccount
+        from apps.users.tokens import issue_tokens
+        from django.db import close_old_connections, connection
+        from django.db.backends.signals import connection_created
+        from django.test import Client
+
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            account = UserAccount.objects.create_user("benchmark@example.com", "Benchmark", "benchmark")
+            profile = Profile.objects.create(account=account)
+            artworks = Artwork.objects.bulk_create(
+                [
+                    Artwork(
+                        profile=profile,
+                        title=f"Artwork {i}",
+                        content="A benchmark artwork.",
+                        image="post_images/benchmark.jpg",
+                    )
+                    for i in range(50)
+                ]
+            )
+            Comment.objects.bulk_create([Comment(profile=profile, artwork=artworks[0], body="Nice") for _ in range(50)])
+            paths = [path.format(artwork=artworks[0].uuid, profile=profile.uuid) for path in PATHS]
+            client = Client(
+                HTTP_AUTHORIZATION=f"Bearer {issue_tokens(profile.pk)['access']}", HTTP_ACCEPT_ENCODING=accept_encoding
+            )
+            for path in paths:
+                client.get(path)
+
+            opened = []
+            connection_created.connect(lambda **kwargs: opened.append(1), weak=False)
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            sent = 0
+            start = time.perf_counter()
+            for i in range(count):
+                # The test client leaves connections alone; a real server closes them between requests unless
+                # CONN_MAX_AGE says to keep them.
+                close_old_connections()
+                sent += len(client.get(paths[i % len(paths)]).content)
+            elapsed = time.perf_counter() - start
+            return {
+                "rate": count / elapsed,
+                "bytes": sent / count,
+                "connections": len(opened),
+                "rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss,
+            }
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
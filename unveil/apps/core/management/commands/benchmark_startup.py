@@ -0,0 +1,83 @@
+"""Measure how long a fresh web worker takes to start, and how much memory it holds once it has."""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Run in a fresh interpreter, so nothing this process has already imported is counted.
+WORKER = """
+import json, os, resource, time
+start = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+boot = time.perf_counter() - start
+from django.urls import get_resolver
+get_resolver().url_patterns
+ready = time.perf_counter() - start
+print(json.dumps({"boot": boot, "ready": ready, "rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}))
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark web worker startup: the time to load the WSGI application (boot) and then the URLconf (ready), "
+        "peak RSS, and the slowest imports by -X importtime. Exits with an error past --max-boot-ms or --max-rss-mb, "
+        "so it can guard against regressions in CI."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5, help="Workers to start; the median is reported.")
+        parser.add_argument("--top", type=int, default=15, help="Slowest top-level imports to list.")
+        parser.add_argument("--max-boot-ms", type=float, help="Fail if the median boot time is higher.")
+        parser.add_argument("--max-rss-mb", type=float, help="Fail if the median peak RSS is higher.")
+
+    def worker(self, *options):
+        result = subprocess.run(
+            [sys.executable, *options, "-c", WORKER],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        return json.loads(result.stdout), result.stderr
+
+    def slowest_imports(self, importtime):
+        # Lines read "import time: self [us] | cumulative | name", nested imports indented under their parent.
+        imports = []
+        for line in importtime.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            _, cumulative, name = line.removeprefix("import time:").split("|")
+            if cumulative.strip().isdigit() and name.startswith(" ") and not name.startswith("  "):
+                imports.append((int(cumulative), name.strip()))
+        return sorted(imports, reverse=True)[: self.top]
+
+    def handle(self, *args, **options):
+        self.top = options["top"]
+        results = [self.worker()[0] for _ in range(options["runs"])]
+        boot = statistics.median(result["boot"] for result in results) * 1000
+        ready = statistics.median(result["ready"] for result in results) * 1000
+        # ru_maxrss is in kilobytes on Linux.
+        rss = statistics.median(result["rss"] for result in results) / 1024
+
+        self.stdout.write(f"settings: {os.environ['DJANGO_SETTINGS_MODULE']} (DEBUG={settings.DEBUG})")
+        self.stdout.write(f"    boot: {boot:.0f}ms")
+        self.stdout.write(f"   ready: {ready:.0f}ms")
+        self.stdout.write(f"     rss: {rss:.1f} MiB")
+        self.stdout.write("slowest imports, by -X importtime (which slows them down):")
+        _, importtime = self.worker("-X", "importtime")
+        for cumulative, name in self.slowest_imports(importtime):
+            self.stdout.write(f"  {cumulative / 1000:>8.1f}ms  {name}")
+
+        failures = []
+        if options["max_boot_ms"] is not None and boot > options["max_boot_ms"]:
+            failures.append(f"boot took {boot:.0f}ms, over {options['max_boot_ms']:.0f}ms")
+        if options["max_rss_mb"] is not None and rss > options["max_rss_mb"]:
+            failures.append(f"peak RSS was {rss:.1f} MiB, over {options['max_rss_mb']:.1f} MiB")
+        if failures:
+            raise CommandError("; ".join(failures))
@@ -0,0 +1,46 @@
+"""Measure the per-request overhead of the API rate limiter."""
+
+import time
+
+from apps.core.connections import get_redis
+from apps.core.throttling import InMemoryRateLimiter, RedisRateLimiter, TokenBucketThrottle
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+
+
+class Command(BaseCommand):
+    help = "Benchmark TokenBucketThrottle.allow_request() and fail if it exceeds the per-request budget."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=100_000)
+        parser.add_argument("--identities", type=int, default=1_000, help="Distinct client addresses to spread over.")
+        parser.add_argument("--budget-ms", type=float, default=0.1, help="Maximum mean overhead per request.")
+        parser.add_argument("--redis", action="store_true", help="Benchmark the Redis backend instead of memory.")
+
+    def handle(self, *args, **options):
+        if options["redis"]:
+            client = get_redis()
+            if client is None:
+                raise CommandError("REDIS_URL is not configured")
+            limiter = RedisRateLimiter(client)
+        else:
+            limiter = InMemoryRateLimiter()
+
+        throttle = TokenBucketThrottle("benchmark", rate="1000000/s", limiter=limiter)
+        factory = RequestFactory()
+        requests = [
+            factory.post("/artwork/create", REMOTE_ADDR=f"10.0.{i // 256 % 256}.{i % 256}")
+            for i in range(options["identities"])
+        ]
+
+        iterations = options["iterations"]
+        start = time.perf_counter()
+        for i in range(iterations):
+            throttle.allow_request(requests[i % len(requests)])
+        elapsed = time.perf_counter() - start
+
+        mean_ms = elapsed / iterations * 1000
+        backend = type(limiter).__name__
+        self.stdout.write(f"{backend}: {iterations} requests in {elapsed:.3f}s, {mean_ms * 1000:.2f}us per request")
+        if mean_ms > options["budget_ms"]:
+            raise CommandError(f"Mean overhead {mean_ms:.4f}ms exceeds budget of {options['budget_ms']}ms")
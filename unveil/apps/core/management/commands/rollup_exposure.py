@@ -0,0 +1,15 @@
+"""Roll up new views into the exposure ledger."""
+
+from apps.core import exposure
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Add views since the last rollup to the per-artist exposure ledger."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rebuild", action="store_true", help="Recompute the ledger from every view.")
+
+    def handle(self, *args, **options):
+        counted = exposure.rollup(rebuild=options["rebuild"])
+        self.stdout.write(f"Counted {counted} view(s)")
@@ -0,0 +1,38 @@
+"""Run background jobs from the job queue."""
+
+import signal
+import threading
+
+import django
+from apps.core.jobs import Worker, get_broker
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import autodiscover_modules
+
+
+def _init_process():
+    """Prepare a pool process to run jobs."""
+    django.setup()
+    autodiscover_modules("tasks")
+
+
+class Command(BaseCommand):
+    help = "Run a worker that executes jobs enqueued with @task."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=4, help="Jobs to run at once.")
+        parser.add_argument("--pool", choices=["thread", "process"], default="thread")
+
+    def handle(self, *args, **options):
+        autodiscover_modules("tasks")
+
+        stop_event = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stop_event.set())
+
+        broker = get_broker()
+        self.stdout.write(
+            f"Worker started with {options['concurrency']} {options['pool']}(s) on {type(broker).__name__}"
+        )
+        worker = Worker(broker, concurrency=options["concurrency"], pool=options["pool"])
+        worker.run(stop_event, initializer=_init_process)
+        self.stdout.write("Worker stopped")
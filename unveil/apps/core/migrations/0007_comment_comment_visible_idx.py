@@ -0,0 +1,21 @@
+# Generated by Django 5.1.1 on 2026-10-19 18:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0006_auto_20240926_1143"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                condition=models.Q(("is_censored", False)),
+                fields=["artwork", "-created_at", "-id"],
+                name="comment_visible_idx",
+            ),
+        ),
+    ]
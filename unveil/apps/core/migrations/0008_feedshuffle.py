@@ -0,0 +1,41 @@
+# Generated by Django 5.1.1 on 2026-10-19 18:29
+
+import apps.core.models
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0007_comment_comment_visible_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FeedShuffle",
+            fields=[
+                (
+                    "profile",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="feed_shuffle",
+                        serialize=False,
+                        to="core.profile",
+                    ),
+                ),
+                ("seed", models.BigIntegerField(default=apps.core.models.new_seed)),
+                (
+                    "bits",
+                    models.PositiveSmallIntegerField(default=0, help_text="Size of the permuted id domain, in bits."),
+                ),
+                ("position", models.BigIntegerField(default=0)),
+                ("modified_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Feed Shuffle",
+                "verbose_name_plural": "Feed Shuffles",
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.1.1 on 2026-10-19 18:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0008_feedshuffle"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArtistExposure",
+            fields=[
+                (
+                    "profile",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="exposure",
+                        serialize=False,
+                        to="core.profile",
+                    ),
+                ),
+                ("view_count", models.BigIntegerField(default=0)),
+                ("modified_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Artist Exposure",
+                "verbose_name_plural": "Artist Exposure",
+            },
+        ),
+        migrations.CreateModel(
+            name="ExposureRollup",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "last_view_id",
+                    models.BigIntegerField(default=0, help_text="Views up to this id are counted in the ledger."),
+                ),
+                ("modified_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Exposure Rollup",
+                "verbose_name_plural": "Exposure Rollups",
+            },
+        ),
+    ]
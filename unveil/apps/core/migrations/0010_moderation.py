@@ -0,0 +1,173 @@
+# Generated by Django 5.1.1 on 2026-10-19 18:36
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0009_exposure"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="artwork",
+            name="is_censored",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name="ModerationCase",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("uuid", models.UUIDField(default=uuid.uuid4, unique=True)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("OP", "Open"), ("CL", "Claimed"), ("RE", "Resolved")], default="OP", max_length=2
+                    ),
+                ),
+                ("report_count", models.PositiveIntegerField(default=0)),
+                ("first_reported_at", models.DateTimeField(auto_now_add=True)),
+                ("last_reported_at", models.DateTimeField(auto_now_add=True)),
+                ("claimed_at", models.DateTimeField(blank=True, null=True)),
+                ("resolved_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "action",
+                    models.CharField(
+                        blank=True,
+                        choices=[("CEN", "Censored"), ("UNC", "Uncensored"), ("DIS", "Dismissed")],
+                        max_length=3,
+                    ),
+                ),
+                (
+                    "artwork",
+                    models.ForeignKey(
+                        blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to="core.artwork"
+                    ),
+                ),
+                (
+                    "claimed_by",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="claimed_cases",
+                        to="core.profile",
+                    ),
+                ),
+                (
+                    "comment",
+                    models.ForeignKey(
+                        blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to="core.comment"
+                    ),
+                ),
+                (
+                    "profile",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="moderation_cases",
+                        to="core.profile",
+                    ),
+                ),
+                (
+                    "resolved_by",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="resolved_cases",
+                        to="core.profile",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Moderation Case",
+                "verbose_name_plural": "Moderation Cases",
+            },
+        ),
+        migrations.CreateModel(
+            name="Report",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("uuid", models.UUIDField(default=uuid.uuid4, unique=True)),
+                (
+                    "reason",
+                    models.CharField(
+                        choices=[
+                            ("SPA", "Spam"),
+                            ("ABU", "Harassment or abuse"),
+                            ("EXP", "Explicit content"),
+                            ("COP", "Copyright infringement"),
+                            ("OTH", "Other"),
+                        ],
+                        default="OTH",
+                        max_length=3,
+                    ),
+                ),
+                ("details", models.TextField(blank=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "case",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="reports", to="core.moderationcase"
+                    ),
+                ),
+                (
+                    "reporter",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="reports_made", to="core.profile"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Report",
+                "verbose_name_plural": "Reports",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="moderationcase",
+            index=models.Index(
+                condition=models.Q(("status", "OP")),
+                fields=["-report_count", "first_reported_at"],
+                name="moderation_queue_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="moderationcase",
+            index=models.Index(
+                condition=models.Q(("status", "CL")), fields=["claimed_at"], name="moderation_claimed_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="moderationcase",
+            constraint=models.CheckConstraint(
+                condition=models.Q(
+                    models.Q(("artwork__isnull", False), ("comment__isnull", True), ("profile__isnull", True)),
+                    models.Q(("artwork__isnull", True), ("comment__isnull", False), ("profile__isnull", True)),
+                    models.Q(("artwork__isnull", True), ("comment__isnull", True), ("profile__isnull", False)),
+                    _connector="OR",
+                ),
+                name="moderation_case_one_target",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="moderationcase",
+            constraint=models.UniqueConstraint(fields=("artwork",), name="unique_artwork_case"),
+        ),
+        migrations.AddConstraint(
+            model_name="moderationcase",
+            constraint=models.UniqueConstraint(fields=("comment",), name="unique_comment_case"),
+        ),
+        migrations.AddConstraint(
+            model_name="moderationcase",
+            constraint=models.UniqueConstraint(fields=("profile",), name="unique_profile_case"),
+        ),
+        migrations.AddConstraint(
+            model_name="report",
+            constraint=models.UniqueConstraint(fields=("case", "reporter"), name="unique_report"),
+        ),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 5.1.1 on 2026-10-19 18:38
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0010_moderation"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Collection",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("uuid", models.UUIDField(default=uuid.uuid4, unique=True)),
+                ("title", models.CharField(max_length=60)),
+                ("description", models.TextField(blank=True)),
+                ("is_public", models.BooleanField(default=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("modified_at", models.DateTimeField(auto_now=True)),
+                (
+                    "profile",
+                    models.ForeignKey(
+                        help_text="The curator.",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="collections",
+                        to="core.profile",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Collection",
+                "verbose_name_plural": "Collections",
+                "ordering": ["-created_at"],
+            },
+        ),
+        migrations.CreateModel(
+            name="CollectionItem",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "position",
+                    models.BigIntegerField(help_text="Ordering key; gapped so that moves touch a single row."),
+                ),
+                ("added_at", models.DateTimeField(auto_now_add=True)),
+                ("artwork", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to="core.artwork")),
+                (
+                    "collection",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="items", to="core.collection"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Collection Item",
+                "verbose_name_plural": "Collection Items",
+            },
+        ),
+        migrations.AddField(
+            model_name="collection",
+            name="artworks",
+            field=models.ManyToManyField(related_name="collections", through="core.CollectionItem", to="core.artwork"),
+        ),
+        migrations.AddIndex(
+            model_name="collectionitem",
+            index=models.Index(fields=["collection", "position"], name="collection_position_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="collectionitem",
+            constraint=models.UniqueConstraint(fields=("collection", "artwork"), name="unique_collection_item"),
+        ),
+        migrations.AddConstraint(
+            model_name="collection",
+            constraint=models.UniqueConstraint(fields=("profile", "title"), name="unique_collection"),
+        ),
+    ]
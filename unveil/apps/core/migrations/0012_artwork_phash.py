@@ -0,0 +1,38 @@
+# Generated by Django 5.1.1 on 2026-10-19 18:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0011_collections"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="artwork",
+            name="phash",
+            field=models.BigIntegerField(blank=True, help_text="Perceptual hash of the image.", null=True),
+        ),
+        migrations.AddField(
+            model_name="artwork",
+            name="phash_0",
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="artwork",
+            name="phash_1",
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="artwork",
+            name="phash_2",
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="artwork",
+            name="phash_3",
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+    ]
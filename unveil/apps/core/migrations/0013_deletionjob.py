@@ -0,0 +1,40 @@
+# Generated by Django 5.1.1 on 2026-10-19 18:42
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0012_artwork_phash"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DeletionJob",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("uuid", models.UUIDField(default=uuid.uuid4, unique=True)),
+                ("kind", models.CharField(choices=[("ACC", "Account"), ("ART", "Artwork")], max_length=3)),
+                ("target_id", models.BigIntegerField()),
+                ("requested_by", models.BigIntegerField(help_text="Primary key of the requesting account.")),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("PEN", "Pending"), ("RUN", "Running"), ("DON", "Done"), ("FAI", "Failed")],
+                        default="PEN",
+                        max_length=3,
+                    ),
+                ),
+                ("progress", models.JSONField(blank=True, default=dict, help_text="Rows deleted so far, by model.")),
+                ("error", models.TextField(blank=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "verbose_name": "Deletion Job",
+                "verbose_name_plural": "Deletion Jobs",
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.1.1 on 2026-10-19 18:47
+
+from django.db import migrations, models
+
+
+def copy_artist_active(apps, schema_editor):
+    Artwork = apps.get_model("core", "Artwork")
+    Artwork.objects.filter(profile__account__is_active=False).update(is_artist_active=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0013_deletionjob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="artwork",
+            name="is_artist_active",
+            field=models.BooleanField(default=True, help_text="Whether the artist's account is active."),
+        ),
+        migrations.AddField(
+            model_name="artwork",
+            name="is_deleted",
+            field=models.BooleanField(default=False, help_text="Deleted by its artist, and awaiting removal."),
+        ),
+        migrations.RunPython(copy_artist_active, reverse_code=migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="artwork",
+            index=models.Index(
+                condition=models.Q(("is_artist_active", True), ("is_censored", False), ("is_deleted", False)),
+                fields=["-created_at", "-id"],
+                name="artwork_feed_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="artwork",
+            index=models.Index(
+                condition=models.Q(("is_artist_active", True), ("is_deleted", False)),
+                fields=["profile", "-created_at"],
+                name="artwork_profile_visible_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.1 on 2026-10-19 18:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0014_artwork_visibility"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="follow",
+            index=models.Index(fields=["followed_profile", "-created_at", "-id"], name="follow_followers_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="follow",
+            index=models.Index(fields=["following_profile", "-created_at", "-id"], name="follow_following_idx"),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.1 on 2026-10-19 18:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0015_follow_list_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FollowChange",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("profile_id", models.BigIntegerField(help_text="The profile whose follows changed.")),
+                ("created_at", models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                "verbose_name": "Follow change",
+                "verbose_name_plural": "Follow changes",
+            },
+        ),
+    ]
@@ -0,0 +1,98 @@
+# Generated by Django 5.1.1 on 2026-10-19 18:56
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0016_followchange"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="NotificationInbox",
+            fields=[
+                (
+                    "profile",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="inbox",
+                        serialize=False,
+                        to="core.profile",
+                    ),
+                ),
+                ("unread_count", models.IntegerField(default=0)),
+                ("modified_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "Notification Inbox",
+                "verbose_name_plural": "Notification Inboxes",
+            },
+        ),
+        migrations.CreateModel(
+            name="Notification",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("uuid", models.UUIDField(default=uuid.uuid4, unique=True)),
+                (
+                    "kind",
+                    models.CharField(choices=[("COM", "Comment"), ("LIK", "Like"), ("FOL", "Follow")], max_length=3),
+                ),
+                (
+                    "actor_count",
+                    models.PositiveIntegerField(default=0, help_text="How many times it happened in the burst."),
+                ),
+                (
+                    "key",
+                    models.CharField(
+                        help_text="The kind, artwork and time window that bursts are grouped by.", max_length=64
+                    ),
+                ),
+                ("is_read", models.BooleanField(default=False)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("modified_at", models.DateTimeField(auto_now=True)),
+                (
+                    "artwork",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="notifications",
+                        to="core.artwork",
+                    ),
+                ),
+                (
+                    "last_actor",
+                    models.ForeignKey(
+                        blank=True,
+                        help_text="Who acted last.",
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="core.profile",
+                    ),
+                ),
+                (
+                    "recipient",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="notifications", to="core.profile"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Notification",
+                "verbose_name_plural": "Notifications",
+                "indexes": [
+                    models.Index(fields=["recipient", "-modified_at", "-id"], name="notification_inbox_idx"),
+                    models.Index(
+                        condition=models.Q(("is_read", False)), fields=["recipient"], name="notification_unread_idx"
+                    ),
+                ],
+                "constraints": [models.UniqueConstraint(fields=("recipient", "key"), name="unique_notification")],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.1 on 2026-10-19 19:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0017_notifications"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="feedshuffle",
+            name="carried",
+            field=models.JSONField(
+                blank=True,
+                default=list,
+                help_text="Ids of artworks the walk passed that weighted sampling has not picked yet.",
+            ),
+        ),
+    ]
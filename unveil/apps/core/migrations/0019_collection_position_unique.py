@@ -0,0 +1,47 @@
+# Generated by Django 5.1.1 on 2026-10-19 19:24
+
+import django.db.models.constraints
+from django.db import migrations, models
+from django.db.models import Count
+
+COLLECTION_POSITION_GAP = 1 << 20
+
+
+def renumber_tied_positions(apps, schema_editor):
+    # Concurrent adds could give items the same position; spread those collections back out before it must be unique.
+    CollectionItem = apps.get_model("core", "CollectionItem")
+    tied = (
+        CollectionItem.objects.values("collection_id", "position")
+        .annotate(items=Count("pk"))
+        .filter(items__gt=1)
+        .values_list("collection_id", flat=True)
+        .distinct()
+    )
+    for collection_id in set(tied):
+        items = list(CollectionItem.objects.filter(collection_id=collection_id).order_by("position", "pk"))
+        for i, item in enumerate(items, start=1):
+            item.position = COLLECTION_POSITION_GAP * i
+        CollectionItem.objects.bulk_update(items, ["position"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0018_feedshuffle_carried"),
+    ]
+
+    operations = [
+        migrations.RunPython(renumber_tied_positions, reverse_code=migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="collectionitem",
+            constraint=models.UniqueConstraint(
+                deferrable=django.db.models.constraints.Deferrable["DEFERRED"],
+                fields=("collection", "position"),
+                name="unique_collection_position",
+            ),
+        ),
+        migrations.RemoveIndex(
+            model_name="collectionitem",
+            name="collection_position_idx",
+        ),
+    ]
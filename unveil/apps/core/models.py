@@ -1,13 +1,60 @@
 """Models for the unveil core app."""
 
+import secrets
 import uuid
-from random import randint
-
-from django.db import models
-from django.db.models import Max
+from collections import Counter, defaultdict
+
+from apps.core import imagehash
+from apps.core.pagination import DEFAULT_PAGE_SIZE, before_cursor, paginate_values
+from apps.core.shuffle import FeistelPermutation, domain_bits, walk, weighted_sample
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Count, Max, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 from django.utils.translation import gettext_lazy as _
 
 
+def _count_per_profile(queryset, field):
+    """Return a scalar subquery counting the rows of `queryset` whose `field` is the outer profile."""
+    rows = (
+        queryset.filter(**{field: OuterRef("pk")}).order_by().values(field).annotate(count=Count("pk")).values("count")
+    )
+    return Coalesce(Subquery(rows), 0)
+
+
+def _lock_profiles(profile_ids, using=None):
+    """Lock the rows of `profile_ids` until the current transaction ends, in primary key order to avoid deadlocks."""
+    list(Profile.objects.using(using).select_for_update().filter(pk__in=profile_ids).order_by("pk").values_list("pk"))
+
+
+class ProfileQuerySet(models.QuerySet):
+    """Custom QuerySet for the Profile model."""
+
+    def with_summary(self):
+        """Annotate each profile with what its profile page shows, in a single query.
+
+        Adds `follower_count`, `following_count`, `likes_count`, `dislikes_count` and `artwork_count`. Each is a
+        correlated subquery on an indexed foreign key rather than a join, so the counts don't multiply each other.
+        `artwork_count` counts only artworks others can see.
+
+        Usage:
+
+        ```python
+        profile = Profile.objects.with_summary().get(uuid=profile_uuid)
+        profile.follower_count
+        ```
+        """
+        return self.annotate(
+            follower_count=_count_per_profile(Follow.objects.all(), "followed_profile"),
+            following_count=_count_per_profile(Follow.objects.all(), "following_profile"),
+            likes_count=_count_per_profile(Sentiment.objects.filter(status=Sentiment.LikeChoices.LIKE), "profile"),
+            dislikes_count=_count_per_profile(
+                Sentiment.objects.filter(status=Sentiment.LikeChoices.DISLIKE), "profile"
+            ),
+            artwork_count=_count_per_profile(Artwork.objects.filter(is_censored=False), "profile"),
+        )
+
+
 class Profile(models.Model):
     """Model for user profiles."""
 
@@ -44,6 +91,8 @@ class Profile(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     modified_at = models.DateTimeField(auto_now=True)
 
+    objects = ProfileQuerySet.as_manager()
+
     class Meta:
         """Meta class for the Profile model."""
 
@@ -63,11 +112,95 @@ class Profile(models.Model):
 
     def get_likes_count(self):
         """Get the number of likes that the profile has given."""
-        return self.sentiment.filter(status=Sentiment.LikeChoices.LIKE).count()
+        return self.profile_sentiment.filter(status=Sentiment.LikeChoices.LIKE).count()
 
     def get_dislikes_count(self):
         """Get the number of dislikes that the profile has given."""
-        return self.sentiment.filter(status=Sentiment.LikeChoices.DISLIKE).count()
+        return self.profile_sentiment.filter(status=Sentiment.LikeChoices.DISLIKE).count()
+
+
+class FollowQuerySet(models.QuerySet):
+    """Custom QuerySet for the Follow model."""
+
+    def upsert(self, following_profile_id, followed_profile_id):
+        """Follow a profile, doing nothing if the follow already exists.
+
+        Issues a single `INSERT ... ON CONFLICT DO NOTHING`, so repeated calls are cheap and never raise
+        IntegrityError from the `unique_following` constraint.
+        """
+        self.upsert_many([Follow(following_profile_id=following_profile_id, followed_profile_id=followed_profile_id)])
+
+    def upsert_many(self, follows):
+        """Insert many unsaved Follow objects in one statement, skipping any that already exist.
+
+        `bulk_create` sends no signals, so the affected cache tags are invalidated, the follow graph told, and the
+        followed profiles notified here. Concurrent calls for the same followers take turns.
+        """
+        from apps.core.graph import record_changes
+        from apps.core.notifications import notify
+        from apps.core.signals import invalidate
+
+        with transaction.atomic(using=self.db):
+            # Conflicting rows are skipped without a trace, so look up which follows already exist to notify only new
+            # ones, with the followers locked so that a concurrent repeat cannot also find none.
+            _lock_profiles({follow.following_profile_id for follow in follows}, using=self.db)
+            existing = set(
+                self.filter(
+                    following_profile__in={follow.following_profile_id for follow in follows},
+                    followed_profile__in={follow.followed_profile_id for follow in follows},
+                ).values_list("following_profile_id", "followed_profile_id")
+            )
+            follows = self.bulk_create(follows, ignore_conflicts=True)
+            record_changes(follow.following_profile_id for follow in follows)
+        invalidate(*follows)
+        notify(
+            (follow.followed_profile_id, Notification.Kind.FOLLOW, None, follow.following_profile_id)
+            for follow in follows
+            if (follow.following_profile_id, follow.followed_profile_id) not in existing
+        )
+        return follows
+
+    def page(self, profile_id, followers=True, viewer_id=None, cursor=None, limit=DEFAULT_PAGE_SIZE):
+        """Return a page of a profile's followers, or of the profiles it follows, plus the cursor for the next page.
+
+        Pages are ordered by when the follow was made, newest first, and read through the composite indexes on
+        Follow. Rows carry only what a list shows: the other profile's uuid, name and picture, when the follow was
+        made, and `following`, whether `viewer_id` follows that profile, which is looked up for the whole page in one
+        more query. Deactivated accounts are left out. Raises ValueError for an invalid cursor.
+
+        Usage:
+
+        ```python
+        rows, next_cursor = Follow.objects.page(profile.pk, followers=True, viewer_id=request.user.pk)
+        ```
+        """
+        mine, other = (
+            ("followed_profile", "following_profile") if followers else ("following_profile", "followed_profile")
+        )
+        follows = self.filter(**{mine: profile_id, f"{other}__account__is_active": True}).values(
+            "id", "created_at", other, f"{other}__uuid", f"{other}__account__name", f"{other}__profile_picture"
+        )
+        rows, next_cursor = paginate_values(follows, cursor=cursor, limit=limit)
+
+        followed = set()
+        if viewer_id is not None and rows:
+            followed = set(
+                self.filter(following_profile=viewer_id, followed_profile__in=[row[other] for row in rows]).values_list(
+                    "followed_profile", flat=True
+                )
+            )
+        storage = Profile._meta.get_field("profile_picture").storage
+        page = [
+            {
+                "profile_uuid": row[f"{other}__uuid"],
+                "name": row[f"{other}__account__name"],
+                "profile_picture": storage.url(picture) if (picture := row[f"{other}__profile_picture"]) else None,
+                "followed_at": row["created_at"],
+                "following": row[other] in followed,
+            }
+            for row in rows
+        ]
+        return page, next_cursor
 
 
 class Follow(models.Model):
@@ -80,6 +213,8 @@ class Follow(models.Model):
 
     is_favorite = models.BooleanField(default=False)
 
+    objects = FollowQuerySet.as_manager()
+
     class Meta:
         """Meta class for the Follow model."""
 
@@ -89,11 +224,101 @@ class Follow(models.Model):
         constraints = [
             models.UniqueConstraint(fields=["following_profile", "followed_profile"], name="unique_following")
         ]
+        indexes = [
+            models.Index(fields=["followed_profile", "-created_at", "-id"], name="follow_followers_idx"),
+            models.Index(fields=["following_profile", "-created_at", "-id"], name="follow_following_idx"),
+        ]
 
     def __str__(self):
         return f"{self.following_profile} follows {self.followed_profile}"
 
 
+class FollowChange(models.Model):
+    """A log of profiles whose follows changed, read by the in-memory follow graph (see `apps.core.graph`)."""
+
+    # Not a foreign key: the change outlives a deleted profile, whose follows it removes from the graph.
+    profile_id = models.BigIntegerField(help_text=_("The profile whose follows changed."))
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        """Meta class for the FollowChange model."""
+
+        verbose_name = "Follow change"
+        verbose_name_plural = "Follow changes"
+
+    def __str__(self):
+        return f"Follows of profile {self.profile_id} changed at {self.created_at}"
+
+
+class SentimentQuerySet(models.QuerySet):
+    """Custom QuerySet for the Sentiment model."""
+
+    def upsert(self, profile_id, artwork_id, status):
+        """Set the profile's sentiment about an artwork, creating or switching it as needed.
+
+        Issues a single `INSERT ... ON CONFLICT DO UPDATE` against the `unique_sentiment` constraint, so retries
+        and double-taps are idempotent and a like can be switched to a dislike (or back) in one round trip.
+        """
+        (sentiment,) = self.upsert_many([Sentiment(profile_id=profile_id, artwork_id=artwork_id, status=status)])
+        return sentiment
+
+    def upsert_many(self, sentiments):
+        """Create or update many unsaved Sentiment objects in one statement.
+
+        Each (profile, artwork) pair may appear only once per call; PostgreSQL refuses to update the same row twice
+        within a single `ON CONFLICT DO UPDATE`. `bulk_create` sends no signals, so the affected cache tags are
+        invalidated, the artists of newly liked artworks notified, and the changed counts pushed to live
+        subscribers, here. Concurrent calls for the same profiles take turns, so that each sees what the one before
+        it wrote.
+        """
+        from apps.core import live
+        from apps.core.notifications import notify_artists
+        from apps.core.signals import invalidate
+
+        with transaction.atomic(using=self.db):
+            # What each pair was before tells the change in counts; a repeated like (a retry or double tap) changes
+            # nothing, and does not notify the artist again. A row not yet written cannot be locked, so two
+            # double-taps would both see none and both count; the profiles are locked instead, until the upsert
+            # commits.
+            _lock_profiles({sentiment.profile_id for sentiment in sentiments}, using=self.db)
+            previous = {
+                (profile_id, artwork_id): status
+                for profile_id, artwork_id, status in self.filter(
+                    profile__in={sentiment.profile_id for sentiment in sentiments},
+                    artwork__in={sentiment.artwork_id for sentiment in sentiments},
+                ).values_list("profile_id", "artwork_id", "status")
+            }
+            changed = [
+                sentiment
+                for sentiment in sentiments
+                if previous.get((sentiment.profile_id, sentiment.artwork_id)) != sentiment.status
+            ]
+            sentiments = self.bulk_create(
+                sentiments,
+                update_conflicts=True,
+                unique_fields=["profile", "artwork"],
+                update_fields=["status"],
+            )
+        invalidate(*sentiments)
+        notify_artists(
+            Notification.Kind.LIKE,
+            (
+                (sentiment.artwork_id, sentiment.profile_id)
+                for sentiment in changed
+                if sentiment.status == Sentiment.LikeChoices.LIKE
+            ),
+        )
+        counters = {Sentiment.LikeChoices.LIKE: "likes", Sentiment.LikeChoices.DISLIKE: "dislikes"}
+        deltas = defaultdict(Counter)
+        for sentiment in changed:
+            deltas[sentiment.artwork_id][counters[sentiment.status]] += 1
+            was = previous.get((sentiment.profile_id, sentiment.artwork_id))
+            if was is not None:
+                deltas[sentiment.artwork_id][counters[was]] -= 1
+        live.publish(deltas)
+        return sentiments
+
+
 class Sentiment(models.Model):
     """A Through-Model for sentiment about an artwork.
 
@@ -119,6 +344,8 @@ class Sentiment(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = SentimentQuerySet.as_manager()
+
     class Meta:
         """Meta class for the Sentiment model."""
 
@@ -154,7 +381,14 @@ class Comment(models.Model):
         verbose_name = "Comment"
         verbose_name_plural = "Comments"
         ordering = ["-created_at"]
-        indexes = [models.Index(fields=["created_at"])]
+        indexes = [
+            models.Index(fields=["created_at"]),
+            models.Index(
+                fields=["artwork", "-created_at", "-id"],
+                condition=models.Q(is_censored=False),
+                name="comment_visible_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.profile} commented on {self.artwork}"
@@ -179,11 +413,95 @@ class View(models.Model):
         return f"{self.profile} viewed {self.artwork}"
 
 
+class ArtistExposure(models.Model):
+    """How many views an artist's artworks have received, rolled up from View rows (see `apps.core.exposure`)."""
+
+    profile = models.OneToOneField("core.Profile", on_delete=models.CASCADE, primary_key=True, related_name="exposure")
+
+    view_count = models.BigIntegerField(default=0)
+
+    modified_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        """Meta class for the ArtistExposure model."""
+
+        verbose_name = "Artist Exposure"
+        verbose_name_plural = "Artist Exposure"
+
+    def __str__(self):
+        return f"{self.profile_id} seen {self.view_count} times"
+
+
+class ExposureRollup(models.Model):
+    """The single row recording how far the exposure ledger has been rolled up."""
+
+    last_view_id = models.BigIntegerField(default=0, help_text=_("Views up to this id are counted in the ledger."))
+
+    modified_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        """Meta class for the ExposureRollup model."""
+
+        verbose_name = "Exposure Rollup"
+        verbose_name_plural = "Exposure Rollups"
+
+    def __str__(self):
+        return f"Exposure rolled up to view {self.last_view_id}"
+
+
+# Positions examined per query, as a multiple of the page size, and the most queries one random page may take.
+SHUFFLE_BATCH_FACTOR = 16
+SHUFFLE_MAX_BATCHES = 8
+
+
+def new_seed():
+    """Return a fresh seed for a profile's random feed."""
+    return secrets.randbits(63)
+
+
+class FeedShuffle(models.Model):
+    """The state of a profile's walk through the random feed: a seed, a position, and what the walk has turned up that
+    was not served yet."""
+
+    profile = models.OneToOneField(
+        "core.Profile", on_delete=models.CASCADE, primary_key=True, related_name="feed_shuffle"
+    )
+
+    seed = models.BigIntegerField(default=new_seed)
+    bits = models.PositiveSmallIntegerField(default=0, help_text=_("Size of the permuted id domain, in bits."))
+    position = models.BigIntegerField(default=0)
+    carried = models.JSONField(
+        default=list,
+        blank=True,
+        help_text=_("Ids of artworks the walk passed that weighted sampling has not picked yet."),
+    )
+
+    modified_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        """Meta class for the FeedShuffle model."""
+
+        verbose_name = "Feed Shuffle"
+        verbose_name_plural = "Feed Shuffles"
+
+    def __str__(self):
+        return f"Random feed of {self.profile_id} at {self.position}"
+
+
 class ArtworkQuerySet(models.QuerySet):
     """Custom QuerySet for the Artwork model."""
 
-    def get_random_artwork_for_profile(self, profile, limit=5):
-        """Get a random artwork that the profile has not viewed.
+    def get_random_artwork_for_profile(self, profile, limit=5, boost_underexposed=None):
+        """Get random artworks that the profile has not viewed.
+
+        Each profile walks its own seeded permutation of the artwork id space (see `apps.core.shuffle`), so nothing
+        repeats within a pass. The walk's state is just a seed and a position, stored in the profile's FeedShuffle row.
+
+        With `boost_underexposed`, the page is drawn from each batch of the walk by weighted sampling rather than
+        taken in walk order. An artwork's weight is inversely proportional to its artist's exposure and to how many
+        of that artist's artworks are in the batch, so every artist in a batch gets an equal share before exposure
+        tips it toward the less seen. Artworks a batch leaves unpicked are carried over (in `FeedShuffle.carried`)
+        into the next batch's sample, so that the walk does not pass them by, and are all served before the next pass.
 
         Usage:
 
@@ -192,26 +510,91 @@ class ArtworkQuerySet(models.QuerySet):
         # or
         profile = request.user.profile
 
-        artwork = Artwork.objects.get_random_for_profile(profile, limit=5)
+        artworks = Artwork.objects.get_random_artwork_for_profile(profile, limit=5)
         ```
         """
-        max_id = self.all().aggregate(max_id=Max("id"))["max_id"] or 1
-        print(f"Max ID: {max_id}")
+        if boost_underexposed is None:
+            boost_underexposed = settings.FEED_BOOST_UNDEREXPOSED
+        max_id = self.aggregate(max_id=Max("id"))["max_id"]
+        if max_id is None:
+            return []
+        queryset = (
+            self.annotate(artist_views=Coalesce("profile__exposure__view_count", 0)) if boost_underexposed else self
+        )
+
         artwork_list = []
-        run_count = 0
-        while True:
-            run_count += 1
-            pk = randint(1, max_id)
-            artwork = self.filter(pk=pk).filter(viewed_by=profile).first()
-            if artwork:
-                artwork_list.append(artwork)
-            # Break if the loop runs for too long (e.g. all artworks have been viewed) or if the limit is reached
-            if run_count == limit * 3 or len(artwork_list) == limit:
-                break
+        with transaction.atomic():
+            state, _ = FeedShuffle.objects.select_for_update().get_or_create(profile=profile)
+            bits = domain_bits(max_id)
+            if state.bits < bits:
+                # The id space outgrew the domain, so start a walk over a larger one.
+                state.bits, state.seed, state.position = bits, new_seed(), 0
+            permutation = FeistelPermutation(state.seed, state.bits)
+            batch_size = limit * SHUFFLE_BATCH_FACTOR
+            passes = 0
+
+            for _ in range(SHUFFLE_MAX_BATCHES):
+                # Artworks still carried belong to this pass, so they are served before another starts.
+                if state.position >= permutation.size and not (boost_underexposed and state.carried):
+                    # End of the pass: start another with a fresh seed. Viewed artworks stay excluded, so this only
+                    # surfaces artworks that were inserted behind the position or skipped by the client.
+                    passes += 1
+                    if passes > 1:
+                        break
+                    state.seed, state.position = new_seed(), 0
+                    permutation = FeistelPermutation(state.seed, state.bits)
+
+                # A page that runs into a new pass must not repeat what it already holds.
+                served = {artwork.pk for artwork in artwork_list}
+                carried = [pk for pk in state.carried if pk not in served] if boost_underexposed else []
+                # The sample is drawn from about a batch, the carried artworks first; at least a page's worth of new
+                # positions is walked each time, so the walk keeps moving.
+                walked = max(limit, batch_size - len(carried))
+                skip = served.union(carried)
+                candidates = [(None, pk) for pk in carried] + [
+                    (pos, pk)
+                    for pos, pk in walk(permutation, state.position, walked)
+                    if pk <= max_id and pk not in skip
+                ]
+                end_position = min(state.position + walked, permutation.size)
+                available = (
+                    queryset.filter(pk__in=[pk for _, pk in candidates], is_censored=False)
+                    .exclude(viewed_by=profile)
+                    .in_bulk()
+                )
+
+                if boost_underexposed:
+                    artworks = [available[pk] for _, pk in candidates if pk in available]
+                    per_artist = Counter(artwork.profile_id for artwork in artworks)
+                    weights = [1 / ((a.artist_views + 1) * per_artist[a.profile_id]) for a in artworks]
+                    picked = weighted_sample(artworks, weights, limit - len(artwork_list))
+                    artwork_list.extend(picked)
+                    picked_pks = {artwork.pk for artwork in picked}
+                    state.carried = [artwork.pk for artwork in artworks if artwork.pk not in picked_pks]
+                    state.position = end_position
+                    if len(artwork_list) == limit:
+                        break
+                    continue
+
+                for pos, pk in candidates:
+                    if pk in available:
+                        artwork_list.append(available[pk])
+                        if len(artwork_list) == limit:
+                            # Resume right after the last artwork served; the rest of the batch is re-checked later.
+                            end_position = pos + 1
+                            break
+                state.position = end_position
+                if len(artwork_list) == limit:
+                    break
+
+            state.save(update_fields=["seed", "bits", "position", "carried", "modified_at"])
         return artwork_list
 
-    def get_ordered_artwork_for_profile(self, profile, start=0, limit=5):
-        """Get unseen artworks for the profile in chronological order.
+    def get_ordered_artwork_for_profile(self, profile, start=0, limit=5, cursor=None):
+        """Get unseen artworks for the profile, newest first.
+
+        Page by offset with `start`, or by keyset with a `cursor` from `apps.core.pagination`, which stays stable as
+        the profile views artworks and doesn't slow down with depth. Raises ValueError for an invalid cursor.
 
         Usage:
 
@@ -220,10 +603,40 @@ class ArtworkQuerySet(models.QuerySet):
         # or
         profile = request.user.profile
 
-        artworks = Artwork.objects.get_artwork_for_profile(profile, start=0, limit=5)
+        artworks = Artwork.objects.get_ordered_artwork_for_profile(profile, start=0, limit=5)
         ```
         """
-        return self.exclude(viewed_by=profile)[start : start + limit]
+        queryset = self.filter(is_censored=False).exclude(viewed_by=profile).order_by("-created_at", "-id")
+        if cursor:
+            return queryset.filter(before_cursor(cursor))[:limit]
+        return queryset[start : start + limit]
+
+    def get_near_duplicates(self, phash, max_distance=6):
+        """Get artworks whose perceptual hash is within `max_distance` bits of `phash`, closest first.
+
+        Returns `(artwork, distance)` pairs. Candidates come from the indexed hash segments (see
+        `apps.core.imagehash`), so the cost depends on how many images are similar, not on how many there are.
+        `max_distance` may be at most `imagehash.MAX_DISTANCE`.
+
+        Usage:
+
+        ```python
+        duplicates = Artwork.objects.exclude(pk=artwork.pk).get_near_duplicates(artwork.phash)
+        ```
+        """
+        if max_distance > imagehash.MAX_DISTANCE:
+            raise ValueError(f"max_distance may be at most {imagehash.MAX_DISTANCE}")
+        value = imagehash.to_unsigned(phash)
+        flips = max_distance // imagehash.SEGMENTS
+        probes = Q()
+        for i, segment in enumerate(imagehash.segments(value)):
+            probes |= Q(**{f"phash_{i}__in": imagehash.neighbours(segment, flips)})
+        matches = []
+        for artwork in self.filter(probes):
+            artwork_distance = imagehash.distance(artwork.phash, value)
+            if artwork_distance <= max_distance:
+                matches.append((artwork, artwork_distance))
+        return sorted(matches, key=lambda match: match[1])
 
     def get_popular(self):
         """Get the most popular artworks."""
@@ -234,6 +647,17 @@ class ArtworkQuerySet(models.QuerySet):
         return self.order_by("-created_at")[:limit]
 
 
+class VisibleArtworkManager(models.Manager.from_queryset(ArtworkQuerySet)):
+    """Manager for the Artwork model that leaves out soft-deleted artworks and those of deactivated accounts.
+
+    Both are flags on the artwork itself, so hiding them costs no join, and the partial indexes on Artwork cover
+    only the visible rows.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False, is_artist_active=True)
+
+
 class Artwork(models.Model):
     """Model for artwork."""
 
@@ -258,10 +682,23 @@ class Artwork(models.Model):
         default=Orientation.NOT_SPECIFIED,
     )
 
+    is_censored = models.BooleanField(default=False)
+    # Visibility, denormalized from the deletion request and the artist's account so that hiding needs no join.
+    is_deleted = models.BooleanField(default=False, help_text=_("Deleted by its artist, and awaiting removal."))
+    is_artist_active = models.BooleanField(default=True, help_text=_("Whether the artist's account is active."))
+
+    # Perceptual hash of the image and its 16-bit segments, which are indexed for near-duplicate lookup.
+    phash = models.BigIntegerField(null=True, blank=True, help_text=_("Perceptual hash of the image."))
+    phash_0 = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+    phash_1 = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+    phash_2 = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+    phash_3 = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+
     created_at = models.DateTimeField(auto_now_add=True)
     modified_at = models.DateTimeField(auto_now=True)
 
-    objects = ArtworkQuerySet.as_manager()
+    objects = VisibleArtworkManager()
+    all_objects = ArtworkQuerySet.as_manager()
 
     class Meta:
         """Meta class for the Artwork model."""
@@ -270,17 +707,29 @@ class Artwork(models.Model):
         verbose_name_plural = "Artworks"
         ordering = ["-created_at"]
         constraints = [models.UniqueConstraint(fields=["profile", "title"], name="unique_artwork")]
+        indexes = [
+            models.Index(
+                fields=["-created_at", "-id"],
+                condition=models.Q(is_deleted=False, is_artist_active=True, is_censored=False),
+                name="artwork_feed_idx",
+            ),
+            models.Index(
+                fields=["profile", "-created_at"],
+                condition=models.Q(is_deleted=False, is_artist_active=True),
+                name="artwork_profile_visible_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
     def get_like_count(self):
         """Get the number of likes for the artwork."""
-        return self.sentiment_by.filter(status=Sentiment.LikeChoices.LIKE).count()
+        return self.artwork_sentiment.filter(status=Sentiment.LikeChoices.LIKE).count()
 
     def get_dislike_count(self):
         """Get the number of dislikes for the artwork."""
-        return self.sentiment_by.filter(status=Sentiment.LikeChoices.DISLIKE).count()
+        return self.artwork_sentiment.filter(status=Sentiment.LikeChoices.DISLIKE).count()
 
     def get_comment_count(self):
         """Get the number of comments for the artwork."""
@@ -293,3 +742,399 @@ class Artwork(models.Model):
     def get_comment(self):
         """Get the comments for the artwork."""
         return self.commented_by.all()
+
+    def set_phash(self, value):
+        """Set the perceptual hash (an unsigned 64-bit int from `apps.core.imagehash.phash`) and its segments."""
+        self.phash = imagehash.to_signed(value)
+        self.phash_0, self.phash_1, self.phash_2, self.phash_3 = imagehash.segments(value)
+
+
+class ModerationCase(models.Model):
+    """Every report about one artwork, comment or profile, reviewed as a single item in the moderation queue.
+
+    Exactly one of `artwork`, `comment` and `profile` is set. The queue serves open cases with the most reports
+    first, oldest first among equals (see `apps.core.moderation`).
+    """
+
+    uuid = models.UUIDField(default=uuid.uuid4, unique=True)
+
+    class Status(models.TextChoices):
+        """Choices for where a case is in review."""
+
+        OPEN = "OP", _("Open")
+        CLAIMED = "CL", _("Claimed")
+        RESOLVED = "RE", _("Resolved")
+
+    class Action(models.TextChoices):
+        """Choices for how a case was resolved."""
+
+        CENSORED = "CEN", _("Censored")
+        UNCENSORED = "UNC", _("Uncensored")
+        DISMISSED = "DIS", _("Dismissed")
+
+    artwork = models.ForeignKey("core.Artwork", on_delete=models.CASCADE, null=True, blank=True)
+    comment = models.ForeignKey("core.Comment", on_delete=models.CASCADE, null=True, blank=True)
+    profile = models.ForeignKey(
+        "core.Profile", on_delete=models.CASCADE, null=True, blank=True, related_name="moderation_cases"
+    )
+
+    status = models.CharField(max_length=2, choices=Status.choices, default=Status.OPEN)
+    report_count = models.PositiveIntegerField(default=0)
+    first_reported_at = models.DateTimeField(auto_now_add=True)
+    last_reported_at = models.DateTimeField(auto_now_add=True)
+
+    claimed_by = models.ForeignKey(
+        "core.Profile", on_delete=models.SET_NULL, null=True, blank=True, related_name="claimed_cases"
+    )
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    resolved_by = models.ForeignKey(
+        "core.Profile", on_delete=models.SET_NULL, null=True, blank=True, related_name="resolved_cases"
+    )
+    resolved_at = models.DateTimeField(null=True, blank=True)
+    action = models.CharField(max_length=3, choices=Action.choices, blank=True)
+
+    class Meta:
+        """Meta class for the ModerationCase model."""
+
+        verbose_name = "Moderation Case"
+        verbose_name_plural = "Moderation Cases"
+        constraints = [
+            models.CheckConstraint(
+                condition=(
+                    models.Q(artwork__isnull=False, comment__isnull=True, profile__isnull=True)
+                    | models.Q(artwork__isnull=True, comment__isnull=False, profile__isnull=True)
+                    | models.Q(artwork__isnull=True, comment__isnull=True, profile__isnull=False)
+                ),
+                name="moderation_case_one_target",
+            ),
+            models.UniqueConstraint(fields=["artwork"], name="unique_artwork_case"),
+            models.UniqueConstraint(fields=["comment"], name="unique_comment_case"),
+            models.UniqueConstraint(fields=["profile"], name="unique_profile_case"),
+        ]
+        indexes = [
+            models.Index(
+                fields=["-report_count", "first_reported_at"],
+                condition=models.Q(status="OP"),
+                name="moderation_queue_idx",
+            ),
+            models.Index(fields=["claimed_at"], condition=models.Q(status="CL"), name="moderation_claimed_idx"),
+        ]
+
+    def __str__(self):
+        return f"Case {self.uuid} ({self.report_count} reports)"
+
+    @property
+    def target(self):
+        """The reported artwork, comment or profile."""
+        return self.artwork or self.comment or self.profile
+
+
+class Report(models.Model):
+    """A profile's report of an artwork, comment or profile."""
+
+    uuid = models.UUIDField(default=uuid.uuid4, unique=True)
+
+    class Reason(models.TextChoices):
+        """Choices for why something was reported."""
+
+        SPAM = "SPA", _("Spam")
+        ABUSE = "ABU", _("Harassment or abuse")
+        EXPLICIT = "EXP", _("Explicit content")
+        COPYRIGHT = "COP", _("Copyright infringement")
+        OTHER = "OTH", _("Other")
+
+    case = models.ForeignKey("core.ModerationCase", on_delete=models.CASCADE, related_name="reports")
+    reporter = models.ForeignKey("core.Profile", on_delete=models.CASCADE, related_name="reports_made")
+
+    reason = models.CharField(max_length=3, choices=Reason.choices, default=Reason.OTHER)
+    details = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        """Meta class for the Report model."""
+
+        verbose_name = "Report"
+        verbose_name_plural = "Reports"
+        constraints = [models.UniqueConstraint(fields=["case", "reporter"], name="unique_report")]
+
+    def __str__(self):
+        return f"{self.reporter} reported case {self.case_id}"
+
+
+# Spacing between the ordering keys of adjacent collection items, so most moves fit between two neighbours.
+COLLECTION_POSITION_GAP = 1 << 20
+
+
+class CollectionItemQuerySet(models.QuerySet):
+    """Custom QuerySet for the CollectionItem model.
+
+    Items are ordered by `position`, a key with gaps of `COLLECTION_POSITION_GAP` between neighbours. Moving an item
+    gives it a key halfway between its new neighbours, so a reorder writes one row; only when two neighbours have run
+    out of room between them is the collection renumbered. Positions are unique within a collection, and writes to
+    them lock the collection's row so that concurrent ones cannot pick the same key.
+    """
+
+    def _lock(self, collection):
+        """Lock a collection's row for the rest of the transaction, so that writes to its positions take turns."""
+        Collection.objects.select_for_update().filter(pk=collection.pk).values_list("pk").first()
+
+    def add_many(self, collection, artwork_ids):
+        """Append artworks to the end of a collection, skipping any already in it. Returns how many were added.
+
+        Usage:
+
+        ```python
+        CollectionItem.objects.add_many(collection, [artwork.pk for artwork in artworks])
+        ```
+        """
+        items = self.filter(collection=collection)
+        with transaction.atomic():
+            self._lock(collection)
+            existing = set(items.filter(artwork_id__in=artwork_ids).values_list("artwork_id", flat=True))
+            new_ids = [pk for pk in dict.fromkeys(artwork_ids) if pk not in existing]
+            if not new_ids:
+                return 0
+            last = items.aggregate(last=Max("position"))["last"] or 0
+            self.bulk_create(
+                [
+                    CollectionItem(collection=collection, artwork_id=pk, position=last + COLLECTION_POSITION_GAP * i)
+                    for i, pk in enumerate(new_ids, start=1)
+                ]
+            )
+        return len(new_ids)
+
+    def remove_many(self, collection, artwork_ids):
+        """Remove artworks from a collection, and return how many were removed."""
+        deleted, _ = self.filter(collection=collection, artwork_id__in=artwork_ids).delete()
+        return deleted
+
+    def move(self, collection, artwork_id, after_artwork_id=None):
+        """Move an artwork to just after another in a collection, or to the front if `after_artwork_id` is None.
+
+        Returns False if either artwork is not in the collection.
+        """
+        items = self.filter(collection=collection)
+        with transaction.atomic():
+            self._lock(collection)
+            return self._move(items, collection, artwork_id, after_artwork_id)
+
+    def _move(self, items, collection, artwork_id, after_artwork_id):
+        for _attempt in range(2):
+            if after_artwork_id is None:
+                before = 0
+                after = items.exclude(artwork_id=artwork_id).order_by("position").values_list("position", flat=True)
+            else:
+                before = items.filter(artwork_id=after_artwork_id).values_list("position", flat=True).first()
+                if before is None:
+                    return False
+                after = (
+                    items.filter(position__gt=before)
+                    .exclude(artwork_id=artwork_id)
+                    .order_by("position")
+                    .values_list("position", flat=True)
+                )
+            after = after.first()
+            if after is None:
+                position = before + COLLECTION_POSITION_GAP
+            elif after - before > 1:
+                position = (before + after) // 2
+            else:
+                self.renumber(collection)
+                continue
+            return items.filter(artwork_id=artwork_id).update(position=position) == 1
+        return False
+
+    def page(self, collection, after=None, limit=20):
+        """Return a page of a collection's visible items in order, plus the position the next page starts after.
+
+        Artworks and their artists are loaded in the same query.
+        """
+        items = self.filter(
+            collection=collection, artwork__is_censored=False, artwork__is_deleted=False, artwork__is_artist_active=True
+        )
+        if after is not None:
+            items = items.filter(position__gt=after)
+        items = list(items.select_related("artwork__profile").order_by("position")[: limit + 1])
+        if len(items) > limit:
+            return items[:limit], items[limit - 1].position
+        return items, None
+
+    def renumber(self, collection):
+        """Spread a collection's items back out to evenly gapped keys, keeping their order.
+
+        Keys can swap between items part way through, which the deferred uniqueness check allows.
+        """
+        with transaction.atomic():
+            self._lock(collection)
+            items = list(self.filter(collection=collection).order_by("position", "pk").only("pk", "position"))
+            for i, item in enumerate(items, start=1):
+                item.position = COLLECTION_POSITION_GAP * i
+            self.bulk_update(items, ["position"], batch_size=1000)
+
+
+class Collection(models.Model):
+    """A named, ordered set of artworks curated by a profile."""
+
+    uuid = models.UUIDField(default=uuid.uuid4, unique=True)
+
+    profile = models.ForeignKey(
+        "core.Profile", on_delete=models.CASCADE, related_name="collections", help_text=_("The curator.")
+    )
+    artworks = models.ManyToManyField("core.Artwork", through="CollectionItem", related_name="collections")
+
+    title = models.CharField(max_length=60)
+    description = models.TextField(blank=True)
+    is_public = models.BooleanField(default=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    modified_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        """Meta class for the Collection model."""
+
+        verbose_name = "Collection"
+        verbose_name_plural = "Collections"
+        ordering = ["-created_at"]
+        constraints = [models.UniqueConstraint(fields=["profile", "title"], name="unique_collection")]
+
+    def __str__(self):
+        return self.title
+
+
+class CollectionItem(models.Model):
+    """A Through-Model placing an artwork in a collection."""
+
+    collection = models.ForeignKey("core.Collection", on_delete=models.CASCADE, related_name="items")
+    artwork = models.ForeignKey("core.Artwork", on_delete=models.CASCADE)
+
+    position = models.BigIntegerField(help_text=_("Ordering key; gapped so that moves touch a single row."))
+
+    added_at = models.DateTimeField(auto_now_add=True)
+
+    objects = CollectionItemQuerySet.as_manager()
+
+    class Meta:
+        """Meta class for the CollectionItem model."""
+
+        verbose_name = "Collection Item"
+        verbose_name_plural = "Collection Items"
+        constraints = [
+            models.UniqueConstraint(fields=["collection", "artwork"], name="unique_collection_item"),
+            # Also the index pages are read from. Deferred, so that a renumber may pass keys between items.
+            models.UniqueConstraint(
+                fields=["collection", "position"],
+                name="unique_collection_position",
+                deferrable=models.Deferrable.DEFERRED,
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.artwork} in {self.collection}"
+
+
+class DeletionJob(models.Model):
+    """A request to delete an account or artwork, carried out in the background (see `apps.core.deletion`).
+
+    The job outlives what it deletes, so it records the target's primary key rather than a foreign key.
+    """
+
+    uuid = models.UUIDField(default=uuid.uuid4, unique=True)
+
+    class Kind(models.TextChoices):
+        """Choices for what is being deleted."""
+
+        ACCOUNT = "ACC", _("Account")
+        ARTWORK = "ART", _("Artwork")
+
+    class Status(models.TextChoices):
+        """Choices for how far the deletion has got."""
+
+        PENDING = "PEN", _("Pending")
+        RUNNING = "RUN", _("Running")
+        DONE = "DON", _("Done")
+        FAILED = "FAI", _("Failed")
+
+    kind = models.CharField(max_length=3, choices=Kind.choices)
+    target_id = models.BigIntegerField()
+    requested_by = models.BigIntegerField(help_text=_("Primary key of the requesting account."))
+
+    status = models.CharField(max_length=3, choices=Status.choices, default=Status.PENDING)
+    progress = models.JSONField(default=dict, blank=True, help_text=_("Rows deleted so far, by model."))
+    error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        """Meta class for the DeletionJob model."""
+
+        verbose_name = "Deletion Job"
+        verbose_name_plural = "Deletion Jobs"
+
+    def __str__(self):
+        return f"Delete {self.get_kind_display().lower()} {self.target_id} ({self.get_status_display()})"
+
+
+class Notification(models.Model):
+    """A burst of comments, likes or follows, coalesced into one notification (see `apps.core.notifications`)."""
+
+    uuid = models.UUIDField(default=uuid.uuid4, unique=True)
+
+    class Kind(models.TextChoices):
+        """Choices for what happened."""
+
+        COMMENT = "COM", _("Comment")
+        LIKE = "LIK", _("Like")
+        FOLLOW = "FOL", _("Follow")
+
+    recipient = models.ForeignKey("core.Profile", on_delete=models.CASCADE, related_name="notifications")
+    kind = models.CharField(max_length=3, choices=Kind.choices)
+    artwork = models.ForeignKey(
+        "core.Artwork", on_delete=models.CASCADE, null=True, blank=True, related_name="notifications"
+    )
+    last_actor = models.ForeignKey(
+        "core.Profile",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+        help_text=_("Who acted last."),
+    )
+    actor_count = models.PositiveIntegerField(default=0, help_text=_("How many times it happened in the burst."))
+    key = models.CharField(max_length=64, help_text=_("The kind, artwork and time window that bursts are grouped by."))
+    is_read = models.BooleanField(default=False)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    modified_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        """Meta class for the Notification model."""
+
+        verbose_name = "Notification"
+        verbose_name_plural = "Notifications"
+        constraints = [models.UniqueConstraint(fields=["recipient", "key"], name="unique_notification")]
+        indexes = [
+            models.Index(fields=["recipient", "-modified_at", "-id"], name="notification_inbox_idx"),
+            models.Index(fields=["recipient"], condition=models.Q(is_read=False), name="notification_unread_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.actor_count} x {self.get_kind_display()} for {self.recipient_id}"
+
+
+class NotificationInbox(models.Model):
+    """A profile's unread notification count, kept up to date so that reading it is a single row lookup."""
+
+    profile = models.OneToOneField("core.Profile", on_delete=models.CASCADE, primary_key=True, related_name="inbox")
+    unread_count = models.IntegerField(default=0)
+    modified_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        """Meta class for the NotificationInbox model."""
+
+        verbose_name = "Notification Inbox"
+        verbose_name_plural = "Notification Inboxes"
+
+    def __str__(self):
+        return f"{self.unread_count} unread for {self.profile_id}"
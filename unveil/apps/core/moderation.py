@@ -0,0 +1,128 @@
+"""Reporting and moderation for the unveil core app.
+
+Reports about the same artwork, comment or profile are gathered into one ModerationCase, which counts them. Open
+cases form the moderation queue, most reported first and oldest first among equals, read through a partial index
+that covers only open cases.
+
+Moderators claim a few cases at a time. Claiming locks the rows with `SELECT ... FOR UPDATE SKIP LOCKED`, so
+moderators working concurrently each get different cases without waiting on each other. A claim that is not
+resolved within `CLAIM_TIMEOUT` goes back to the queue.
+
+Censoring and uncensoring take any number of artworks and comments, and run as one UPDATE per model plus one to
+resolve their cases.
+"""
+
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from apps.core.models import Artwork, Comment, ModerationCase, Profile, Report
+from apps.core.signals import invalidate
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+CLAIM_TIMEOUT = timedelta(minutes=15)
+TARGET_MODELS = {"artwork": Artwork, "comment": Comment, "profile": Profile}
+
+
+def report(reporter_id, target, reason, details=""):
+    """Report `target` (an Artwork, Comment or Profile) on behalf of a profile.
+
+    Returns the Report and whether it was new: a profile reporting the same thing twice keeps its first report. A
+    new report reopens a case that was already resolved.
+    """
+    field = type(target).__name__.lower()
+    with transaction.atomic():
+        case, _ = ModerationCase.objects.get_or_create(**{field: target})
+        created_report, created = Report.objects.get_or_create(
+            case=case, reporter_id=reporter_id, defaults={"reason": reason, "details": details}
+        )
+        if created:
+            ModerationCase.objects.filter(pk=case.pk).update(
+                report_count=F("report_count") + 1,
+                last_reported_at=timezone.now(),
+                status=ModerationCase.Status.OPEN,
+                claimed_by=None,
+                claimed_at=None,
+            )
+    return created_report, created
+
+
+def release_stale_claims():
+    """Return cases claimed more than `CLAIM_TIMEOUT` ago to the queue, and return how many there were."""
+    return ModerationCase.objects.filter(
+        status=ModerationCase.Status.CLAIMED, claimed_at__lt=timezone.now() - CLAIM_TIMEOUT
+    ).update(status=ModerationCase.Status.OPEN, claimed_by=None, claimed_at=None)
+
+
+def claim(moderator_id, limit=10):
+    """Claim up to `limit` cases from the front of the queue for a moderator, and return them.
+
+    Rows another moderator is claiming at the same moment are skipped rather than waited on.
+    """
+    release_stale_claims()
+    with transaction.atomic():
+        pks = list(
+            ModerationCase.objects.filter(status=ModerationCase.Status.OPEN)
+            .order_by("-report_count", "first_reported_at")
+            .select_for_update(skip_locked=True)
+            .values_list("pk", flat=True)[:limit]
+        )
+        ModerationCase.objects.filter(pk__in=pks).update(
+            status=ModerationCase.Status.CLAIMED, claimed_by_id=moderator_id, claimed_at=timezone.now()
+        )
+    cases = ModerationCase.objects.filter(pk__in=pks).select_related("artwork", "comment", "profile")
+    return sorted(cases, key=lambda case: (-case.report_count, case.first_reported_at))
+
+
+def reason_counts(cases):
+    """Return `{case_pk: {reason: count}}` for `cases`, in one query."""
+    counts = defaultdict(Counter)
+    rows = (
+        Report.objects.filter(case__in=cases)
+        .values("case_id", "reason")
+        .annotate(count=Count("pk"))
+        .order_by()
+        .values_list("case_id", "reason", "count")
+    )
+    for case_id, reason, count in rows:
+        counts[case_id][reason] = count
+    return counts
+
+
+def _resolve(moderator_id, cases, action):
+    return cases.exclude(status=ModerationCase.Status.RESOLVED).update(
+        status=ModerationCase.Status.RESOLVED,
+        resolved_by_id=moderator_id,
+        resolved_at=timezone.now(),
+        action=action,
+        claimed_by=None,
+        claimed_at=None,
+    )
+
+
+def set_censored(moderator_id, artwork_uuids=(), comment_uuids=(), censored=True):
+    """Censor or uncensor artworks and comments in bulk, resolving their cases.
+
+    Returns the number of artworks and comments changed, and the number of cases resolved.
+    """
+    artworks = list(Artwork.all_objects.filter(uuid__in=artwork_uuids).only("id", "uuid", "profile_id"))
+    comments = list(Comment.objects.filter(uuid__in=comment_uuids).only("id", "artwork_id", "profile_id"))
+    artwork_pks = [artwork.pk for artwork in artworks]
+    comment_pks = [comment.pk for comment in comments]
+    action = ModerationCase.Action.CENSORED if censored else ModerationCase.Action.UNCENSORED
+
+    with transaction.atomic():
+        changed = Artwork.all_objects.filter(pk__in=artwork_pks).update(is_censored=censored)
+        changed += Comment.objects.filter(pk__in=comment_pks).update(is_censored=censored)
+        resolved = _resolve(
+            moderator_id, ModerationCase.objects.filter(Q(artwork__in=artwork_pks) | Q(comment__in=comment_pks)), action
+        )
+    # update() sends no signals, so invalidate the cached artworks and comment lists directly.
+    invalidate(*artworks, *comments)
+    return changed, resolved
+
+
+def dismiss(moderator_id, case_uuids):
+    """Resolve cases without acting on their targets, and return how many were resolved."""
+    return _resolve(moderator_id, ModerationCase.objects.filter(uuid__in=case_uuids), ModerationCase.Action.DISMISSED)
@@ -0,0 +1,274 @@
+"""Notifications for the unveil core app.
+
+Comments and likes notify the artist of the artwork, and follows the profile followed. Bursts are coalesced: every
+event of one kind about the same artwork (or, for follows, the same profile) within a `NOTIFICATION_COALESCE_WINDOW`
+is counted on one Notification, which is what lets a client say "12 people liked X". Only comments and follows carry
+who acted last; who liked an artwork is not shown to anyone.
+
+Events are not written as they happen. They go to an outbox (Redis when configured, otherwise in process), and a
+background flush writes everything waiting in it with a fixed handful of queries, however many events there are.
+The first event into an empty outbox schedules a flush `NOTIFICATION_FLUSH_INTERVAL` seconds later, so a burst lands
+in one flush, and the flush drains until the outbox is empty. Events are only removed once they are written, so a
+flush that fails or is lost leaves them behind; every push into a non-empty outbox therefore schedules a flush too, at
+most one per interval, and the next of those picks them up.
+
+Each profile's unread count is kept on its NotificationInbox row and adjusted by the flush, by marking read and by
+deleting unread notifications, so reading it is a primary key lookup. Every change is pushed to the profile's open
+notification streams through the live channel (see `apps.core.live`).
+"""
+
+import json
+import threading
+import time
+from collections import Counter, deque
+from functools import lru_cache
+from itertools import islice
+
+from apps.core import live
+from apps.core.connections import get_redis
+from apps.core.models import Artwork, Notification, NotificationInbox, Profile
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+FLUSH_BATCH_SIZE = 1000
+# Seconds a flush may hold the outbox lock for one batch before another flush may take it.
+FLUSH_LOCK_TIMEOUT = 60
+
+
+class LocalOutbox:
+    """An outbox held in process, for development and tests."""
+
+    def __init__(self):
+        self._events = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def push(self, events):
+        """Append `events`, and return whether the outbox was empty before."""
+        with self._lock:
+            was_empty = not self._events
+            self._events.extend(events)
+            return was_empty
+
+    def peek(self, count):
+        """Return up to `count` events from the front, leaving them in place."""
+        with self._lock:
+            return list(islice(self._events, count))
+
+    def remove(self, count):
+        """Remove `count` events from the front."""
+        with self._lock:
+            for _ in range(min(count, len(self._events))):
+                self._events.popleft()
+
+    def lock(self):
+        """Return a lock that one flush at a time holds while it writes and removes a batch."""
+        return self._flush_lock
+
+
+class RedisOutbox:
+    """An outbox shared by every worker through Redis, as a list of JSON events."""
+
+    key = "notifications:outbox"
+
+    def __init__(self, client):
+        self.client = client
+
+    def push(self, events):
+        """Append `events`, and return whether the outbox was empty before."""
+        return self.client.rpush(self.key, *(json.dumps(event) for event in events)) == len(events)
+
+    def peek(self, count):
+        """Return up to `count` events from the front, leaving them in place."""
+        return [json.loads(event) for event in self.client.lrange(self.key, 0, count - 1)]
+
+    def remove(self, count):
+        """Remove `count` events from the front."""
+        self.client.ltrim(self.key, count, -1)
+
+    def lock(self):
+        """Return a lock that one flush at a time holds while it writes and removes a batch."""
+        return self.client.lock(f"{self.key}:lock", timeout=FLUSH_LOCK_TIMEOUT)
+
+
+@lru_cache(maxsize=None)
+def get_outbox():
+    """Return the notification outbox for this process."""
+    client = get_redis()
+    if client is not None:
+        return RedisOutbox(client)
+    return LocalOutbox()
+
+
+def notify(events):
+    """Queue `(recipient_id, kind, artwork_id, actor_id)` events once the current transaction commits.
+
+    `artwork_id` is None for follows. Events where the recipient is the actor are dropped.
+    """
+    from apps.core.tasks import flush_notifications
+
+    now = time.time()
+    events = [
+        [recipient, kind, artwork, actor, now] for recipient, kind, artwork, actor in events if recipient != actor
+    ]
+    if not events:
+        return
+
+    def push():
+        if get_outbox().push(events):
+            flush_notifications.enqueue(delay=settings.NOTIFICATION_FLUSH_INTERVAL)
+        else:
+            # A flush is normally on its way already, but may have been lost; ask for one more per interval.
+            window = int(time.time()) // settings.NOTIFICATION_FLUSH_INTERVAL
+            flush_notifications.enqueue(
+                delay=settings.NOTIFICATION_FLUSH_INTERVAL, idempotency_key=f"flush_notifications:{window}"
+            )
+
+    transaction.on_commit(push)
+
+
+def notify_artists(kind, pairs):
+    """Notify the artists of artworks about `(artwork_id, actor_id)` pairs, looking the artists up in one query."""
+    pairs = list(pairs)
+    if not pairs:
+        return
+    artists = dict(Artwork.all_objects.filter(pk__in={artwork for artwork, _ in pairs}).values_list("pk", "profile_id"))
+    notify((artists[artwork], kind, artwork, actor) for artwork, actor in pairs if artwork in artists)
+
+
+def flush():
+    """Write every event waiting in the outbox, and return how many there were.
+
+    Each batch is removed from the outbox only once it is written, under a lock so that two flushes cannot write the
+    same batch. Pushes only append, so the batch is still at the front when it is removed.
+    """
+    outbox = get_outbox()
+    flushed = 0
+    while True:
+        with outbox.lock():
+            events = outbox.peek(FLUSH_BATCH_SIZE)
+            if not events:
+                return flushed
+            _store(events)
+            outbox.remove(len(events))
+        flushed += len(events)
+
+
+def _store(events):
+    """Coalesce `events` into Notifications and update the unread counts, in a fixed number of queries."""
+    groups = {}
+    for recipient, kind, artwork, actor, at in events:
+        window = int(at) // settings.NOTIFICATION_COALESCE_WINDOW
+        group = groups.setdefault(
+            (recipient, f"{kind}:{artwork or 0}:{window}"),
+            {"kind": kind, "artwork": artwork, "actors": set()},
+        )
+        group["actors"].add(actor)
+        group["last_actor"] = actor
+
+    # Anything deleted since the event was queued has nothing left to notify about.
+    profile_pks = {recipient for recipient, _ in groups} | {actor for g in groups.values() for actor in g["actors"]}
+    profiles = set(Profile.objects.filter(pk__in=profile_pks).values_list("pk", flat=True))
+    artwork_pks = {group["artwork"] for group in groups.values()}
+    artworks = set(Artwork.all_objects.filter(pk__in=artwork_pks).values_list("pk", flat=True))
+    groups = {
+        (recipient, key): group
+        for (recipient, key), group in groups.items()
+        if recipient in profiles and (group["artwork"] is None or group["artwork"] in artworks)
+    }
+    if not groups:
+        return
+
+    now = timezone.now()
+    with transaction.atomic():
+        Notification.objects.bulk_create(
+            [
+                Notification(recipient_id=recipient, key=key, kind=group["kind"], artwork_id=group["artwork"])
+                for (recipient, key), group in groups.items()
+            ],
+            ignore_conflicts=True,
+        )
+        rows = (
+            Notification.objects.select_for_update()
+            .filter(recipient__in={recipient for recipient, _ in groups}, key__in={key for _, key in groups})
+            .order_by("pk")
+            .values_list("pk", "recipient_id", "key", "is_read", "actor_count")
+        )
+        pks, counts, last_actors, newly_unread = [], [], [], {}
+        for pk, recipient, key, is_read, actor_count in rows:
+            group = groups.get((recipient, key))
+            if group is None:
+                continue
+            pks.append(pk)
+            counts.append(When(pk=pk, then=F("actor_count") + len(group["actors"])))
+            last_actor = group["last_actor"] if group["last_actor"] in profiles else None
+            last_actors.append(When(pk=pk, then=Value(last_actor)))
+            if is_read or actor_count == 0:
+                newly_unread[recipient] = newly_unread.get(recipient, 0) + 1
+        Notification.objects.filter(pk__in=pks).update(
+            actor_count=Case(*counts, output_field=IntegerField()),
+            last_actor_id=Case(*last_actors, output_field=IntegerField()),
+            is_read=False,
+            modified_at=now,
+        )
+        _adjust_unread(newly_unread)
+
+
+def _adjust_unread(deltas, create=True):
+    """Add `{profile_id: delta}` to the unread counts, in three queries, and push the new counts once committed.
+
+    With `create` unset, profiles without an inbox row are left without one.
+    """
+    if not deltas:
+        return
+    if create:
+        NotificationInbox.objects.bulk_create(
+            [NotificationInbox(profile_id=pk) for pk in deltas], ignore_conflicts=True
+        )
+    inboxes = NotificationInbox.objects.filter(pk__in=deltas)
+    inboxes.update(
+        unread_count=F("unread_count")
+        + Case(*(When(pk=pk, then=Value(delta)) for pk, delta in deltas.items()), output_field=IntegerField()),
+        modified_at=timezone.now(),
+    )
+    live.publish_unread(dict(inboxes.values_list("pk", "unread_count")))
+
+
+def discount(recipient_ids):
+    """Take notifications that are being deleted off their recipients' unread counts.
+
+    `recipient_ids` holds the recipient of each unread notification deleted, and is counted before they go. Call it
+    in the deleting transaction; a recipient deleted along with them has no count left to adjust.
+    """
+    _adjust_unread({pk: -count for pk, count in Counter(recipient_ids).items()}, create=False)
+
+
+def unread_count(profile_id):
+    """Return how many of a profile's notifications are unread."""
+    return NotificationInbox.objects.filter(pk=profile_id).values_list("unread_count", flat=True).first() or 0
+
+
+async def aunread_count(profile_id):
+    """Async version of `unread_count`."""
+    return await NotificationInbox.objects.filter(pk=profile_id).values_list("unread_count", flat=True).afirst() or 0
+
+
+def mark_read(profile_id, notification_uuids=None):
+    """Mark a profile's notifications read, or all of them if `notification_uuids` is None.
+
+    Returns how many were unread.
+    """
+    with transaction.atomic():
+        unread = Notification.objects.filter(recipient_id=profile_id, is_read=False)
+        if notification_uuids is not None:
+            unread = unread.filter(uuid__in=notification_uuids)
+        marked = unread.update(is_read=True)
+        if notification_uuids is None:
+            # A recount, which also puts right a count that drifted.
+            if NotificationInbox.objects.filter(pk=profile_id).update(unread_count=0, modified_at=timezone.now()):
+                live.publish_unread({profile_id: 0})
+        elif marked:
+            _adjust_unread({profile_id: -marked})
+    return marked
@@ -0,0 +1,68 @@
+"""Keyset (cursor) pagination helpers for the unveil core app.
+
+Cursors are opaque, url-safe strings that encode the ordering key of the last row on a page. Filtering on the
+ordering key instead of using OFFSET keeps every page an index range scan, no matter how deep the client pages.
+"""
+
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 50
+
+
+def clamp_limit(limit, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Clamp a client-supplied page size to a sane range."""
+    if not limit or limit < 1:
+        return default
+    return min(limit, maximum)
+
+
+def encode_cursor(created_at, pk):
+    """Encode the ordering key of a row into an opaque cursor string."""
+    raw = json.dumps([created_at.isoformat(), pk], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Decode a cursor string into a `(created_at, pk)` tuple.
+
+    Raises `ValueError` if the cursor is malformed.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        created_at = parse_datetime(created_at)
+    except (TypeError, ValueError, json.JSONDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if created_at is None or not isinstance(pk, int):
+        raise ValueError("Invalid cursor")
+    return created_at, pk
+
+
+def before_cursor(cursor, created_field="created_at", pk_field="id"):
+    """Build a filter selecting rows that come after `cursor` in `(-created_at, -id)` order."""
+    created_at, pk = decode_cursor(cursor)
+    return Q(**{f"{created_field}__lt": created_at}) | Q(**{created_field: created_at, f"{pk_field}__lt": pk})
+
+
+def paginate_values(queryset, cursor=None, limit=DEFAULT_PAGE_SIZE, created_field="created_at", pk_field="id"):
+    """Return one page of a `.values()` queryset ordered newest first, plus the cursor for the next page.
+
+    The queryset must include `created_field` and `pk_field` in its values. One extra row is fetched to decide
+    whether a next page exists, so each page costs a single query.
+    """
+    queryset = queryset.order_by(f"-{created_field}", f"-{pk_field}")
+    if cursor:
+        queryset = queryset.filter(before_cursor(cursor, created_field, pk_field))
+
+    rows = list(queryset[: limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last[created_field], last[pk_field])
+    return rows, next_cursor
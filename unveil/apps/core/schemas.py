@@ -0,0 +1,102 @@
+"""Request and response schemas for the unveil core app."""
+
+from datetime import datetime
+from enum import Enum
+from uuid import UUID
+
+from ninja import Field, Schema
+
+MAX_BATCH_EVENTS = 500
+MAX_MODERATION_BATCH = 500
+MAX_COLLECTION_BATCH = 500
+MAX_NOTIFICATION_BATCH = 500
+
+
+class EventType(str, Enum):
+    """Kinds of engagement event a client can replay in a batch."""
+
+    LIKE = "like"
+    DISLIKE = "dislike"
+    VIEW = "view"
+    FOLLOW = "follow"
+    UNFOLLOW = "unfollow"
+
+
+class EngagementEvent(Schema):
+    """A single queued engagement event.
+
+    `uuid` is the artwork uuid for like, dislike and view events, and the profile uuid for follow and unfollow.
+    """
+
+    type: EventType
+    uuid: UUID
+
+
+class EventBatch(Schema):
+    """A batch of engagement events, applied in the order given."""
+
+    events: list[EngagementEvent] = Field(..., max_length=MAX_BATCH_EVENTS)
+
+
+class ArtworkOut(Schema):
+    """Public representation of an artwork."""
+
+    uuid: UUID
+    title: str
+    content: str
+    image: str
+    orientation: str
+    profile_uuid: UUID = Field(..., alias="profile.uuid")
+    created_at: datetime
+
+    @staticmethod
+    def resolve_image(obj):
+        """Return the image URL rather than its storage path."""
+        return obj.image.url
+
+
+class ReportTarget(str, Enum):
+    """Kinds of thing a profile can report."""
+
+    ARTWORK = "artwork"
+    COMMENT = "comment"
+    PROFILE = "profile"
+
+
+class CensorBatch(Schema):
+    """Artworks and comments to censor or uncensor together."""
+
+    artworks: list[UUID] = Field(default_factory=list, max_length=MAX_MODERATION_BATCH)
+    comments: list[UUID] = Field(default_factory=list, max_length=MAX_MODERATION_BATCH)
+
+
+class CaseBatch(Schema):
+    """Moderation cases to act on together."""
+
+    cases: list[UUID] = Field(..., max_length=MAX_MODERATION_BATCH)
+
+
+class ModerationCaseOut(Schema):
+    """A moderation case as shown to a moderator."""
+
+    uuid: UUID
+    target_type: ReportTarget
+    target_uuid: UUID
+    report_count: int
+    reasons: dict[str, int]
+    first_reported_at: datetime
+    last_reported_at: datetime
+
+
+class CollectionBatch(Schema):
+    """Artworks to add to or remove from a collection together."""
+
+    collection_uuid: UUID
+    artworks: list[UUID] = Field(..., max_length=MAX_COLLECTION_BATCH)
+
+
+class NotificationReadBatch(Schema):
+    """Notifications to mark read; with `all`, every notification is marked and the list is ignored."""
+
+    notifications: list[UUID] = Field(default_factory=list, max_length=MAX_NOTIFICATION_BATCH)
+    all: bool = False
@@ -0,0 +1,69 @@
+"""Seeded, non-repeating random walks over the artwork id space.
+
+A Feistel network keyed by a per-profile seed is a bijection on `[0, 2**bits)`. Walking positions `0, 1, 2, ...`
+through it visits every id in that range exactly once, in an order that looks uniformly random and differs for
+each seed. The only state a profile needs is its seed and how far along the walk it is.
+
+The domain is sized to the next power of four above the highest artwork id, with headroom. Ids that don't exist
+yet are skipped as they come up, so artworks inserted later take their place in the existing order rather than
+forcing a reshuffle; the walk is only re-keyed when the id space outgrows the domain.
+
+`weighted_sample` draws from the artworks a walk turns up in proportion to a weight, for feeds that favour some
+artists over others.
+"""
+
+import hashlib
+import heapq
+import math
+import random
+
+ROUNDS = 4
+
+
+class FeistelPermutation:
+    """A keyed pseudo-random permutation of `[0, 2**bits)`. `bits` must be even."""
+
+    def __init__(self, seed, bits):
+        if bits % 2:
+            raise ValueError("bits must be even")
+        self.bits = bits
+        self.half = bits // 2
+        self.mask = (1 << self.half) - 1
+        self.keys = [hashlib.blake2b(f"{seed}:{r}".encode(), digest_size=16).digest() for r in range(ROUNDS)]
+
+    @property
+    def size(self):
+        return 1 << self.bits
+
+    def _round(self, r, value):
+        digest = hashlib.blake2b(value.to_bytes(8, "little"), key=self.keys[r], digest_size=8).digest()
+        return int.from_bytes(digest, "little") & self.mask
+
+    def __call__(self, position):
+        left, right = position >> self.half, position & self.mask
+        for r in range(ROUNDS):
+            left, right = right, left ^ self._round(r, right)
+        return (left << self.half) | right
+
+
+def domain_bits(max_id, headroom=2):
+    """Return the even number of bits whose domain covers `max_id * headroom`."""
+    bits = max(2, (max(max_id, 1) * headroom).bit_length())
+    return bits + bits % 2
+
+
+def walk(permutation, start, count):
+    """Yield `(position, value)` for `count` positions from `start`, stopping at the end of the domain."""
+    for position in range(start, min(start + count, permutation.size)):
+        yield position, permutation(position)
+
+
+def weighted_sample(items, weights, k):
+    """Pick up to `k` of `items` without replacement, each with probability proportional to its weight.
+
+    Uses Efraimidis-Spirakis keys (`u ** (1 / weight)`, compared as logarithms so tiny weights don't underflow).
+    """
+    if k <= 0:
+        return []
+    keys = (math.log(1.0 - random.random()) / weight for weight in weights)
+    return [item for _, _, item in heapq.nlargest(k, zip(keys, range(len(items)), items))]
@@ -0,0 +1,160 @@
+"""Cache invalidation for the unveil core app.
+
+Each model maps to the cache tags its rows affect. `post_save` and `post_delete` bump those tags automatically, once
+the write commits. Bulk writes (`bulk_create`, `QuerySet.update`) do not send signals, so code that uses them calls
+`invalidate()` with the affected instances itself.
+
+Tags are keyed by uuid, because that is what clients send to the read endpoints. Looking up a related row's uuid
+would cost a query per signal, so uuids are cached locally; they never change once assigned.
+
+Saving an account also copies its `is_active` flag onto its artworks (`Artwork.is_artist_active`), so that feeds can
+hide the artworks of deactivated accounts without a join, and revokes a deactivated account's tokens. Every saved or
+deleted follow is logged for the in-memory follow graph (see `apps.core.graph`). New comments notify the artist (see
+`apps.core.notifications`), deleted unread notifications come off their recipient's unread count, and comments come
+and go on live counters (see `apps.core.live`).
+"""
+
+from collections import defaultdict
+
+from apps.core import live
+from apps.core.caching import LocalLRUCache, bump
+from apps.core.models import Artwork, Comment, Follow, Notification, Profile, Sentiment, View
+from apps.core.notifications import discount, notify_artists
+from apps.users.models import UserAccount
+from apps.users.tokens import revoke_account_tokens
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+_uuid_cache = LocalLRUCache(max_entries=100_000)
+
+
+def remember_uuids(model, pairs):
+    """Record known `(pk, uuid)` pairs so later invalidations can skip the lookup."""
+    _uuid_cache.set_many({(model, pk): row_uuid for pk, row_uuid in pairs}, None)
+
+
+def get_uuids(model, pks):
+    """Return a `{pk: uuid}` dict for `pks`, querying only for those not already cached."""
+    pks = set(pks)
+    found = {key[1]: row_uuid for key, row_uuid in _uuid_cache.get_many([(model, pk) for pk in pks]).items()}
+    missing = pks - found.keys()
+    if missing:
+        fetched = dict(model._base_manager.filter(pk__in=missing).values_list("pk", "uuid"))
+        remember_uuids(model, fetched.items())
+        found.update(fetched)
+    return found
+
+
+def _tags(instances):
+    """Return the cache tags affected by writes to `instances`."""
+    related = defaultdict(set)
+    for instance in instances:
+        if isinstance(instance, (Sentiment, Comment, View)):
+            related[Artwork].add(instance.artwork_id)
+            related[Profile].add(instance.profile_id)
+        elif isinstance(instance, Follow):
+            related[Profile].update((instance.following_profile_id, instance.followed_profile_id))
+        elif isinstance(instance, Artwork):
+            remember_uuids(Artwork, [(instance.pk, instance.uuid)])
+            related[Profile].add(instance.profile_id)
+        elif isinstance(instance, Profile):
+            remember_uuids(Profile, [(instance.pk, instance.uuid)])
+    artworks = get_uuids(Artwork, related[Artwork])
+    profiles = get_uuids(Profile, related[Profile])
+
+    tags = set()
+
+    def add(template, uuids, pk):
+        # A related row deleted in the same transaction has no uuid left to look up, and nothing left to cache.
+        if pk in uuids:
+            tags.add(template.format(uuids[pk]))
+
+    for instance in instances:
+        if isinstance(instance, Sentiment):
+            add("artwork:{}:sentiment", artworks, instance.artwork_id)
+            add("profile:{}:sentiment", profiles, instance.profile_id)
+        elif isinstance(instance, Comment):
+            add("artwork:{}:comments", artworks, instance.artwork_id)
+        elif isinstance(instance, View):
+            add("artwork:{}:views", artworks, instance.artwork_id)
+            tags.add(f"viewer:{instance.profile_id}")
+        elif isinstance(instance, Follow):
+            add("profile:{}:followers", profiles, instance.followed_profile_id)
+            add("profile:{}:following", profiles, instance.following_profile_id)
+            tags.add(f"follower:{instance.following_profile_id}")
+        elif isinstance(instance, Artwork):
+            tags.add(f"artwork:{instance.uuid}")
+            add("profile:{}:artworks", profiles, instance.profile_id)
+        elif isinstance(instance, Profile):
+            tags.add(f"profile:{instance.uuid}")
+    return tags
+
+
+def invalidate(*instances):
+    """Bump every cache tag affected by writes to `instances` once the current transaction commits.
+
+    Bumping before the commit would let a concurrent read cache the old rows under the new versions, where they would
+    stay until the next write. The tags are worked out straight away, as the related uuids of rows about to be deleted
+    can only be looked up while the rows still exist.
+    """
+    tags = _tags(instances)
+    transaction.on_commit(lambda: bump(*tags))
+
+
+def _on_change(sender, instance, **kwargs):
+    invalidate(instance)
+
+
+def _sync_artist_active(sender, instance, update_fields=None, **kwargs):
+    # A saved account (in the admin, say) may have flipped is_active; keep its artworks' copy of the flag in step.
+    if update_fields is not None and "is_active" not in update_fields:
+        return
+    artworks = Artwork.all_objects.filter(profile_id=instance.pk).exclude(is_artist_active=instance.is_active)
+    invalidate(*artworks.only("id", "uuid", "profile_id"))
+    artworks.update(is_artist_active=instance.is_active)
+    if not instance.is_active:
+        transaction.on_commit(lambda: revoke_account_tokens([instance.pk]))
+
+
+def _notify_comment(sender, instance, created, **kwargs):
+    if created:
+        notify_artists(Notification.Kind.COMMENT, [(instance.artwork_id, instance.profile_id)])
+
+
+post_save.connect(_notify_comment, sender=Comment, dispatch_uid="notify_comment")
+
+
+def _discount_notification(sender, instance, **kwargs):
+    # Notifications mostly go by cascade, when their artwork is deleted.
+    if not instance.is_read:
+        discount([instance.recipient_id])
+
+
+post_delete.connect(_discount_notification, sender=Notification, dispatch_uid="discount_notification")
+
+
+def _count_comment(sender, instance, signal, created=False, **kwargs):
+    if signal is post_delete:
+        live.publish({instance.artwork_id: {"comments": -1}})
+    elif created:
+        live.publish({instance.artwork_id: {"comments": 1}})
+
+
+post_save.connect(_count_comment, sender=Comment, dispatch_uid="count_comment_save")
+post_delete.connect(_count_comment, sender=Comment, dispatch_uid="count_comment_delete")
+
+
+def _record_follow_change(sender, instance, **kwargs):
+    # Imported here, as the follow graph needs NumPy, which workers that never write a follow need not load.
+    from apps.core.graph import record_changes
+
+    record_changes([instance.following_profile_id])
+
+
+post_save.connect(_record_follow_change, sender=Follow, dispatch_uid="record_follow_change_save")
+post_delete.connect(_record_follow_change, sender=Follow, dispatch_uid="record_follow_change_delete")
+post_save.connect(_sync_artist_active, sender=UserAccount, dispatch_uid="sync_artist_active")
+
+for model in (Artwork, Comment, Follow, Profile, Sentiment, View):
+    post_save.connect(_on_change, sender=model, dispatch_uid=f"invalidate_{model.__name__}_save")
+    post_delete.connect(_on_change, sender=model, dispatch_uid=f"invalidate_{model.__name__}_delete")
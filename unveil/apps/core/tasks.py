@@ -0,0 +1,78 @@
+"""Background tasks for the unveil core app.
+
+The web workers import this module to enqueue tasks, so Pillow and the NumPy follow graph are imported by the
+tasks that use them.
+"""
+
+from apps.core import deletion, exposure, feeds, imagehash, notifications
+from apps.core.jobs import task
+from apps.core.models import Artwork, DeletionJob
+from apps.core.signals import invalidate
+
+
+@task()
+def detect_orientation(artwork_id):
+    """Fill in the orientation of an artwork uploaded without one, from its image dimensions."""
+    from PIL import Image
+
+    artwork = Artwork.all_objects.only("id", "uuid", "profile_id", "image", "orientation").get(pk=artwork_id)
+    if artwork.orientation != Artwork.Orientation.NOT_SPECIFIED:
+        return
+
+    with artwork.image.open() as f:
+        width, height = Image.open(f).size
+    if width > height:
+        artwork.orientation = Artwork.Orientation.LANDSCAPE
+    elif width < height:
+        artwork.orientation = Artwork.Orientation.PORTRAIT
+    else:
+        artwork.orientation = Artwork.Orientation.SQUARE
+
+    # Only touch the one column so a concurrent edit to the rest of the row is not overwritten.
+    Artwork.all_objects.filter(pk=artwork_id).update(orientation=artwork.orientation)
+    invalidate(artwork)
+
+
+@task()
+def compute_phash(artwork_id):
+    """Store the perceptual hash of an artwork's image, for duplicate detection."""
+    from PIL import Image
+
+    artwork = Artwork.all_objects.only("id", "image").get(pk=artwork_id)
+    with artwork.image.open() as f:
+        artwork.set_phash(imagehash.phash(Image.open(f)))
+    Artwork.all_objects.filter(pk=artwork_id).update(
+        **{field: getattr(artwork, field) for field in ("phash", "phash_0", "phash_1", "phash_2", "phash_3")}
+    )
+
+
+@task()
+def rollup_exposure():
+    """Add new views to the exposure ledger."""
+    exposure.rollup()
+
+
+@task()
+def flush_notifications():
+    """Write the notifications waiting in the outbox."""
+    notifications.flush()
+
+
+@task()
+def prune_follow_changes():
+    """Delete follow changes that every follow graph snapshot has caught up with."""
+    from apps.core import graph
+
+    graph.prune_changes()
+
+
+@task()
+def refill_feed_queue(profile_id, mode):
+    """Top a profile's feed queue back up."""
+    feeds.refill(profile_id, mode)
+
+
+@task()
+def run_deletion(job_id):
+    """Carry out a requested account or artwork deletion."""
+    deletion.run(DeletionJob.objects.get(pk=job_id))
@@ -1,5 +1,1779 @@
 """Tests for the unveil core app."""
 
-from django.test import TestCase
+import asyncio
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import uuid
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from apps.core import compression, deletion, exposure, feeds, graph, imagehash, jobs, live, moderation, notifications
+from apps.core.caching import LocalLRUCache, bump, cached, get_cache, get_versions
+from apps.core.management.commands import benchmark_startup
+from apps.core.models import (
+    ArtistExposure,
+    Artwork,
+    Collection,
+    CollectionItem,
+    Comment,
+    DeletionJob,
+    FeedShuffle,
+    Follow,
+    FollowChange,
+    ModerationCase,
+    Notification,
+    Profile,
+    Report,
+    Sentiment,
+    View,
+)
+from apps.core.shuffle import FeistelPermutation, domain_bits
+from apps.core.throttling import InMemoryRateLimiter, TokenBucketThrottle, get_rate_limiter, parse_rate
+from apps.users.models import UserAccount
+from apps.users.tokens import get_denylist, issue_tokens
+from django.conf import settings
+from django.http import HttpResponse
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.utils import timezone
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+
+def make_profile(name):
+    """Create an account and its profile, returning the profile."""
+    account = UserAccount.objects.create_account(email=f"{name}@example.com", name=name, password="password")
+    return Profile.objects.get(pk=account.pk)
+
+
+def make_artwork(profile, title, **fields):
+    """Create an artwork without an image file behind it; the tests never open it."""
+    return Artwork.objects.create(profile=profile, title=title, content="", image=f"post_images/{title}.png", **fields)
+
+
+class APITestCase(TestCase):
+    """Calls the API as a signed-in profile, with fresh in-process backends for every test.
+
+    The backends outlive a test's transaction, and primary keys are reused once it rolls back, so entries keyed by
+    them would leak from one test into the next.
+    """
+
+    def setUp(self):
+        backends = (
+            get_cache,
+            get_denylist,
+            get_rate_limiter,
+            feeds.get_feed_queues,
+            jobs.get_broker,
+            notifications.get_outbox,
+        )
+        for get_backend in backends:
+            get_backend.cache_clear()
+        patcher = mock.patch("apps.core.signals._uuid_cache", LocalLRUCache())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def headers(self, profile):
+        return {"Authorization": f"Bearer {issue_tokens(profile.pk)['access']}"}
+
+    def get(self, path, profile, **params):
+        """GET `path` as `profile` and return the decoded response."""
+        return self.client.get(path, params, headers=self.headers(profile)).json()
+
+    def post(self, path, profile, json=None, **params):
+        """POST `params` in the query string and `json` as the body to `path` as `profile`."""
+        if json is None:
+            return self.client.post(path, query_params=params, headers=self.headers(profile)).json()
+        return self.client.post(
+            path, json, content_type="application/json", query_params=params, headers=self.headers(profile)
+        ).json()
+
+
+class CommentListTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.artist = make_profile("artist")
+        self.viewer = make_profile("viewer")
+        self.artwork = make_artwork(self.artist, "Dawn")
+
+    def list_comments(self, profile, **params):
+        return self.get("/artwork/comments/list", profile, artwork_uuid=self.artwork.uuid, **params)
+
+    def page_through(self, limit):
+        bodies, pages, cursor = [], 0, None
+        while True:
+            params = {"limit": limit} if cursor is None else {"limit": limit, "cursor": cursor}
+            response = self.list_comments(self.viewer, **params)
+            bodies += [row["body"] for row in response["comments"]]
+            pages += 1
+            cursor = response["next_cursor"]
+            if cursor is None:
+                return bodies, pages
+
+    def test_pages_cover_every_comment_once_newest_first(self):
+        # Comments posted in the same instant are told apart by id.
+        for i in range(5):
+            Comment.objects.create(profile=self.viewer, artwork=self.artwork, body=str(i))
+        self.assertEqual(self.page_through(limit=2), (["4", "3", "2", "1", "0"], 3))
+
+    def test_full_last_page_has_no_next_cursor(self):
+        for i in range(4):
+            Comment.objects.create(profile=self.viewer, artwork=self.artwork, body=str(i))
+        self.assertEqual(self.page_through(limit=2), (["3", "2", "1", "0"], 2))
+
+    def test_empty_artwork(self):
+        self.assertEqual(self.list_comments(self.viewer), {"success": True, "comments": [], "next_cursor": None})
+
+    def test_censored_comments_are_left_out(self):
+        Comment.objects.create(profile=self.viewer, artwork=self.artwork, body="kept")
+        Comment.objects.create(profile=self.viewer, artwork=self.artwork, body="hidden", is_censored=True)
+        self.assertEqual([row["body"] for row in self.list_comments(self.viewer)["comments"]], ["kept"])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(
+            self.list_comments(self.viewer, cursor="nonsense"), {"success": False, "error": "Invalid cursor"}
+        )
+
+    def test_only_the_artist_sees_commenters(self):
+        Comment.objects.create(profile=self.viewer, artwork=self.artwork, body="hello")
+        (row,) = self.list_comments(self.viewer)["comments"]
+        self.assertNotIn("profile_uuid", row)
+        (row,) = self.list_comments(self.artist)["comments"]
+        self.assertEqual((row["profile_uuid"], row["profile_name"]), (str(self.viewer.uuid), "viewer"))
+
+
+def total_likes(publish):
+    """Sum the like deltas sent through a mocked `live.publish`."""
+    return sum(counters.get("likes", 0) for call in publish.call_args_list for counters in call.args[0].values())
+
+
+class UpsertTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.artist = make_profile("artist")
+        self.fan = make_profile("fan")
+        self.artwork = make_artwork(self.artist, "Dawn")
+
+    def test_repeated_like_is_one_like(self):
+        for _ in range(2):
+            response = self.post("/artwork/like", self.fan, artwork_uuid=self.artwork.uuid)
+            self.assertEqual(response, {"success": True, "status": Sentiment.LikeChoices.LIKE})
+        self.assertEqual(self.artwork.get_like_count(), 1)
+
+    def test_repeated_like_counts_and_notifies_once(self):
+        with mock.patch("apps.core.live.publish") as publish, self.captureOnCommitCallbacks(execute=True):
+            for _ in range(2):
+                self.post("/artwork/like", self.fan, artwork_uuid=self.artwork.uuid)
+        self.assertEqual(total_likes(publish), 1)
+        self.assertEqual(Notification.objects.get(recipient=self.artist).actor_count, 1)
+
+    def test_dislike_switches_a_like(self):
+        self.post("/artwork/like", self.fan, artwork_uuid=self.artwork.uuid)
+        self.post("/artwork/dislike", self.fan, artwork_uuid=self.artwork.uuid)
+        self.assertEqual(list(Sentiment.objects.values_list("status", flat=True)), [Sentiment.LikeChoices.DISLIKE])
+        self.assertEqual((self.artwork.get_like_count(), self.artwork.get_dislike_count()), (0, 1))
+
+    def test_repeated_follow_is_one_follow(self):
+        for _ in range(2):
+            response = self.post("/profile/follow", self.fan, profile_uuid=self.artist.uuid)
+            self.assertEqual(response, {"success": True, "following": True})
+        self.assertEqual(Follow.objects.filter(following_profile=self.fan, followed_profile=self.artist).count(), 1)
+
+    def test_unfollow_is_idempotent(self):
+        self.post("/profile/follow", self.fan, profile_uuid=self.artist.uuid)
+        for _ in range(2):
+            response = self.post("/profile/unfollow", self.fan, profile_uuid=self.artist.uuid)
+            self.assertEqual(response, {"success": True, "following": False})
+        self.assertFalse(Follow.objects.exists())
+
+    def test_unknown_artwork(self):
+        response = self.post("/artwork/like", self.fan, artwork_uuid=uuid.uuid4())
+        self.assertEqual(response, {"success": False, "error": "Artwork does not exist"})
+
+
+class ConcurrentUpsertTests(TransactionTestCase):
+    def setUp(self):
+        if not connection.features.has_select_for_update:
+            self.skipTest("the database cannot lock rows")
+        self.artist = make_profile("artist")
+        self.fan = make_profile("fan")
+        self.artwork = make_artwork(self.artist, "Dawn")
+
+    def test_concurrent_double_tap_counts_once(self):
+        first_written = threading.Event()
+
+        def first_tap():
+            try:
+                with transaction.atomic():
+                    Sentiment.objects.upsert(self.fan.pk, self.artwork.pk, Sentiment.LikeChoices.LIKE)
+                    first_written.set()
+                    # Hold the transaction open while the second tap arrives.
+                    time.sleep(0.3)
+            finally:
+                connection.close()
+
+        def second_tap():
+            try:
+                first_written.wait(5)
+                Sentiment.objects.upsert(self.fan.pk, self.artwork.pk, Sentiment.LikeChoices.LIKE)
+            finally:
+                connection.close()
+
+        with (
+            mock.patch("apps.core.live.publish") as publish,
+            mock.patch("apps.core.notifications.notify_artists") as notify_artists,
+        ):
+            threads = [threading.Thread(target=first_tap), threading.Thread(target=second_tap)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(total_likes(publish), 1)
+        self.assertEqual(
+            [list(call.args[1]) for call in notify_artists.call_args_list], [[(self.artwork.pk, self.fan.pk)], []]
+        )
+        self.assertEqual(Sentiment.objects.count(), 1)
+
+
+class EventBatchTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.artist = make_profile("artist")
+        self.fan = make_profile("fan")
+        self.artwork = make_artwork(self.artist, "Dawn")
+
+    def send(self, *events):
+        response = self.post(
+            "/events/batch", self.fan, {"events": [{"type": kind, "uuid": str(target)} for kind, target in events]}
+        )
+        return response["results"]
+
+    def test_last_sentiment_wins(self):
+        results = self.send(("like", self.artwork.uuid), ("dislike", self.artwork.uuid))
+        self.assertEqual(results, [{"success": True, "duplicate": True}, {"success": True}])
+        self.assertEqual(list(Sentiment.objects.values_list("status", flat=True)), [Sentiment.LikeChoices.DISLIKE])
+
+    def test_repeated_view_is_recorded_once(self):
+        results = self.send(("view", self.artwork.uuid), ("view", self.artwork.uuid))
+        self.assertEqual(results, [{"success": True}, {"success": True, "duplicate": True}])
+        self.send(("view", self.artwork.uuid))
+        self.assertEqual(View.objects.filter(profile=self.fan, artwork=self.artwork).count(), 1)
+
+    def test_follow_then_unfollow(self):
+        self.send(("follow", self.artist.uuid))
+        self.assertTrue(Follow.objects.filter(following_profile=self.fan, followed_profile=self.artist).exists())
+        self.send(("follow", self.artist.uuid), ("unfollow", self.artist.uuid))
+        self.assertFalse(Follow.objects.exists())
+
+    def test_unknown_targets_fail_alone(self):
+        results = self.send(("like", uuid.uuid4()), ("follow", uuid.uuid4()), ("like", self.artwork.uuid))
+        self.assertEqual(
+            results,
+            [
+                {"success": False, "error": "Artwork does not exist"},
+                {"success": False, "error": "Profile does not exist"},
+                {"success": True},
+            ],
+        )
+        self.assertEqual(self.artwork.get_like_count(), 1)
+
+
+class ThrottleTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.now = 0.0
+        self.limiter = InMemoryRateLimiter(max_keys=2)
+        self.limiter.timer = lambda: self.now
+
+    def request_as(self, pk):
+        request = RequestFactory().post("/")
+        request.auth = SimpleNamespace(pk=pk)
+        return request
+
+    def test_bursts_up_to_capacity_then_refills(self):
+        self.assertEqual([self.limiter.hit("k", 3, 1 / 20)[0] for _ in range(4)], [True, True, True, False])
+        self.assertEqual(self.limiter.hit("k", 3, 1 / 20), (False, 20.0))
+        self.now = 20.0
+        self.assertEqual(self.limiter.hit("k", 3, 1 / 20), (True, 0.0))
+        self.assertFalse(self.limiter.hit("k", 3, 1 / 20)[0])
+
+    def test_evicted_buckets_start_full(self):
+        self.limiter.hit("a", 1, 1)
+        self.limiter.hit("b", 1, 1)
+        self.limiter.hit("c", 1, 1)
+        self.assertEqual(len(self.limiter._buckets), 2)
+        self.assertTrue(self.limiter.hit("a", 1, 1)[0])
+
+    def test_callers_have_their_own_buckets(self):
+        throttle = TokenBucketThrottle("test", rate="1/m", limiter=self.limiter)
+        self.assertTrue(throttle.allow_request(self.request_as(1)))
+        self.assertFalse(throttle.allow_request(self.request_as(1)))
+        self.assertEqual(throttle.wait(), 60.0)
+        self.assertTrue(throttle.allow_request(self.request_as(2)))
+
+    def test_wait_is_kept_per_thread(self):
+        throttle = TokenBucketThrottle("test", rate="1/m", limiter=self.limiter)
+        throttle.allow_request(self.request_as(1))
+        throttle.allow_request(self.request_as(1))
+        waits = []
+        thread = threading.Thread(
+            target=lambda: waits.append((throttle.allow_request(self.request_as(2)), throttle.wait()))
+        )
+        thread.start()
+        thread.join()
+        self.assertEqual(waits, [(True, 0.0)])
+        self.assertEqual(throttle.wait(), 60.0)
+
+    def test_endpoint_refuses_with_429(self):
+        artist, fan = make_profile("artist"), make_profile("fan")
+        artwork = make_artwork(artist, "Dawn")
+        capacity = parse_rate(settings.THROTTLE_RATES["comment_create"])[0]
+        for i in range(capacity):
+            self.post("/artwork/comments/create", fan, artwork_uuid=artwork.uuid, body=str(i))
+        response = self.client.post(
+            "/artwork/comments/create",
+            query_params={"artwork_uuid": artwork.uuid, "body": "one more"},
+            headers=self.headers(fan),
+        )
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(
+            self.post("/artwork/comments/create", artist, artwork_uuid=artwork.uuid, body="mine")["success"]
+        )
+
+
+class ConditionalCacheTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.artist = make_profile("artist")
+        self.fan = make_profile("fan")
+        self.artwork = make_artwork(self.artist, "Dawn")
+        self.path = f"/artwork/likes/count?artwork_uuid={self.artwork.uuid}"
+
+    def fetch(self, etag=None):
+        headers = self.headers(self.fan)
+        if etag is not None:
+            headers["If-None-Match"] = etag
+        return self.client.get(self.path, headers=headers)
+
+    def test_current_etag_gets_304_without_queries(self):
+        etag = self.fetch()["ETag"]
+        # Bearer tokens are verified without the database, and tag versions live in the cache.
+        with self.assertNumQueries(0):
+            response = self.fetch(etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(self.fetch(f"W/{etag}").status_code, 304)
+
+    def test_repeat_requests_are_served_from_the_cache(self):
+        first = self.fetch()
+        with self.assertNumQueries(0):
+            second = self.fetch()
+        self.assertEqual((second.status_code, second.json()), (200, {"success": True, "likes_count": 0}))
+        self.assertEqual(second["ETag"], first["ETag"])
+
+    def test_writes_change_the_etag(self):
+        etag = self.fetch()["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post("/artwork/like", self.fan, artwork_uuid=self.artwork.uuid)
+        response = self.fetch(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.json(), {"success": True, "likes_count": 1})
+
+    def test_errors_are_not_cached(self):
+        self.path = f"/artwork/likes/count?artwork_uuid={uuid.uuid4()}"
+        self.assertEqual(self.fetch().json(), {"success": False, "error": "Artwork does not exist"})
+        self.assertNotIn("ETag", self.fetch())
+
+    def test_popped_values_are_gone(self):
+        cache = LocalLRUCache()
+        cache.set("bundle", [1, 2], timeout=60)
+        cache.set("stale", [3], timeout=-1)
+        self.assertEqual(cache.pop("bundle"), [1, 2])
+        self.assertIsNone(cache.pop("bundle"))
+        self.assertEqual(cache.pop("stale", "gone"), "gone")
+        self.assertEqual(cache.stats()["entries"], 0)
+
+    def test_cached_values_recompute_after_a_bump(self):
+        compute = mock.Mock(side_effect=[1, 2])
+        self.assertEqual(cached("answer", ["a", "b"], compute), 1)
+        self.assertEqual(cached("answer", ["a", "b"], compute), 1)
+        bump("b")
+        self.assertEqual(cached("answer", ["a", "b"], compute), 2)
+        self.assertEqual(compute.call_count, 2)
+
+
+class InvalidationTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.artist = make_profile("artist")
+        self.fan = make_profile("fan")
+        self.artwork = make_artwork(self.artist, "Dawn")
+
+    def assertBumpedOnCommit(self, tags, write):
+        before = get_versions(tags)
+        with self.captureOnCommitCallbacks(execute=True):
+            write()
+            self.assertEqual(get_versions(tags), before, "bumped before the commit")
+        after = get_versions(tags)
+        for tag, old, new in zip(tags, before, after):
+            self.assertNotEqual(old, new, f"{tag} was not bumped")
+
+    def test_saved_and_deleted_rows(self):
+        tags = [f"artwork:{self.artwork.uuid}:comments"]
+        comment = Comment(profile=self.fan, artwork=self.artwork, body="hi")
+        self.assertBumpedOnCommit(tags, comment.save)
+        self.assertBumpedOnCommit(tags, comment.delete)
+
+    def test_bulk_upserts(self):
+        tags = [f"artwork:{self.artwork.uuid}:sentiment", f"profile:{self.fan.uuid}:sentiment"]
+        self.assertBumpedOnCommit(
+            tags, lambda: Sentiment.objects.upsert(self.fan.pk, self.artwork.pk, Sentiment.LikeChoices.LIKE)
+        )
+        tags = [f"profile:{self.artist.uuid}:followers", f"profile:{self.fan.uuid}:following"]
+        self.assertBumpedOnCommit(tags, lambda: Follow.objects.upsert(self.fan.pk, self.artist.pk))
+
+    def test_deleting_an_artwork_bumps_its_artist(self):
+        tags = [f"artwork:{self.artwork.uuid}", f"profile:{self.artist.uuid}:artworks"]
+        self.assertBumpedOnCommit(tags, self.artwork.delete)
+
+    def test_rolled_back_writes_bump_nothing(self):
+        tags = [f"artwork:{self.artwork.uuid}:comments"]
+        before = get_versions(tags)
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                Comment.objects.create(profile=self.fan, artwork=self.artwork, body="hi")
+                raise RuntimeError
+        self.assertEqual(get_versions(tags), before)
+
+
+# Calls to the test tasks below, and how many times each should fail before succeeding.
+job_calls = []
+job_failures = {}
+
+
+@jobs.task(max_retries=2, retry_backoff=0.2)
+def record_call(name):
+    job_calls.append(name)
+    if job_failures.get(name, 0) > 0:
+        job_failures[name] -= 1
+        raise RuntimeError(name)
+
+
+class JobTests(SimpleTestCase):
+    def setUp(self):
+        job_calls.clear()
+        job_failures.clear()
+
+    def use_broker(self, eager):
+        broker = jobs.LocalBroker(eager=eager)
+        patcher = mock.patch("apps.core.jobs.get_broker", return_value=broker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return broker
+
+    def test_eager_jobs_retry_inline(self):
+        broker = self.use_broker(eager=True)
+        job_failures["a"] = 2
+        with self.assertLogs("apps.core.jobs", "WARNING"):
+            record_call.enqueue("a")
+        self.assertEqual(job_calls, ["a", "a", "a"])
+        self.assertEqual(broker.dead, [])
+
+    def test_exhausted_retries_go_to_dead_letters(self):
+        broker = self.use_broker(eager=True)
+        job_failures["a"] = 3
+        with self.assertLogs("apps.core.jobs", "WARNING") as logs:
+            record_call.enqueue("a")
+        self.assertEqual(job_calls, ["a", "a", "a"])
+        self.assertEqual([job.attempt for job, _ in broker.dead], [2])
+        self.assertIn("failed permanently", logs.output[-1])
+
+    def test_retries_wait_for_their_backoff(self):
+        broker = self.use_broker(eager=False)
+        job_failures["a"] = 1
+        record_call.enqueue("a")
+        with self.assertLogs("apps.core.jobs", "WARNING"):
+            broker.drain()
+        self.assertEqual(job_calls, ["a"])
+        # The retry is held back until its backoff has passed.
+        broker.drain()
+        self.assertEqual(job_calls, ["a"])
+        time.sleep(record_call.retry_delay(1))
+        broker.drain()
+        self.assertEqual(job_calls, ["a", "a"])
+
+    def test_backoff_doubles(self):
+        self.assertEqual([record_call.retry_delay(attempt) for attempt in (1, 2, 3)], [0.2, 0.4, 0.8])
+
+    def test_idempotency_keys(self):
+        self.use_broker(eager=True)
+        self.assertIsNotNone(record_call.enqueue("a", idempotency_key="once"))
+        self.assertIsNone(record_call.enqueue("b", idempotency_key="once"))
+        self.assertIsNotNone(record_call.enqueue("c", idempotency_key="other"))
+        self.assertEqual(job_calls, ["a", "c"])
+
+    @override_settings(JOBS_IDEMPOTENCY_TTL=0)
+    def test_idempotency_keys_expire(self):
+        broker = self.use_broker(eager=True)
+        record_call.enqueue("a", idempotency_key="once")
+        self.assertIsNotNone(record_call.enqueue("b", idempotency_key="once"))
+        self.assertEqual(job_calls, ["a", "b"])
+        self.assertEqual(len(broker._claimed_keys), 1)
+
+
+@jobs.task(max_retries=0)
+def count_profiles():
+    job_calls.append(Profile.objects.count())
+
+
+class JobConnectionTests(TransactionTestCase):
+    def setUp(self):
+        # Django keeps an in-memory SQLite database open for good, so a lost connection cannot be replaced.
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            self.skipTest("the test database is in-memory SQLite")
+        job_calls.clear()
+        self.broker = jobs.LocalBroker()
+        patcher = mock.patch("apps.core.jobs.get_broker", return_value=self.broker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_jobs_replace_a_lost_connection(self):
+        make_profile("ada")
+        # A persistent, health-checked connection, as in production.
+        connection.close()
+        persistent = {"CONN_MAX_AGE": None, "CONN_HEALTH_CHECKS": True}
+        with mock.patch.dict(connection.settings_dict, persistent):
+            count_profiles.enqueue()
+            self.broker.drain()
+            # As after a database restart: the worker still holds the connection, but it no longer works. SQLite
+            # connections always pass the health check, so it is told the truth here.
+            connection.connection.close()
+            with mock.patch.object(connection, "is_usable", return_value=False):
+                count_profiles.enqueue()
+                self.broker.drain()
+        self.assertEqual(job_calls, [1, 1])
+        self.assertEqual(self.broker.dead, [])
+
+
+class RandomFeedTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.artist = make_profile("artist")
+        self.viewer = make_profile("viewer")
+        self.artworks = [make_artwork(self.artist, f"Art {i}") for i in range(30)]
+
+    def page(self, limit=5):
+        return Artwork.objects.get_random_artwork_for_profile(self.viewer, limit=limit, boost_underexposed=False)
+
+    def test_permutation_is_a_bijection(self):
+        permutation = FeistelPermutation(seed=42, bits=8)
+        self.assertEqual(sorted(permutation(position) for position in range(permutation.size)), list(range(256)))
+        self.assertNotEqual([permutation(position) for position in range(8)], list(range(8)))
+
+    def test_domain_covers_the_ids_with_headroom(self):
+        self.assertEqual(domain_bits(1), 2)
+        self.assertEqual(domain_bits(100), 8)
+        self.assertGreaterEqual(1 << domain_bits(1000), 2000)
+
+    def test_a_pass_serves_every_artwork_once(self):
+        served = [artwork.pk for _ in range(6) for artwork in self.page()]
+        self.assertCountEqual(served, [artwork.pk for artwork in self.artworks])
+
+    def test_walk_state_is_kept_per_profile(self):
+        first = self.page()
+        state = FeedShuffle.objects.get(profile=self.viewer)
+        self.assertGreater(state.position, 0)
+        self.assertNotEqual([artwork.pk for artwork in self.page()], [artwork.pk for artwork in first])
+
+    def test_viewed_and_censored_artworks_are_left_out(self):
+        View.objects.bulk_create([View(profile=self.viewer, artwork=artwork) for artwork in self.artworks[:10]])
+        Artwork.objects.filter(pk__in=[artwork.pk for artwork in self.artworks[10:20]]).update(is_censored=True)
+        served = {artwork.pk for _ in range(4) for artwork in self.page()}
+        self.assertEqual(served, {artwork.pk for artwork in self.artworks[20:]})
+
+    def test_no_artworks(self):
+        Artwork.all_objects.all().delete()
+        self.assertEqual(self.page(), [])
+
+
+@override_settings(EXPOSURE_ROLLUP_LAG=0)
+class ExposureTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.seen = make_profile("seen")
+        self.unseen = make_profile("unseen")
+        self.viewer = make_profile("viewer")
+
+    def view(self, artworks, profile=None):
+        View.objects.bulk_create([View(profile=profile or self.viewer, artwork=artwork) for artwork in artworks])
+
+    def exposure(self):
+        return dict(ArtistExposure.objects.values_list("profile_id", "view_count"))
+
+    def test_rollups_count_each_view_once(self):
+        artworks = [make_artwork(self.seen, f"Art {i}") for i in range(3)]
+        self.view(artworks[:2])
+        self.assertEqual(exposure.rollup(), 2)
+        self.assertEqual(exposure.rollup(), 0)
+        self.view(artworks[2:])
+        self.assertEqual(exposure.rollup(), 1)
+        self.assertEqual(self.exposure(), {self.seen.pk: 3})
+        ArtistExposure.objects.update(view_count=0)
+        self.assertEqual(exposure.rollup(rebuild=True), 3)
+        self.assertEqual(self.exposure(), {self.seen.pk: 3})
+
+    def test_boost_favours_underexposed_artists(self):
+        for i in range(10):
+            make_artwork(self.seen, f"Seen {i}")
+        unseen = {make_artwork(self.unseen, f"Unseen {i}").pk for i in range(10)}
+        ArtistExposure.objects.create(profile=self.seen, view_count=100_000)
+        page = Artwork.objects.get_random_artwork_for_profile(self.viewer, limit=5, boost_underexposed=True)
+        self.assertEqual(len(page), 5)
+        self.assertTrue({artwork.pk for artwork in page} <= unseen)
+
+    def test_boosted_pages_carry_unpicked_artworks(self):
+        artworks = [make_artwork(self.seen if i % 2 else self.unseen, f"Art {i}") for i in range(40)]
+        served = [
+            artwork.pk
+            for _ in range(8)
+            for artwork in Artwork.objects.get_random_artwork_for_profile(self.viewer, limit=5, boost_underexposed=True)
+        ]
+        self.assertCountEqual(served, [artwork.pk for artwork in artworks])
+
+
+@override_settings(FEED_QUEUE_SIZE=8, FEED_QUEUE_LOW_WATER=3)
+class PrefetchTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.artist = make_profile("artist")
+        self.viewer = make_profile("viewer")
+        # Newest first.
+        self.titles = [f"Art {i}" for i in reversed(range(22))]
+        for title in reversed(self.titles):
+            make_artwork(self.artist, title)
+
+    def titles_of(self, response):
+        return [artwork["title"] for artwork in response["artwork"]]
+
+    def test_next_cursor_follows_the_served_page(self):
+        response = self.get("/artwork/ordered", self.viewer, limit=5)
+        titles = self.titles_of(response)
+        while response["next_cursor"]:
+            response = self.get("/artwork/ordered", self.viewer, limit=5, cursor=response["next_cursor"])
+            titles += self.titles_of(response)
+        self.assertEqual(titles, self.titles)
+
+    def test_prefetch_tokens_serve_the_held_page(self):
+        response = self.get("/artwork/ordered", self.viewer, limit=5, start=1)
+        titles = self.titles_of(response)
+        while response["prefetch"]:
+            held = response["prefetch"]
+            response = self.get("/artwork/ordered", self.viewer, limit=5, prefetch_token=held["token"])
+            self.assertEqual([artwork["image"] for artwork in response["artwork"]], held["images"])
+            titles += self.titles_of(response)
+        self.assertEqual(titles, self.titles[1:])
+
+    def test_prefetch_tokens_through_the_queue(self):
+        response = self.get("/artwork/ordered", self.viewer, limit=5)
+        titles = self.titles_of(response)
+        for _ in range(3):
+            response = self.get("/artwork/ordered", self.viewer, limit=5, prefetch_token=response["prefetch"]["token"])
+            titles += self.titles_of(response)
+        self.assertEqual(titles, self.titles[:20])
+
+    def test_tokens_are_served_once(self):
+        token = self.get("/artwork/ordered", self.viewer, limit=5)["prefetch"]["token"]
+        self.assertEqual(len(feeds.take(self.viewer.pk, feeds.ORDERED, token)["artwork"]), 5)
+        self.assertIsNone(feeds.take(self.viewer.pk, feeds.ORDERED, token))
+
+    def test_replayed_tokens_fall_back_to_a_fresh_page(self):
+        token = self.get("/artwork/ordered", self.viewer, limit=5, start=1)["prefetch"]["token"]
+        held = self.get("/artwork/ordered", self.viewer, limit=5, prefetch_token=token)
+        self.assertEqual(self.titles_of(held), self.titles[6:11])
+        # Nothing is held for the replay, which is served as if no token had been sent.
+        replay = self.get("/artwork/ordered", self.viewer, limit=5, prefetch_token=token)
+        self.assertNotEqual(self.titles_of(replay), self.titles[6:11])
+
+    def test_tokens_are_private_to_their_account(self):
+        token = self.get("/artwork/ordered", self.viewer, limit=5)["prefetch"]["token"]
+        self.assertIsNone(feeds.take(self.artist.pk, feeds.ORDERED, token))
+        response = self.get("/artwork/ordered", self.artist, limit=5, prefetch_token=token)
+        self.assertEqual(self.titles_of(response), self.titles[:5])
+
+    def test_random_pages_do_not_repeat(self):
+        response = self.get("/artwork/random", self.viewer, limit=5)
+        titles = self.titles_of(response)
+        for _ in range(3):
+            response = self.get("/artwork/random", self.viewer, limit=5, prefetch_token=response["prefetch"]["token"])
+            titles += self.titles_of(response)
+        self.assertEqual(len(titles), 20)
+        self.assertEqual(len(set(titles)), 20)
+
+
+@override_settings(FEED_QUEUE_SIZE=6, FEED_QUEUE_LOW_WATER=2)
+class FeedQueueTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.artist = make_profile("artist")
+        self.viewer = make_profile("viewer")
+        self.artworks = [make_artwork(self.artist, f"Art {i}") for i in range(10)]
+        self.queues = feeds.get_feed_queues()
+
+    def test_refill_tops_the_queue_up(self):
+        feeds.refill(self.viewer.pk, feeds.ORDERED)
+        self.assertEqual(self.queues.length(self.viewer.pk, feeds.ORDERED), 6)
+        # A refill that finds the queue full, as after waiting for another's lock, adds nothing.
+        feeds.refill(self.viewer.pk, feeds.ORDERED)
+        self.assertEqual(self.queues.length(self.viewer.pk, feeds.ORDERED), 6)
+
+    def test_ordered_refills_continue_from_their_cursor(self):
+        feeds.refill(self.viewer.pk, feeds.ORDERED)
+        first, _ = self.queues.pop(self.viewer.pk, feeds.ORDERED, 6)
+        feeds.refill(self.viewer.pk, feeds.ORDERED)
+        rest, _ = self.queues.pop(self.viewer.pk, feeds.ORDERED, 6)
+        newest_first = [artwork.pk for artwork in reversed(self.artworks)]
+        self.assertEqual(first + rest, newest_first)
+        # Past the oldest artwork the next refill starts over from the newest.
+        self.assertIsNone(self.queues.get_cursor(self.viewer.pk, feeds.ORDERED))
+
+    def test_draw_fills_a_cold_queue_and_refills_below_low_water(self):
+        drawn = feeds.draw(self.viewer, feeds.ORDERED, 5)
+        self.assertEqual(len(drawn), 5)
+        # Jobs run eagerly here, so the refill has already happened.
+        self.assertEqual(self.queues.length(self.viewer.pk, feeds.ORDERED), 5)
+
+    def test_draw_skips_artworks_gone_since_they_were_queued(self):
+        feeds.refill(self.viewer.pk, feeds.ORDERED)
+        newest = list(reversed(self.artworks))
+        View.objects.create(profile=self.viewer, artwork=newest[0])
+        Artwork.objects.filter(pk=newest[1].pk).update(is_censored=True)
+        drawn = feeds.draw(self.viewer, feeds.ORDERED, 5)
+        self.assertEqual(drawn, newest[2:7])
+
+
+class ModerationTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.artist = make_profile("artist")
+        self.reporters = [make_profile(f"reporter{i}") for i in range(3)]
+        self.moderator = make_profile("moderator")
+        UserAccount.objects.filter(pk=self.moderator.pk).update(is_staff=True)
+        self.artwork = make_artwork(self.artist, "Dawn")
+        self.other = make_artwork(self.artist, "Dusk")
+
+    def report(self, reporter, target, uuid, reason=Report.Reason.OTHER):
+        return self.post("/report", reporter, target=target, uuid=uuid, reason=reason)
+
+    def test_reports_gather_into_one_case(self):
+        first = self.report(self.reporters[0], "artwork", self.artwork.uuid)
+        self.assertFalse(first["duplicate"])
+        self.assertTrue(self.report(self.reporters[0], "artwork", self.artwork.uuid)["duplicate"])
+        self.report(self.reporters[1], "artwork", self.artwork.uuid, Report.Reason.SPAM)
+        case = ModerationCase.objects.get()
+        self.assertEqual((case.artwork, case.report_count), (self.artwork, 2))
+
+    def test_claims_take_the_most_reported_first_and_only_once(self):
+        self.report(self.reporters[0], "artwork", self.other.uuid)
+        for reporter in self.reporters:
+            self.report(reporter, "artwork", self.artwork.uuid)
+        cases = self.post("/moderation/claim", self.moderator, limit=1)["cases"]
+        self.assertEqual([(case["target_uuid"], case["report_count"]) for case in cases], [(str(self.artwork.uuid), 3)])
+        cases = self.post("/moderation/claim", self.moderator)["cases"]
+        self.assertEqual([case["target_uuid"] for case in cases], [str(self.other.uuid)])
+        self.assertEqual(self.post("/moderation/claim", self.moderator)["cases"], [])
+
+    def test_stale_claims_go_back_to_the_queue(self):
+        self.report(self.reporters[0], "artwork", self.artwork.uuid)
+        moderation.claim(self.moderator.pk)
+        ModerationCase.objects.update(claimed_at=timezone.now() - moderation.CLAIM_TIMEOUT * 2)
+        self.assertEqual(len(moderation.claim(self.moderator.pk)), 1)
+
+    def test_censoring_hides_the_artwork_and_resolves_its_case(self):
+        self.report(self.reporters[0], "artwork", self.artwork.uuid)
+        response = self.post("/moderation/censor", self.moderator, {"artworks": [str(self.artwork.uuid)]})
+        self.assertEqual(response, {"success": True, "changed": 1, "resolved": 1})
+        case = ModerationCase.objects.get()
+        self.assertEqual((case.status, case.action), (ModerationCase.Status.RESOLVED, ModerationCase.Action.CENSORED))
+        self.assertTrue(Artwork.objects.get(pk=self.artwork.pk).is_censored)
+        # A new report reopens it.
+        self.report(self.reporters[1], "artwork", self.artwork.uuid)
+        self.assertEqual(ModerationCase.objects.get().status, ModerationCase.Status.OPEN)
+
+    def test_only_moderators_moderate(self):
+        response = self.post("/moderation/claim", self.reporters[0])
+        self.assertEqual(response, {"success": False, "error": "User is not a moderator"})
+
+
+class CollectionTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.curator = make_profile("curator")
+        self.visitor = make_profile("visitor")
+        self.artworks = [make_artwork(self.curator, f"Art {i}") for i in range(5)]
+        self.collection = Collection.objects.create(profile=self.curator, title="Favourites")
+
+    def add(self, artworks, collection=None):
+        collection = collection or self.collection
+        batch = {"collection_uuid": str(collection.uuid), "artworks": [str(artwork.uuid) for artwork in artworks]}
+        return self.post("/collection/items/add", self.curator, batch)
+
+    def move(self, artwork, after=None):
+        params = {"collection_uuid": self.collection.uuid, "artwork_uuid": artwork.uuid}
+        if after is not None:
+            params["after_uuid"] = after.uuid
+        return self.post("/collection/items/move", self.curator, **params)
+
+    def order(self):
+        return list(self.collection.items.order_by("position").values_list("artwork_id", flat=True))
+
+    def pks(self, *indexes):
+        return [self.artworks[i].pk for i in indexes]
+
+    def test_adding_appends_in_order_and_skips_repeats(self):
+        self.assertEqual(self.add(self.artworks[:3]), {"success": True, "added": 3, "missing": 0})
+        self.assertEqual(self.add([self.artworks[1], self.artworks[3]]), {"success": True, "added": 1, "missing": 0})
+        self.assertEqual(self.order(), self.pks(0, 1, 2, 3))
+
+    def test_moves(self):
+        self.add(self.artworks)
+        self.assertEqual(self.move(self.artworks[4]), {"success": True})
+        self.assertEqual(self.order(), self.pks(4, 0, 1, 2, 3))
+        self.move(self.artworks[0], after=self.artworks[2])
+        self.assertEqual(self.order(), self.pks(4, 1, 2, 0, 3))
+        self.move(self.artworks[4], after=self.artworks[3])
+        self.assertEqual(self.order(), self.pks(1, 2, 0, 3, 4))
+
+    def test_moving_between_adjacent_keys_renumbers(self):
+        self.add(self.artworks[:3])
+        for position, item in enumerate(self.collection.items.order_by("position"), start=1):
+            CollectionItem.objects.filter(pk=item.pk).update(position=position)
+        self.move(self.artworks[2], after=self.artworks[0])
+        self.assertEqual(self.order(), self.pks(0, 2, 1))
+        positions = list(self.collection.items.order_by("position").values_list("position", flat=True))
+        self.assertEqual(len(set(positions)), 3)
+        self.assertGreater(min(b - a for a, b in zip(positions, positions[1:])), 1)
+
+    def test_moving_an_artwork_not_in_the_collection(self):
+        self.add(self.artworks[:2])
+        response = self.move(self.artworks[3])
+        self.assertEqual(response, {"success": False, "error": "Artwork is not in the collection"})
+
+    def test_removing(self):
+        self.add(self.artworks)
+        batch = {"collection_uuid": str(self.collection.uuid), "artworks": [str(self.artworks[1].uuid)]}
+        self.assertEqual(self.post("/collection/items/remove", self.curator, batch), {"success": True, "removed": 1})
+        self.assertEqual(self.order(), self.pks(0, 2, 3, 4))
+
+    def test_pages_in_curated_order_without_hidden_artworks(self):
+        self.add(self.artworks)
+        self.move(self.artworks[3])
+        Artwork.objects.filter(pk=self.artworks[1].pk).update(is_censored=True)
+        titles, cursor = [], None
+        while True:
+            params = {"limit": 2} if cursor is None else {"limit": 2, "cursor": cursor}
+            response = self.get("/collection/items", self.visitor, collection_uuid=self.collection.uuid, **params)
+            titles += [artwork["title"] for artwork in response["artwork"]]
+            if (cursor := response["next_cursor"]) is None:
+                break
+        self.assertEqual(titles, ["Art 3", "Art 0", "Art 2", "Art 4"])
+
+    def test_private_collections_are_hidden_from_others(self):
+        Collection.objects.filter(pk=self.collection.pk).update(is_public=False)
+        response = self.get("/collection/items", self.visitor, collection_uuid=self.collection.uuid)
+        self.assertEqual(response, {"success": False, "error": "Collection does not exist"})
+        self.assertTrue(self.get("/collection/items", self.curator, collection_uuid=self.collection.uuid)["success"])
+        listed = self.get("/collection/list", self.visitor, profile_uuid=self.curator.uuid)["collections"]
+        self.assertEqual(listed, [])
+
+    def test_only_the_curator_adds(self):
+        batch = {"collection_uuid": str(self.collection.uuid), "artworks": [str(self.artworks[0].uuid)]}
+        response = self.post("/collection/items/add", self.visitor, batch)
+        self.assertEqual(response, {"success": False, "error": "Collection does not exist"})
+
+
+def make_image(seed, size=(256, 192)):
+    """Return a PIL image of random coloured blocks, the same for the same seed."""
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(seed)
+    image = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(image)
+    for _ in range(12):
+        x, y = rng.randrange(size[0]), rng.randrange(size[1])
+        box = (x, y, x + rng.randrange(20, 120), y + rng.randrange(20, 120))
+        draw.rectangle(box, fill=tuple(rng.randrange(256) for _ in range(3)))
+    return image
+
+
+def flip_bits(value, *bits):
+    for bit in bits:
+        value ^= 1 << bit
+    return value
+
+
+class DuplicateTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.artist = make_profile("artist")
+        self.base = (0x0123_4567_89AB_CDEF << 1) | 1
+
+    def hashed(self, title, value):
+        artwork = make_artwork(self.artist, title)
+        artwork.set_phash(value)
+        artwork.save()
+        return artwork
+
+    def test_copies_hash_close_and_other_images_far(self):
+        from PIL import Image
+
+        image = make_image(1)
+        value = imagehash.phash(image)
+        smaller = imagehash.phash(image.resize((128, 96)))
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", quality=40)
+        recompressed = imagehash.phash(Image.open(buffer))
+        self.assertLessEqual(imagehash.distance(value, smaller), 4)
+        self.assertLessEqual(imagehash.distance(value, recompressed), 4)
+        self.assertGreater(imagehash.distance(value, imagehash.phash(make_image(2))), 16)
+
+    def test_hashes_fit_a_signed_column(self):
+        for value in (0, 1, (1 << 63) - 1, 1 << 63, (1 << 64) - 1):
+            self.assertTrue(-(1 << 63) <= imagehash.to_signed(value) < 1 << 63)
+            self.assertEqual(imagehash.to_unsigned(imagehash.to_signed(value)), value)
+        self.assertEqual(imagehash.segments(0x0001_0002_0003_0004), [1, 2, 3, 4])
+
+    def test_near_duplicates_closest_first(self):
+        query = self.hashed("Original", self.base)
+        # Three bits off in one segment, and seven spread over all four.
+        close = self.hashed("Close", flip_bits(self.base, 1, 2, 3))
+        spread = self.hashed("Spread", flip_bits(self.base, 1, 2, 17, 18, 33, 34, 49))
+        self.hashed("Far", flip_bits(self.base, *range(0, 64, 4)))
+        matches = Artwork.objects.exclude(pk=query.pk).get_near_duplicates(query.phash, max_distance=7)
+        self.assertEqual([(artwork, distance) for artwork, distance in matches], [(close, 3), (spread, 7)])
+        matches = Artwork.objects.exclude(pk=query.pk).get_near_duplicates(query.phash, max_distance=3)
+        self.assertEqual([artwork for artwork, _ in matches], [close])
+
+    def test_endpoint(self):
+        query = self.hashed("Original", self.base)
+        self.hashed("Copy", self.base)
+        response = self.get("/artwork/duplicates", self.artist, artwork_uuid=query.uuid)
+        self.assertEqual([(match["title"], match["distance"]) for match in response["duplicates"]], [("Copy", 0)])
+        response = self.get("/artwork/duplicates", self.artist, artwork_uuid=query.uuid, max_distance=9)
+        self.assertEqual(response, {"success": False, "error": "max_distance may be at most 7"})
+        unhashed = make_artwork(self.artist, "Unhashed")
+        response = self.get("/artwork/duplicates", self.artist, artwork_uuid=unhashed.uuid)
+        self.assertEqual(response, {"success": False, "error": "Artwork has not been hashed yet"})
+
+    def test_uploads_are_hashed_and_oriented_in_the_background(self):
+        buffer = io.BytesIO()
+        make_image(1).save(buffer, "PNG")
+        upload = SimpleUploadedFile("dawn.png", buffer.getvalue(), content_type="image/png")
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    "/artwork/create",
+                    {"image": upload},
+                    query_params={"title": "Dawn", "content": ""},
+                    headers=self.headers(self.artist),
+                ).json()
+        artwork = Artwork.objects.get(uuid=response["artwork_uuid"])
+        self.assertEqual(artwork.orientation, Artwork.Orientation.LANDSCAPE)
+        self.assertEqual(imagehash.to_unsigned(artwork.phash), imagehash.phash(make_image(1)))
+
+
+class DeletionTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.artist = make_profile("artist")
+        self.fan = make_profile("fan")
+        self.artworks = [make_artwork(self.artist, f"Study {i}") for i in range(3)]
+        self.fan_artwork = make_artwork(self.fan, "Sketch")
+        Follow.objects.create(following_profile=self.fan, followed_profile=self.artist)
+        for artwork in self.artworks:
+            View.objects.create(profile=self.fan, artwork=artwork)
+            Sentiment.objects.create(profile=self.fan, artwork=artwork)
+            for i in range(3):
+                Comment.objects.create(profile=self.fan, artwork=artwork, body=f"Lovely {i}")
+
+    def delete(self, kind, target, execute=True):
+        with self.captureOnCommitCallbacks(execute=execute):
+            job = deletion.request_deletion(kind, target.pk, requested_by=target.pk)
+        job.refresh_from_db()
+        return job
+
+    def test_artwork_endpoint_hides_it_at_once(self):
+        artwork = self.artworks[0]
+        with self.captureOnCommitCallbacks():
+            response = self.post("/artwork/delete", self.artist, artwork_uuid=artwork.uuid)
+        self.assertFalse(Artwork.objects.filter(pk=artwork.pk).exists())
+        self.assertTrue(Artwork.all_objects.filter(pk=artwork.pk).exists())
+        status = self.get("/deletion/status", self.artist, job_uuid=response["job_uuid"])
+        self.assertEqual(status["status"], "Pending")
+        # Only whoever asked can follow it.
+        response = self.get("/deletion/status", self.fan, job_uuid=response["job_uuid"])
+        self.assertEqual(response, {"success": False, "error": "Deletion does not exist"})
+
+    def test_artwork_is_deleted_with_what_hangs_off_it(self):
+        artwork = self.artworks[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.post("/artwork/delete", self.artist, artwork_uuid=artwork.uuid)
+        status = self.get("/deletion/status", self.artist, job_uuid=response["job_uuid"])
+        self.assertEqual(status["status"], "Done")
+        self.assertEqual(
+            status["progress"], {"core.Artwork": 1, "core.Comment": 3, "core.Sentiment": 1, "core.View": 1}
+        )
+        self.assertFalse(Artwork.all_objects.filter(pk=artwork.pk).exists())
+        self.assertEqual(Comment.objects.filter(artwork__in=self.artworks[1:]).count(), 6)
+
+    def test_rows_go_a_chunk_at_a_time(self):
+        with (
+            mock.patch.object(deletion, "CHUNK_SIZE", 2),
+            mock.patch.object(deletion, "_delete_chunk", wraps=deletion._delete_chunk) as delete_chunk,
+        ):
+            job = self.delete(DeletionJob.Kind.ACCOUNT, self.fan)
+        self.assertEqual(job.status, DeletionJob.Status.DONE)
+        self.assertTrue(all(len(pks) <= 2 for _, pks, _ in (call.args for call in delete_chunk.call_args_list)))
+        self.assertEqual(job.progress["core.Comment"], 9)
+        self.assertEqual(job.progress["users.UserAccount"], 1)
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(Follow.objects.exists())
+        self.assertFalse(UserAccount.objects.filter(pk=self.fan.pk).exists())
+        self.assertEqual(Artwork.objects.filter(profile=self.artist).count(), 3)
+
+    def test_failed_run_carries_on_when_run_again(self):
+        calls = []
+
+        def fail_third_chunk(*args):
+            calls.append(args)
+            if len(calls) == 3:
+                raise RuntimeError("connection lost")
+            return chunk(*args)
+
+        chunk = deletion._delete_chunk
+        job = DeletionJob.objects.create(kind=DeletionJob.Kind.ACCOUNT, target_id=self.artist.pk, requested_by=0)
+        with (
+            mock.patch.object(deletion, "CHUNK_SIZE", 2),
+            mock.patch.object(deletion, "_delete_chunk", side_effect=fail_third_chunk),
+        ):
+            with self.assertRaises(RuntimeError):
+                deletion.run(job)
+        job.refresh_from_db()
+        self.assertEqual(job.status, DeletionJob.Status.FAILED)
+        self.assertIn("connection lost", job.error)
+        self.assertTrue(job.progress)
+
+        deletion.run(job)
+        job.refresh_from_db()
+        self.assertEqual(job.status, DeletionJob.Status.DONE)
+        self.assertEqual(job.progress["core.Artwork"], 3)
+        self.assertEqual(job.progress["core.Comment"], 9)
+        self.assertFalse(Artwork.all_objects.filter(profile=self.artist).exists())
+
+    def test_failed_jobs_are_retried(self):
+        with mock.patch.object(deletion, "delete_artwork", side_effect=[RuntimeError, None]) as delete_artwork:
+            job = self.delete(DeletionJob.Kind.ARTWORK, self.artworks[0])
+        self.assertEqual(delete_artwork.call_count, 2)
+        self.assertEqual(job.status, DeletionJob.Status.DONE)
+
+    def test_unread_notifications_come_off_the_count(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(profile=self.artist, artwork=self.fan_artwork, body="Thanks for the follow")
+        self.assertEqual(notifications.unread_count(self.fan.pk), 1)
+        self.delete(DeletionJob.Kind.ARTWORK, self.fan_artwork)
+        self.assertFalse(Notification.objects.filter(recipient=self.fan).exists())
+        self.assertEqual(notifications.unread_count(self.fan.pk), 0)
+
+    def test_media_files_are_removed(self):
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            artwork = self.artworks[0]
+            artwork.image.storage.save(artwork.image.name, io.BytesIO(b"png"))
+            self.assertTrue(artwork.image.storage.exists(artwork.image.name))
+            self.delete(DeletionJob.Kind.ARTWORK, artwork)
+            self.assertFalse(artwork.image.storage.exists(artwork.image.name))
+
+    def test_account_endpoint_checks_the_password(self):
+        response = self.client.post("/account/delete", {"password": "wrong"}, headers=self.headers(self.fan))
+        self.assertEqual(response.json(), {"success": False, "error": "Invalid credentials"})
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/account/delete", {"password": "password"}, headers=self.headers(self.fan))
+        job = DeletionJob.objects.get(uuid=response.json()["job_uuid"])
+        self.assertEqual(job.status, DeletionJob.Status.DONE)
+        self.assertFalse(Profile.objects.filter(pk=self.fan.pk).exists())
+
+
+class VisibilityTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.artist = make_profile("artist")
+        self.other = make_profile("other")
+        self.artworks = [make_artwork(self.artist, f"Study {i}") for i in range(3)]
+        self.other_artwork = make_artwork(self.other, "Sketch")
+
+    def visible(self):
+        return set(Artwork.objects.all())
+
+    def test_deleted_artworks_are_hidden(self):
+        Artwork.all_objects.filter(pk=self.artworks[0].pk).update(is_deleted=True)
+        self.assertEqual(self.visible(), {*self.artworks[1:], self.other_artwork})
+        self.assertEqual(Artwork.all_objects.count(), 4)
+
+    def test_deactivation_hides_the_artists_artworks(self):
+        self.assertEqual(UserAccount.objects.set_active([self.artist.pk], False), 1)
+        self.assertEqual(self.visible(), {self.other_artwork})
+        self.assertEqual(Artwork.all_objects.count(), 4)
+        # Setting it again changes nothing.
+        self.assertEqual(UserAccount.objects.set_active([self.artist.pk], False), 0)
+        UserAccount.objects.set_active([self.artist.pk], True)
+        self.assertEqual(self.visible(), {*self.artworks, self.other_artwork})
+
+    def test_saving_the_account_keeps_the_flag_in_step(self):
+        account = UserAccount.objects.get(pk=self.artist.pk)
+        account.is_active = False
+        account.save()
+        self.assertEqual(self.visible(), {self.other_artwork})
+        account.is_active = True
+        account.save(update_fields=["name"])
+        self.assertEqual(self.visible(), {self.other_artwork})
+        account.save(update_fields=["is_active"])
+        self.assertEqual(self.visible(), {*self.artworks, self.other_artwork})
+
+    def test_hidden_artworks_drop_out_of_cached_responses(self):
+        artwork = self.artworks[0]
+        self.assertTrue(self.get("/artwork/get", self.artist, artwork_uuid=artwork.uuid)["success"])
+        with self.captureOnCommitCallbacks(execute=True):
+            UserAccount.objects.set_active([self.artist.pk], False)
+        response = self.get("/artwork/get", self.other, artwork_uuid=artwork.uuid)
+        self.assertEqual(response, {"success": False, "error": "Artwork does not exist"})
+        titles = [artwork["title"] for artwork in self.get("/artwork/ordered", self.other)["artwork"]]
+        self.assertEqual(titles, ["Sketch"])
+
+
+class ProfileSummaryTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.artist = make_profile("artist")
+        self.fans = [make_profile(f"fan{i}") for i in range(3)]
+        self.artworks = [make_artwork(self.artist, f"Study {i}") for i in range(4)]
+        now = timezone.now()
+        for i, artwork in enumerate(self.artworks):
+            Artwork.objects.filter(pk=artwork.pk).update(created_at=now - timedelta(days=i))
+        make_artwork(self.artist, "Censored", is_censored=True)
+        make_artwork(self.artist, "Deleted", is_deleted=True)
+        for fan in self.fans:
+            Follow.objects.create(following_profile=fan, followed_profile=self.artist)
+        Follow.objects.create(following_profile=self.artist, followed_profile=self.fans[0])
+        fan_artworks = [make_artwork(self.fans[0], f"Sketch {i}") for i in range(3)]
+        for artwork in fan_artworks[:2]:
+            Sentiment.objects.create(profile=self.artist, artwork=artwork)
+        Sentiment.objects.create(profile=self.artist, artwork=fan_artworks[2], status=Sentiment.LikeChoices.DISLIKE)
+
+    def summary(self, **params):
+        return self.get("/profile/summary", self.fans[0], profile_uuid=self.artist.uuid, **params)
+
+    def test_counts_in_one_query(self):
+        with self.assertNumQueries(1):
+            profile = Profile.objects.with_summary().get(pk=self.artist.pk)
+            counts = (
+                profile.follower_count,
+                profile.following_count,
+                profile.likes_count,
+                profile.dislikes_count,
+                profile.artwork_count,
+            )
+        self.assertEqual(counts, (3, 1, 2, 1, 4))
+        self.assertEqual(
+            counts[:4],
+            (
+                self.artist.get_followers_count(),
+                self.artist.get_following_count(),
+                self.artist.get_likes_count(),
+                self.artist.get_dislikes_count(),
+            ),
+        )
+
+    def test_endpoint(self):
+        response = self.summary(limit=3)
+        self.assertEqual(
+            {key: value for key, value in response.items() if key.endswith("_count")},
+            {"follower_count": 3, "following_count": 1, "likes_count": 2, "dislikes_count": 1, "artwork_count": 4},
+        )
+        self.assertEqual(
+            [artwork["title"] for artwork in response["recent_artwork"]], ["Study 0", "Study 1", "Study 2"]
+        )
+        self.assertEqual({artwork["profile_uuid"] for artwork in response["recent_artwork"]}, {str(self.artist.uuid)})
+
+    def test_unknown_profile(self):
+        response = self.get("/profile/summary", self.fans[0], profile_uuid=uuid.uuid4())
+        self.assertEqual(response, {"success": False, "error": "Profile does not exist"})
+
+    def test_cached_summary_follows_writes(self):
+        self.assertEqual(self.summary()["follower_count"], 3)
+        # Shared by every viewer, so another profile's request is a cache hit.
+        with self.assertNumQueries(0):
+            response = self.get("/profile/summary", self.fans[2], profile_uuid=self.artist.uuid)
+        self.assertEqual(response["follower_count"], 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            Follow.objects.filter(following_profile=self.fans[1]).delete()
+            make_artwork(self.artist, "Study 4")
+        response = self.summary()
+        self.assertEqual((response["follower_count"], response["artwork_count"]), (2, 5))
+        self.assertEqual(response["recent_artwork"][0]["title"], "Study 4")
+
+
+class FollowListTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.artist = make_profile("artist")
+        self.viewer = make_profile("viewer")
+        self.fans = [make_profile(f"fan{i}") for i in range(5)]
+        for fan in self.fans:
+            Follow.objects.create(following_profile=fan, followed_profile=self.artist)
+
+    def page_through(self, path, profile, key, limit):
+        rows, cursor = [], None
+        while True:
+            params = {"limit": limit} if cursor is None else {"limit": limit, "cursor": cursor}
+            response = self.get(path, self.viewer, profile_uuid=profile.uuid, **params)
+            rows += response[key]
+            cursor = response["next_cursor"]
+            if cursor is None:
+                return rows
+
+    def test_followers_newest_first(self):
+        rows = self.page_through("/profile/followers", self.artist, "followers", limit=2)
+        self.assertEqual([row["name"] for row in rows], ["fan4", "fan3", "fan2", "fan1", "fan0"])
+        self.assertEqual(set(rows[0]), {"profile_uuid", "name", "profile_picture", "followed_at", "following"})
+
+    def test_following(self):
+        for fan in self.fans[:3]:
+            Follow.objects.create(following_profile=self.viewer, followed_profile=fan)
+        rows = self.page_through("/profile/following", self.viewer, "following", limit=2)
+        self.assertEqual([row["name"] for row in rows], ["fan2", "fan1", "fan0"])
+
+    def test_rows_say_whether_the_viewer_follows_them(self):
+        for fan in (self.fans[1], self.fans[3]):
+            Follow.objects.create(following_profile=self.viewer, followed_profile=fan)
+        with self.assertNumQueries(2):
+            rows, _ = Follow.objects.page(self.artist.pk, followers=True, viewer_id=self.viewer.pk, limit=10)
+        self.assertEqual([row["following"] for row in rows], [False, True, False, True, False])
+
+    def test_cached_pages_follow_the_viewers_follows(self):
+        rows = self.get("/profile/followers", self.viewer, profile_uuid=self.artist.uuid)["followers"]
+        self.assertFalse(rows[0]["following"])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post("/profile/follow", self.viewer, profile_uuid=self.fans[4].uuid)
+        rows = self.get("/profile/followers", self.viewer, profile_uuid=self.artist.uuid)["followers"]
+        self.assertTrue(rows[0]["following"])
+
+    def test_inactive_accounts_are_left_out(self):
+        UserAccount.objects.set_active([self.fans[2].pk], False)
+        rows = self.page_through("/profile/followers", self.artist, "followers", limit=10)
+        self.assertEqual([row["name"] for row in rows], ["fan4", "fan3", "fan1", "fan0"])
+
+    def test_invalid_cursor(self):
+        response = self.get("/profile/followers", self.viewer, profile_uuid=self.artist.uuid, cursor="nonsense")
+        self.assertEqual(response, {"success": False, "error": "Invalid cursor"})
+
+
+@override_settings(GRAPH_REFRESH_INTERVAL=0, GRAPH_CHANGE_LAG=0)
+class GraphTests(APITestCase):
+    EDGES = [(1, 2), (2, 1), (1, 3), (3, 4), (2, 4), (2, 5), (4, 1)]
+
+    def setUp(self):
+        super().setUp()
+        graph.get_graph_store.cache_clear()
+        self.addCleanup(graph.get_graph_store.cache_clear)
+
+    def test_queries(self):
+        snapshot = graph.FollowGraph.from_edges(self.EDGES)
+        self.assertEqual(len(snapshot), 7)
+        self.assertEqual(snapshot.mutuals(1), [2])
+        self.assertEqual(snapshot.suggestions(1), [(4, 2), (5, 1)])
+        self.assertEqual(snapshot.suggestions(1, limit=1), [(4, 2)])
+        self.assertEqual(snapshot.follower_overlap(4, 1), (1, 1 / 3))
+        self.assertEqual(snapshot.reach(1), 4)
+        # Profiles outside the graph, below and above every node.
+        for pk in (0, 99):
+            self.assertEqual(snapshot.mutuals(pk), [])
+            self.assertEqual(snapshot.suggestions(pk), [])
+            self.assertEqual(snapshot.follower_overlap(pk, 1), (0, 0.0))
+            self.assertEqual(snapshot.reach(pk), 0)
+
+    def test_queries_match_a_plain_walk(self):
+        rng = random.Random(7)
+        edges = {(rng.randrange(1, 60), rng.randrange(1, 60)) for _ in range(400)}
+        edges = {(a, b) for a, b in edges if a != b}
+        snapshot = graph.FollowGraph.from_edges(sorted(edges))
+        following = {pk: {b for a, b in edges if a == pk} for pk in range(1, 60)}
+        followers = {pk: {a for a, b in edges if b == pk} for pk in range(1, 60)}
+        for pk in range(1, 60):
+            self.assertEqual(snapshot.mutuals(pk), sorted(following[pk] & followers[pk]))
+            two_hops = set().union(following[pk], *(following[other] for other in following[pk])) - {pk}
+            self.assertEqual(snapshot.reach(pk), len(two_hops))
+            counts = {}
+            for other in following[pk]:
+                for candidate in following[other] - following[pk] - {pk}:
+                    counts[candidate] = counts.get(candidate, 0) + 1
+            expected = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+            self.assertEqual(snapshot.suggestions(pk, limit=100), expected)
+            shared = len(followers[pk] & followers[1])
+            self.assertEqual(snapshot.follower_overlap(pk, 1)[0], shared)
+
+    def test_changes_replace_a_profiles_follows(self):
+        snapshot = graph.FollowGraph.from_edges(self.EDGES).with_changes({2, 7}, [(2, 3), (7, 1)])
+        self.assertEqual(snapshot.mutuals(1), [])
+        self.assertEqual(snapshot.suggestions(1), [(4, 1)])
+        self.assertEqual(snapshot.follower_overlap(3, 2), (1, 0.5))
+        self.assertEqual(snapshot.mutuals(7), [])
+
+    def test_endpoints_follow_new_follows(self):
+        ada, grace, alan, edsger = (make_profile(name) for name in ("ada", "grace", "alan", "edsger"))
+        for follower, followed in ((ada, grace), (grace, ada), (grace, alan), (ada, edsger), (edsger, alan)):
+            Follow.objects.create(following_profile=follower, followed_profile=followed)
+        response = self.get("/profile/mutuals", ada, profile_uuid=ada.uuid)
+        self.assertEqual(([row["name"] for row in response["mutuals"]], response["count"]), (["grace"], 1))
+        response = self.get("/profile/suggestions", ada)
+        self.assertEqual(response["suggestions"], [{"profile_uuid": str(alan.uuid), "name": "alan", "followed_by": 2}])
+        response = self.get("/profile/overlap", ada, profile_uuid=alan.uuid, other_uuid=ada.uuid)
+        self.assertEqual(response, {"success": True, "shared_followers": 1, "jaccard": 0.5})
+        self.assertEqual(self.get("/profile/reach", ada, profile_uuid=ada.uuid)["reach"], 3)
+
+        # The snapshot is refreshed with follows made since it was built.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post("/profile/follow", ada, profile_uuid=alan.uuid)
+            self.post("/profile/unfollow", grace, profile_uuid=ada.uuid)
+        self.assertEqual(self.get("/profile/mutuals", ada, profile_uuid=ada.uuid)["mutuals"], [])
+        self.assertEqual(self.get("/profile/suggestions", ada)["suggestions"], [])
+
+    def background_store(self, update):
+        store = graph.GraphStore(background=True)
+        # Only the first snapshot is built in the calling thread.
+        make_profile("ada")
+        self.assertEqual(len(store.get()), 0)
+        store.refreshed_at = float("-inf")
+        patcher = mock.patch.object(store, "update", side_effect=update)
+        self.update = patcher.start()
+        self.addCleanup(patcher.stop)
+        return store
+
+    @override_settings(GRAPH_REFRESH_INTERVAL=60)
+    def test_updates_run_in_the_background(self):
+        fresh = graph.FollowGraph.from_edges(self.EDGES)
+        release = threading.Event()
+
+        def update():
+            release.wait(5)
+            store.graph, store.refreshed_at = fresh, time.monotonic()
+
+        store = self.background_store(update)
+        old = store.graph
+        # Neither the request that starts the update nor those during it wait for it.
+        self.assertIs(store.get(), old)
+        self.assertIs(store.get(), old)
+        release.set()
+        store._updater.join(5)
+        self.assertIs(store.get(), fresh)
+        self.assertEqual(self.update.call_count, 1)
+
+    def test_failed_background_updates_keep_the_old_snapshot(self):
+        store = self.background_store(RuntimeError("database gone"))
+        old = store.graph
+        with self.assertLogs("apps.core.graph", "ERROR"):
+            self.assertIs(store.get(), old)
+            store._updater.join(5)
+            # The next request past the interval tries again.
+            self.assertIs(store.get(), old)
+            store._updater.join(5)
+        self.assertEqual(self.update.call_count, 2)
+
+    def test_unknown_profiles(self):
+        ada = make_profile("ada")
+        response = self.get("/profile/reach", ada, profile_uuid=uuid.uuid4())
+        self.assertEqual(response, {"success": False, "error": "Profile does not exist"})
+        response = self.get("/profile/overlap", ada, profile_uuid=ada.uuid, other_uuid=uuid.uuid4())
+        self.assertEqual(response, {"success": False, "error": "Profile does not exist"})
+
+    def test_old_changes_are_pruned(self):
+        graph.record_changes([1, 2])
+        FollowChange.objects.filter(profile_id=1).update(
+            created_at=timezone.now() - timedelta(seconds=2 * settings.GRAPH_REBUILD_INTERVAL + 1)
+        )
+        self.assertEqual(graph.prune_changes(), 1)
+        self.assertEqual(list(FollowChange.objects.values_list("profile_id", flat=True)), [2])
+
+
+class NotificationTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.artist = make_profile("artist")
+        self.fans = [make_profile(f"fan{i}") for i in range(3)]
+        self.artwork = make_artwork(self.artist, "Dawn")
+
+    def act(self, path, profile, **params):
+        # Events are pushed once the write commits, and the eager broker flushes them there and then.
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.post(path, profile, **params)
+
+    def comment(self, profile, body="Lovely"):
+        return self.act("/artwork/comments/create", profile, artwork_uuid=self.artwork.uuid, body=body)
+
+    def listed(self, profile=None):
+        return self.get("/notifications", profile or self.artist)["notifications"]
+
+    def test_bursts_are_counted_on_one_notification(self):
+        for fan in self.fans:
+            self.comment(fan)
+        self.act("/profile/follow", self.fans[0], profile_uuid=self.artist.uuid)
+        self.act("/artwork/like", self.fans[1], artwork_uuid=self.artwork.uuid)
+        self.act("/artwork/like", self.fans[2], artwork_uuid=self.artwork.uuid)
+        rows = {row["kind"]: row for row in self.listed()}
+        self.assertEqual(
+            {kind: row["actor_count"] for kind, row in rows.items()}, {"Comment": 3, "Follow": 1, "Like": 2}
+        )
+        self.assertEqual(rows["Comment"]["last_actor_name"], "fan2")
+        # Who liked an artwork is not shown.
+        self.assertIsNone(rows["Like"]["last_actor_uuid"])
+        self.assertEqual(self.get("/notifications/unread", self.artist), {"success": True, "unread_count": 3})
+
+    def test_repeats_and_own_actions_do_not_notify(self):
+        self.act("/artwork/like", self.fans[0], artwork_uuid=self.artwork.uuid)
+        self.act("/artwork/like", self.fans[0], artwork_uuid=self.artwork.uuid)
+        self.comment(self.artist)
+        self.assertEqual([(row["kind"], row["actor_count"]) for row in self.listed()], [("Like", 1)])
+
+    def test_a_new_window_starts_a_new_notification(self):
+        start = time.time()
+        self.comment(self.fans[0])
+        later = start + settings.NOTIFICATION_COALESCE_WINDOW
+        with mock.patch("apps.core.notifications.time", SimpleNamespace(time=lambda: later)):
+            self.comment(self.fans[1])
+        self.assertEqual([row["actor_count"] for row in self.listed()], [1, 1])
+        self.assertEqual(notifications.unread_count(self.artist.pk), 2)
+
+    def test_read_notifications_come_back_unread(self):
+        self.comment(self.fans[0])
+        response = self.post("/notifications/read", self.artist, json={"all": True})
+        self.assertEqual(response, {"success": True, "marked": 1, "unread_count": 0})
+        self.comment(self.fans[1])
+        [row] = self.listed()
+        self.assertEqual((row["actor_count"], row["is_read"]), (2, False))
+        self.assertEqual(notifications.unread_count(self.artist.pk), 1)
+
+    def test_marking_some_read(self):
+        self.comment(self.fans[0])
+        self.act("/profile/follow", self.fans[0], profile_uuid=self.artist.uuid)
+        follow = next(row for row in self.listed() if row["kind"] == "Follow")
+        response = self.post("/notifications/read", self.artist, json={"notifications": [follow["uuid"]]})
+        self.assertEqual(response, {"success": True, "marked": 1, "unread_count": 1})
+        # Marking it again changes nothing.
+        response = self.post("/notifications/read", self.artist, json={"notifications": [follow["uuid"]]})
+        self.assertEqual(response, {"success": True, "marked": 0, "unread_count": 1})
+        # Someone else's notifications are not theirs to mark.
+        comment = next(row for row in self.listed() if row["kind"] == "Comment")
+        response = self.post("/notifications/read", self.fans[0], json={"notifications": [comment["uuid"]]})
+        self.assertEqual(response["marked"], 0)
+        self.assertEqual(notifications.unread_count(self.artist.pk), 1)
+
+    def test_deleting_unread_notifications_discounts_them(self):
+        self.comment(self.fans[0])
+        self.act("/profile/follow", self.fans[0], profile_uuid=self.artist.uuid)
+        self.post("/notifications/read", self.artist, json={"all": True})
+        self.comment(self.fans[1])
+        self.assertEqual(notifications.unread_count(self.artist.pk), 1)
+        Notification.objects.filter(recipient=self.artist).delete()
+        self.assertEqual(notifications.unread_count(self.artist.pk), 0)
+
+    def test_flush_takes_the_same_queries_for_any_burst(self):
+        def flush_queries(events):
+            notifications.get_outbox().push(events)
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(notifications.flush(), len(events))
+            return len(queries)
+
+        now = time.time()
+        few = [[self.artist.pk, Notification.Kind.LIKE, self.artwork.pk, self.fans[0].pk, now]]
+        many = [
+            [self.artist.pk, kind, self.artwork.pk if kind != Notification.Kind.FOLLOW else None, fan.pk, now]
+            for kind in Notification.Kind.values
+            for fan in self.fans
+        ]
+        self.assertEqual(flush_queries(few), flush_queries(many))
+        self.assertEqual(notifications.unread_count(self.artist.pk), 3)
+        self.assertEqual(notifications.flush(), 0)
+
+    def test_events_about_deleted_rows_are_dropped(self):
+        notifications.get_outbox().push([[self.artist.pk, Notification.Kind.LIKE, 0, self.fans[0].pk, time.time()]])
+        self.assertEqual(notifications.flush(), 1)
+        self.assertFalse(Notification.objects.exists())
+
+
+ARTWORK_A, ARTWORK_B = (str(uuid.UUID(int=i)) for i in (1, 2))
+
+
+def decoded(batch):
+    return json.loads(batch) if batch is not None else None
+
+
+@override_settings(LIVE_PUSH_INTERVAL=0.01)
+class LiveHubTests(SimpleTestCase):
+    def setUp(self):
+        live.get_hub.cache_clear()
+        live.get_channel.cache_clear()
+        self.addCleanup(live.get_hub.cache_clear)
+        self.hub = live.LiveHub()
+
+    def run_pushes(self, hub, coroutine):
+        """Run `coroutine` while `hub` pushes in the background."""
+
+        async def main():
+            pusher = asyncio.ensure_future(hub._push())
+            try:
+                return await coroutine()
+            finally:
+                pusher.cancel()
+
+        return asyncio.run(main())
+
+    def test_deltas_are_summed_and_pushed_to_watchers(self):
+        first, second, elsewhere = live.Subscriber(), live.Subscriber(), live.Subscriber()
+        self.hub.subscribe(first, [ARTWORK_A, ARTWORK_B])
+        self.hub.subscribe(second, [ARTWORK_A])
+        self.hub.subscribe(elsewhere, [str(uuid.uuid4())])
+        self.hub.receive({"counters": {ARTWORK_A: {"likes": 1, "views": 2}, ARTWORK_B: {"likes": 1}}})
+        self.hub.receive(
+            {"counters": {ARTWORK_A: {"likes": 2}, ARTWORK_B: {"likes": -1}, str(uuid.uuid4()): {"views": 1}}}
+        )
+        # Unwatched artworks are dropped on arrival.
+        self.assertEqual(set(self.hub.pending), {ARTWORK_A, ARTWORK_B})
+
+        async def collect():
+            return [decoded(await subscriber.wait(timeout=1)) for subscriber in (first, second)]
+
+        # Deltas that cancel out are not sent.
+        expected = [{"artwork_uuid": ARTWORK_A, "likes": 3, "views": 2}]
+        self.assertEqual(self.run_pushes(self.hub, collect), [expected, expected])
+        self.assertEqual((elsewhere.messages, self.hub.pending), ([], {}))
+
+    def test_unsubscribing(self):
+        subscriber = live.Subscriber()
+        self.hub.subscribe(subscriber, [ARTWORK_A, ARTWORK_B])
+        self.hub.receive({"counters": {ARTWORK_A: {"likes": 1}}})
+        self.hub.unsubscribe(subscriber, [ARTWORK_A])
+        self.assertEqual(
+            (subscriber.artworks, set(self.hub.subscribers), self.hub.pending), ({ARTWORK_B}, {ARTWORK_B}, {})
+        )
+        self.hub.unsubscribe(subscriber)
+        self.assertEqual((subscriber.artworks, self.hub.subscribers), (set(), {}))
+
+    @override_settings(LIVE_MAX_QUEUED=3)
+    def test_slow_connections_are_told_to_resync(self):
+        subscriber = live.Subscriber()
+        for i in range(3):
+            subscriber.deliver(json.dumps({"n": i}))
+        self.assertEqual(len(subscriber.messages), 3)
+        subscriber.deliver(json.dumps({"n": 3}))
+        self.assertEqual(subscriber.messages, [live.RESYNC])
+        self.assertEqual(asyncio.run(subscriber.wait()), f"[{live.RESYNC}]")
+
+    def test_wait(self):
+        subscriber = live.Subscriber()
+
+        async def wait_for_delivery():
+            asyncio.get_running_loop().call_later(0.01, subscriber.deliver, json.dumps({"n": 1}))
+            return await subscriber.wait(timeout=1)
+
+        self.assertIsNone(asyncio.run(subscriber.wait(timeout=0.01)))
+        self.assertEqual(decoded(asyncio.run(wait_for_delivery())), [{"n": 1}])
+        self.assertIsNone(subscriber.waiter)
+
+    def test_unread_counts_go_straight_out(self):
+        stream, other = live.Subscriber(), live.Subscriber()
+        self.hub.watch_inbox(stream, 5)
+        self.hub.watch_inbox(other, 6)
+        # Published counts come back through JSON with string keys.
+        self.hub.receive({"unread": {"5": 2}})
+        self.hub.receive({"unread": {"5": 3}})
+        self.assertEqual(stream.messages, [json.dumps({"unread_count": 3})])
+        self.assertEqual(other.messages, [])
+        self.hub.unwatch_inbox(stream, 5)
+        self.assertNotIn(5, self.hub.inboxes)
+
+    def test_resync_all(self):
+        watcher, stream = live.Subscriber(), live.Subscriber()
+        self.hub.subscribe(watcher, [ARTWORK_A])
+        self.hub.watch_inbox(stream, 5)
+        self.hub.receive({"counters": {ARTWORK_A: {"likes": 1}}})
+        watcher.deliver(json.dumps({"n": 1}))
+        self.hub.resync_all()
+        self.assertEqual((watcher.messages, stream.messages, self.hub.pending), ([live.RESYNC], [live.RESYNC], {}))
+
+    @override_settings(LIVE_MAX_SUBSCRIPTIONS=2)
+    def test_requests(self):
+        subscriber = live.Subscriber()
+        live._handle_request(self.hub, subscriber, json.dumps({"subscribe": [ARTWORK_A.upper()]}))
+        self.assertEqual(subscriber.artworks, {ARTWORK_A})
+        live._handle_request(self.hub, subscriber, json.dumps({"subscribe": [ARTWORK_B], "unsubscribe": [ARTWORK_A]}))
+        self.assertEqual(subscriber.artworks, {ARTWORK_B})
+        live._handle_request(self.hub, subscriber, json.dumps({"subscribe": [str(uuid.uuid4()) for _ in range(2)]}))
+        live._handle_request(self.hub, subscriber, "not json")
+        live._handle_request(self.hub, subscriber, json.dumps({"subscribe": ["not a uuid"]}))
+        self.assertEqual(
+            [json.loads(message) for message in subscriber.messages],
+            [
+                {"error": "Watch at most 2 artworks"},
+                {"error": 'Expected {"subscribe": [uuids], "unsubscribe": [uuids]}'},
+                {"error": 'Expected {"subscribe": [uuids], "unsubscribe": [uuids]}'},
+            ],
+        )
+        self.assertEqual(subscriber.artworks, {ARTWORK_B})
+
+    def connect(self, token, *requests):
+        """Open a `/live` WebSocket, send `requests`, publish a like on ARTWORK_A and return what was sent back."""
+        sent = []
+
+        async def main():
+            incoming = asyncio.Queue()
+            for message in (
+                {"type": "websocket.connect"},
+                *({"type": "websocket.receive", "text": r} for r in requests),
+            ):
+                incoming.put_nowait(message)
+
+            async def send(message):
+                sent.append(message)
+                if message["type"] == "websocket.send":
+                    incoming.put_nowait({"type": "websocket.disconnect"})
+
+            async def publish():
+                await asyncio.sleep(0.01)
+                live.get_channel().publish({"counters": {ARTWORK_A: {"likes": 1}}})
+
+            asyncio.ensure_future(publish())
+            scope = {"type": "websocket", "path": "/live", "query_string": f"access_token={token}".encode()}
+            await asyncio.wait_for(live.websocket_application(scope, incoming.get, send), timeout=5)
+
+        asyncio.run(main())
+        return sent
+
+    def test_websocket(self):
+        sent = self.connect(issue_tokens(1)["access"], json.dumps({"subscribe": [ARTWORK_A]}))
+        self.assertEqual(sent[0], {"type": "websocket.accept"})
+        self.assertEqual(decoded(sent[1]["text"]), [{"artwork_uuid": ARTWORK_A, "likes": 1}])
+        # The connection let go of its artworks when it closed.
+        self.assertEqual(live.get_hub().subscribers, {})
+
+    def test_websocket_needs_a_token(self):
+        self.assertEqual(self.connect("nonsense"), [{"type": "websocket.close", "code": 4401}])
+
+
+class StartupTests(SimpleTestCase):
+    """Boots a web worker in a fresh interpreter, as `manage.py benchmark_startup` does."""
+
+    # Generous enough for a loaded CI machine; a worker starts in about 0.5s and 60 MiB.
+    MAX_READY_MS = 3000
+    MAX_RSS_MB = 120
+
+    def test_worker_starts_quickly_and_small(self):
+        result, _ = benchmark_startup.Command().worker()
+        self.assertLess(result["ready"] * 1000, self.MAX_READY_MS)
+        # ru_maxrss is in kilobytes on Linux.
+        self.assertLess(result["rss"] / 1024, self.MAX_RSS_MB)
+
+    def test_worker_does_not_load_numpy_or_pillow(self):
+        _, importtime = benchmark_startup.Command().worker("-X", "importtime")
+        imported = {
+            line.rsplit("|", 1)[1].strip() for line in importtime.splitlines() if line.startswith("import time:")
+        }
+        self.assertIn("django.urls", imported)
+        self.assertNotIn("numpy", imported)
+        self.assertNotIn("PIL", imported)
+
+
+PROD_SETTINGS = """
+import json
+from unveil.settings import prod
+print(json.dumps({
+    "debug": prod.DEBUG,
+    "cache": prod.CACHES["default"]["BACKEND"],
+    "session_engine": prod.SESSION_ENGINE,
+    "conn_max_age": prod.DATABASES["default"]["CONN_MAX_AGE"],
+    "first_middleware": prod.MIDDLEWARE[0],
+    "jobs_eager": prod.JOBS_EAGER,
+}))
+"""
+
+
+class SettingsTests(SimpleTestCase):
+    REQUIRED = {"SECRET_KEY": "secret", "ALLOWED_HOSTS": "example.com", "REDIS_URL": "redis://localhost:6379"}
+
+    def load_prod(self, **environ):
+        """Import the production settings in a fresh interpreter, which is the only place they can be loaded."""
+        return subprocess.run(
+            [sys.executable, "-c", PROD_SETTINGS],
+            cwd=settings.BASE_DIR,
+            env={**os.environ, "USE_PLATFORMSH": "false", **self.REQUIRED, **environ},
+            capture_output=True,
+            text=True,
+        )
+
+    def test_production_profile(self):
+        result = self.load_prod()
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(
+            json.loads(result.stdout),
+            {
+                "debug": False,
+                "cache": "django.core.cache.backends.redis.RedisCache",
+                "session_engine": "django.contrib.sessions.backends.cached_db",
+                "conn_max_age": 600,
+                "first_middleware": "apps.core.compression.CompressionMiddleware",
+                "jobs_eager": False,
+            },
+        )
+
+    def test_production_refuses_to_start_without_its_settings(self):
+        for name in self.REQUIRED:
+            with self.subTest(name):
+                # Set empty rather than removed, so that a local .env cannot fill it in.
+                result = self.load_prod(**{name: ""})
+                self.assertNotEqual(result.returncode, 0)
+                self.assertIn(f"ImproperlyConfigured: Set {name} for production", result.stderr)
+
+
+class CompressionTests(SimpleTestCase):
+    BODY = json.dumps({"artwork": [{"title": f"Study {i}", "content": "charcoal on paper"} for i in range(20)]})
+
+    def compress(self, accept_encoding, body=BODY, **headers):
+        request = RequestFactory().get("/", headers={"Accept-Encoding": accept_encoding})
+        response = HttpResponse(body, content_type="application/json", headers=headers)
+        return compression.CompressionMiddleware(lambda request: response)(request)
+
+    @unittest.skipIf(compression.brotli is None, "brotli is not installed")
+    def test_brotli_where_accepted(self):
+        response = self.compress("gzip, deflate, br", ETag='"v1"')
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(compression.brotli.decompress(response.content).decode(), self.BODY)
+        self.assertEqual(response["Content-Length"], str(len(response.content)))
+        self.assertEqual(response["ETag"], 'W/"v1"')
+        self.assertIn("Accept-Encoding", response["Vary"])
+
+    def test_gzip_otherwise(self):
+        response = self.compress("gzip, deflate")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertLess(len(response.content), len(self.BODY))
+
+    def test_small_bodies_are_left_alone(self):
+        for accept_encoding in ("br", "gzip"):
+            response = self.compress(accept_encoding, body='{"success": true}')
+            self.assertFalse(response.has_header("Content-Encoding"))
+            self.assertEqual(response.content, b'{"success": true}')
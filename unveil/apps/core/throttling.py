@@ -0,0 +1,138 @@
+"""Token-bucket rate limiting for the unveil API.
+
+Each throttled route has a scope whose rate (e.g. `"10/m"`) is configured in `settings.THROTTLE_RATES`. Buckets are
+kept per scope and per identity: the authenticated user when there is one, otherwise the client address. A bucket
+holds up to `N` tokens and refills at `N / period`, so short bursts are allowed while the long-run rate is capped.
+
+Buckets live in Redis when `REDIS_URL` is configured, so every worker shares them, and in process memory otherwise.
+"""
+
+import threading
+import time
+from functools import lru_cache
+
+from apps.core.connections import get_redis
+from django.conf import settings
+from ninja.throttling import BaseThrottle
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_rate(rate):
+    """Parse a rate such as `"10/m"` into `(capacity, tokens refilled per second)`."""
+    num, period = rate.split("/")
+    capacity = int(num)
+    return capacity, capacity / PERIODS[period[0]]
+
+
+class InMemoryRateLimiter:
+    """Process-local token buckets.
+
+    Buckets are kept in least-recently-used order and the oldest is dropped once `max_keys` is exceeded, which only
+    ever resets a bucket to full, so memory stays bounded under an address-spraying attack.
+    """
+
+    timer = time.monotonic
+
+    def __init__(self, max_keys=100_000):
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def hit(self, key, capacity, refill_rate):
+        """Take a token from the bucket at `key`. Returns `(allowed, seconds to wait)`."""
+        now = self.timer()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * refill_rate)
+            if tokens >= 1:
+                tokens -= 1
+                allowed, wait = True, 0.0
+            else:
+                allowed, wait = False, (1 - tokens) / refill_rate
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                del self._buckets[next(iter(self._buckets))]
+        return allowed, wait
+
+
+class RedisRateLimiter:
+    """Token buckets shared across workers, updated atomically by a Lua script in a single round trip."""
+
+    timer = time.time
+
+    script = """
+        local capacity = tonumber(ARGV[1])
+        local refill_rate = tonumber(ARGV[2])
+        local now = tonumber(ARGV[3])
+        local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+        local tokens = tonumber(bucket[1]) or capacity
+        local updated = tonumber(bucket[2]) or now
+        tokens = math.min(capacity, tokens + math.max(0, now - updated) * refill_rate)
+        local allowed = 0
+        local wait = 0
+        if tokens >= 1 then
+            tokens = tokens - 1
+            allowed = 1
+        else
+            wait = (1 - tokens) / refill_rate
+        end
+        redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+        redis.call('EXPIRE', KEYS[1], math.ceil(capacity / refill_rate) + 1)
+        return {allowed, tostring(wait)}
+    """
+
+    def __init__(self, client):
+        self._hit = client.register_script(self.script)
+
+    def hit(self, key, capacity, refill_rate):
+        """Take a token from the bucket at `key`. Returns `(allowed, seconds to wait)`."""
+        allowed, wait = self._hit(keys=[key], args=[capacity, refill_rate, self.timer()])
+        return bool(allowed), float(wait)
+
+
+@lru_cache(maxsize=None)
+def get_rate_limiter():
+    """Return the rate limiter backend for this process."""
+    client = get_redis()
+    if client is not None:
+        return RedisRateLimiter(client)
+    return InMemoryRateLimiter()
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """A django-ninja throttle backed by per-identity token buckets.
+
+    Usage:
+
+    ```python
+    @router.post("/artwork/create", throttle=TokenBucketThrottle("artwork_create"))
+    ```
+    """
+
+    def __init__(self, scope, rate=None, limiter=None):
+        self.scope = scope
+        self.limiter = limiter
+        self.rate = rate or settings.THROTTLE_RATES[scope]
+        self.capacity, self.refill_rate = parse_rate(self.rate)
+        # One instance serves every request to its route. django-ninja asks for `wait()` straight after a refused
+        # `allow_request()` on the same thread, so keeping the wait per thread keeps callers from seeing each other's.
+        self._local = threading.local()
+
+    def get_identity(self, request):
+        """Identify the caller by user id when authenticated, falling back to the client address."""
+        auth = getattr(request, "auth", None)
+        if auth is not None and getattr(auth, "pk", None) is not None:
+            return f"user:{auth.pk}"
+        return f"ip:{self.get_ident(request)}"
+
+    def allow_request(self, request):
+        """Take a token for this scope and caller, refusing the request when the bucket is empty."""
+        key = f"throttle:{self.scope}:{self.get_identity(request)}"
+        limiter = self.limiter or get_rate_limiter()
+        allowed, self._local.wait = limiter.hit(key, self.capacity, self.refill_rate)
+        return allowed
+
+    def wait(self):
+        """Seconds until the caller last refused on this thread will have a token again."""
+        return getattr(self._local, "wait", None)
@@ -1,76 +1,262 @@
 """URLs for the unveil core app."""
 
 from typing import Optional
-
-from apps.core.models import Artwork, Comment, Follow, Profile, Sentiment, View
+from uuid import UUID
+
+from apps.core import deletion, feeds, moderation, notifications
+from apps.core.caching import conditional_cache
+from apps.core.engagement import apply_events
+from apps.core.models import (
+    Artwork,
+    Collection,
+    CollectionItem,
+    Comment,
+    DeletionJob,
+    Follow,
+    Notification,
+    Profile,
+    Report,
+    Sentiment,
+    View,
+)
+from apps.core.pagination import DEFAULT_PAGE_SIZE, clamp_limit, encode_cursor, paginate_values
+from apps.core.schemas import (
+    ArtworkOut,
+    CaseBatch,
+    CensorBatch,
+    CollectionBatch,
+    EventBatch,
+    ModerationCaseOut,
+    NotificationReadBatch,
+    ReportTarget,
+)
+from apps.core.signals import invalidate
+from apps.core.tasks import compute_phash, detect_orientation
+from apps.core.throttling import TokenBucketThrottle
+from apps.users.tokens import AuthBearer
+from django.db import transaction
+from django.db.models import Count
 from ninja import Router
 from ninja.files import UploadedFile
 
 urlpatterns = []
 
-router = Router()
+router = Router(auth=AuthBearer())
+
 
+@router.post("/artwork/create", throttle=TokenBucketThrottle("artwork_create"))
+def upload_image(
+    request,
+    image: UploadedFile,
+    title: str,
+    content: str,
+    orientation: Optional[str] = Artwork.Orientation.NOT_SPECIFIED,
+):
+    """Upload an artwork to the server.
 
-@router.post("/artwork/create")
-def upload_image(request, image: UploadedFile, title: str, content: str, orientation: str):
-    """Upload an artwork to the server."""
+    If no orientation is given, it is detected from the image in the background.
+    """
     user = request.user
     if not user.is_authenticated:
         return {"success": False, "error": "User not authenticated"}
 
-    profile = user.profile
-
-    artwork = Artwork(user=user, image=image, title=title, content=content, orientation=orientation, profile=profile)
+    artwork = Artwork(image=image, title=title, content=content, orientation=orientation, profile_id=user.pk)
     artwork.save()
 
+    if artwork.orientation == Artwork.Orientation.NOT_SPECIFIED:
+        transaction.on_commit(lambda: detect_orientation.enqueue(artwork.pk))
+    transaction.on_commit(lambda: compute_phash.enqueue(artwork.pk))
+
     return {"success": True, "artwork_uuid": artwork.uuid}
 
 
 @router.get("/artwork/get")
-def get_single_artwork(request, artwork_uuid: str):
+@conditional_cache(["artwork:{artwork_uuid}", "viewer:{user.pk}"], per_user=True)
+def get_single_artwork(request, artwork_uuid: UUID):
     """Get an artwork by ID."""
     user = request.user
     if not user.is_authenticated:
         return {"success": False, "error": "User not authenticated"}
 
     try:
-        artwork = Artwork.objects.get(uuid=artwork_uuid)
+        artwork = Artwork.objects.select_related("profile").get(uuid=artwork_uuid)
     except Artwork.DoesNotExist:
         return {"success": False, "error": "Artwork does not exist"}
 
+    # Censored artwork is only shown to its artist.
+    if artwork.is_censored and artwork.profile_id != user.pk:
+        return {"success": False, "error": "Artwork does not exist"}
+
     # If the artwork is not owned by the user and has already been viewed by the user, return an error.
-    if not artwork.profile == user.profile and artwork.viewed_by.all().filter(profile=user.profile).exists():
+    if artwork.profile_id != user.pk and View.objects.filter(profile_id=user.pk, artwork_id=artwork.pk).exists():
         return {"success": False, "error": "Artwork already viewed"}
 
     # Artwork exists, and is either owned by the user or has not been viewed by the user.
-    return {"success": True, "artwork": artwork}
+    return {"success": True, "artwork": ArtworkOut.from_orm(artwork)}
 
 
-@router.get("/artwork/random")
-def get_random_artwork(request, limit: Optional[int] = 5):
-    """Get random artwork."""
+@router.post("/artwork/delete")
+def delete_artwork(request, artwork_uuid: UUID):
+    """Delete one of the user's artworks, with its comments, views and likes, in the background.
+
+    Poll `/deletion/status` with the returned `job_uuid` to follow progress.
+    """
     user = request.user
     if not user.is_authenticated:
         return {"success": False, "error": "User not authenticated"}
 
-    artwork = Artwork.objects.get_random_artwork_for_profile(profile=user.profile, limit=limit)
+    artwork = Artwork.objects.filter(uuid=artwork_uuid, profile_id=user.pk).only("id", "uuid", "profile_id").first()
+    if artwork is None:
+        return {"success": False, "error": "Artwork does not exist"}
 
-    return {"success": True, "artwork": list(artwork)}
+    # Hidden at once; the rows themselves go in the background.
+    with transaction.atomic():
+        Artwork.objects.filter(pk=artwork.pk).update(is_deleted=True)
+        job = deletion.request_deletion(DeletionJob.Kind.ARTWORK, artwork.pk, requested_by=user.pk)
+    invalidate(artwork)
+    return {"success": True, "job_uuid": job.uuid}
 
 
-@router.get("/artwork/ordered")
-def get_ordered_artwork(request, start: Optional[int] = 0, limit: Optional[int] = 5):
-    """Get ordered artwork."""
+@router.get("/deletion/status")
+def get_deletion_status(request, job_uuid: UUID):
+    """Get the progress of a deletion the user requested."""
     user = request.user
     if not user.is_authenticated:
         return {"success": False, "error": "User not authenticated"}
 
-    artwork = Artwork.objects.get_ordered_artwork_for_profile(profile=user.profile, start=start, limit=limit)
+    job = (
+        DeletionJob.objects.filter(uuid=job_uuid, requested_by=user.pk)
+        .values("status", "progress", "created_at", "finished_at")
+        .first()
+    )
+    if job is None:
+        return {"success": False, "error": "Deletion does not exist"}
+    job["status"] = DeletionJob.Status(job["status"]).label
+    return {"success": True, **job}
+
 
-    return {"success": True, "artwork": list(artwork)}
+@router.get("/artwork/duplicates")
+def get_duplicate_artwork(request, artwork_uuid: UUID, max_distance: Optional[int] = 6):
+    """Get artworks whose image is a duplicate or near-duplicate of an artwork's, closest first.
 
+    `max_distance` is how many of the 64 perceptual hash bits may differ, up to `imagehash.MAX_DISTANCE`.
+    """
+    user = request.user
+    if not user.is_authenticated:
+        return {"success": False, "error": "User not authenticated"}
+
+    try:
+        artwork = Artwork.objects.only("id", "phash").get(uuid=artwork_uuid)
+    except Artwork.DoesNotExist:
+        return {"success": False, "error": "Artwork does not exist"}
+    if artwork.phash is None:
+        return {"success": False, "error": "Artwork has not been hashed yet"}
+
+    try:
+        matches = (
+            Artwork.objects.exclude(pk=artwork.pk)
+            .select_related("profile")
+            .only("uuid", "title", "phash", "created_at", "profile__uuid")
+            .get_near_duplicates(artwork.phash, max_distance=max(0, max_distance))
+        )
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
+
+    return {
+        "success": True,
+        "duplicates": [
+            {
+                "uuid": match.uuid,
+                "title": match.title,
+                "profile_uuid": match.profile.uuid,
+                "created_at": match.created_at,
+                "distance": match_distance,
+            }
+            for match, match_distance in matches
+        ],
+    }
+
+
+@router.get("/artwork/random")
+def get_random_artwork(request, limit: Optional[int] = 5, prefetch_token: Optional[str] = None):
+    """Get a page of random unseen artwork, plus a prefetch bundle holding the next page (see `apps.core.feeds`).
 
-@router.post("/artwork/comments/create")
+    Pass the previous response's `prefetch.token` to get the held page without it being drawn again.
+    """
+    user = request.user
+    if not user.is_authenticated:
+        return {"success": False, "error": "User not authenticated"}
+
+    limit = clamp_limit(limit, default=5)
+    held = feeds.take(user.pk, feeds.RANDOM, prefetch_token) if prefetch_token else None
+    # The held page is served as is, so only the page after it needs drawing; otherwise draw both pages at once.
+    artwork = feeds.draw(user.profile, feeds.RANDOM, limit if held else 2 * limit)
+    artwork = [ArtworkOut.from_orm(a).model_dump() for a in artwork]
+    if held:
+        page, upcoming = held["artwork"], artwork
+    else:
+        page, upcoming = artwork[:limit], artwork[limit:]
+
+    return {"success": True, "artwork": page, "prefetch": feeds.hold(user.pk, feeds.RANDOM, upcoming)}
+
+
+@router.get("/artwork/ordered")
+def get_ordered_artwork(
+    request,
+    start: Optional[int] = 0,
+    limit: Optional[int] = 5,
+    cursor: Optional[str] = None,
+    prefetch_token: Optional[str] = None,
+):
+    """Get a page of unseen artwork, newest first, plus a prefetch bundle holding the next page.
+
+    By default pages come from the profile's ordered feed queue (see `apps.core.feeds`). Page explicitly with
+    `start` or the `next_cursor` of the previous response. Pass the previous response's `prefetch.token` to get the
+    held page without it being fetched again.
+    """
+    user = request.user
+    if not user.is_authenticated:
+        return {"success": False, "error": "User not authenticated"}
+
+    limit = clamp_limit(limit, default=5)
+    held = feeds.take(user.pk, feeds.ORDERED, prefetch_token) if prefetch_token else None
+    if held and not held["queued"]:
+        cursor, start = held["cursor"], 0
+    size = limit if held else 2 * limit
+
+    queued = not (cursor or start)
+    if queued:
+        artwork = feeds.draw(user.profile, feeds.ORDERED, size)
+    else:
+        try:
+            artwork = list(
+                Artwork.objects.select_related("profile").get_ordered_artwork_for_profile(
+                    profile=user.profile, start=start, limit=size, cursor=cursor
+                )
+            )
+        except ValueError as e:
+            return {"success": False, "error": str(e)}
+
+    if held:
+        # The bundle's cursor is the one past its last artwork, which is where the served page ends.
+        page, upcoming = held["artwork"], artwork
+        next_cursor = held["cursor"] if upcoming else None
+    else:
+        page, upcoming = artwork[:limit], artwork[limit:]
+        page = [ArtworkOut.from_orm(a).model_dump() for a in page]
+        next_cursor = encode_cursor(artwork[limit - 1].created_at, artwork[limit - 1].pk) if upcoming else None
+    after = encode_cursor(upcoming[-1].created_at, upcoming[-1].pk) if upcoming else None
+    upcoming = [ArtworkOut.from_orm(a).model_dump() for a in upcoming]
+
+    return {
+        "success": True,
+        "artwork": page,
+        "prefetch": feeds.hold(user.pk, feeds.ORDERED, upcoming, cursor=after, queued=queued),
+        "next_cursor": next_cursor,
+    }
+
+
+@router.post("/artwork/comments/create", throttle=TokenBucketThrottle("comment_create"))
 def post_comment(request, artwork_uuid: str, body: str):
     """Post a comment on an artwork."""
     user = request.user
@@ -89,18 +275,38 @@ def post_comment(request, artwork_uuid: str, body: str):
 
 
 @router.get("/artwork/comments/list")
-def get_comments(request, artwork_uuid: str):
-    """Get comments for an artwork."""
+def get_comments(request, artwork_uuid: str, cursor: Optional[str] = None, limit: Optional[int] = DEFAULT_PAGE_SIZE):
+    """Get a page of uncensored comments for an artwork, newest first.
+
+    Comments are anonymous: only the artist who owns the artwork sees who wrote each one.
+    """
     user = request.user
     if not user.is_authenticated:
         return {"success": False, "error": "User not authenticated"}
 
     try:
-        artwork = Artwork.objects.get(uuid=artwork_uuid)
-        comments = Comment.objects.filter(artwork=artwork)
-    except Comment.DoesNotExist:
+        artwork = Artwork.objects.only("id", "profile_id").get(uuid=artwork_uuid)
+    except Artwork.DoesNotExist:
         return {"success": False, "error": "Artwork does not exist"}
-    return {"success": True, "comments": list(comments)}
+
+    fields = ["id", "uuid", "body", "created_at"]
+    # Profile's primary key is the account id, so ownership is known without loading the profile.
+    is_owner = artwork.profile_id == user.pk
+    if is_owner:
+        fields += ["profile__uuid", "profile__account__name"]
+
+    comments = Comment.objects.filter(artwork_id=artwork.pk, is_censored=False).values(*fields)
+    try:
+        rows, next_cursor = paginate_values(comments, cursor=cursor, limit=clamp_limit(limit))
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
+
+    for row in rows:
+        del row["id"]
+        if is_owner:
+            row["profile_uuid"] = row.pop("profile__uuid")
+            row["profile_name"] = row.pop("profile__account__name")
+    return {"success": True, "comments": rows, "next_cursor": next_cursor}
 
 
 @router.get("/artwork/views")
@@ -119,17 +325,18 @@ def get_views(request, artwork_uuid: str):
 
 
 @router.get("/artwork/views/count")
-def get_views_count(request, artwork_uuid: str):
+@conditional_cache(["artwork:{artwork_uuid}:views"])
+def get_views_count(request, artwork_uuid: UUID):
     """Get the number of views for an artwork."""
     user = request.user
     if not user.is_authenticated:
         return {"success": False, "error": "User not authenticated"}
 
     try:
-        artwork = Artwork.objects.get(uuid=artwork_uuid)
+        artwork = Artwork.objects.only("id").get(uuid=artwork_uuid)
     except Artwork.DoesNotExist:
         return {"success": False, "error": "Artwork does not exist"}
-    return {"success": True, "views_count": artwork.get_views_count()}
+    return {"success": True, "views_count": artwork.get_view_count()}
 
 
 @router.post("/artwork/like")
@@ -139,9 +346,12 @@ def like_artwork(request, artwork_uuid: str):
     if not user.is_authenticated:
         return {"success": False, "error": "User not authenticated"}
 
-    artwork = Artwork.objects.get(uuid=artwork_uuid)
-    Sentiment.objects.create(profile=user.profile, artwork=artwork, status=Sentiment.LikeChoices.LIKE)
-    return {"success": True}
+    try:
+        artwork = Artwork.objects.only("id").get(uuid=artwork_uuid)
+    except Artwork.DoesNotExist:
+        return {"success": False, "error": "Artwork does not exist"}
+    sentiment = Sentiment.objects.upsert(user.pk, artwork.pk, Sentiment.LikeChoices.LIKE)
+    return {"success": True, "status": sentiment.status}
 
 
 @router.post("/artwork/dislike")
@@ -151,37 +361,42 @@ def dislike_artwork(request, artwork_uuid: str):
     if not user.is_authenticated:
         return {"success": False, "error": "User not authenticated"}
 
-    artwork = Artwork.objects.get(uuid=artwork_uuid)
-    Sentiment.objects.create(profile=user.profile, artwork=artwork, status=Sentiment.LikeChoices.DISLIKE)
-    return {"success": True}
+    try:
+        artwork = Artwork.objects.only("id").get(uuid=artwork_uuid)
+    except Artwork.DoesNotExist:
+        return {"success": False, "error": "Artwork does not exist"}
+    sentiment = Sentiment.objects.upsert(user.pk, artwork.pk, Sentiment.LikeChoices.DISLIKE)
+    return {"success": True, "status": sentiment.status}
 
 
 @router.get("/artwork/likes/count")
-def get_likes_count(request, artwork_uuid: str):
+@conditional_cache(["artwork:{artwork_uuid}:sentiment"])
+def get_likes_count(request, artwork_uuid: UUID):
     """Get the number of likes for an artwork."""
     user = request.user
     if not user.is_authenticated:
         return {"success": False, "error": "User not authenticated"}
 
     try:
-        artwork = Artwork.objects.get(uuid=artwork_uuid)
+        artwork = Artwork.objects.only("id").get(uuid=artwork_uuid)
     except Artwork.DoesNotExist:
         return {"success": False, "error": "Artwork does not exist"}
-    return {"success": True, "likes_count": artwork.get_likes_count()}
+    return {"success": True, "likes_count": artwork.get_like_count()}
 
 
 @router.get("/artwork/dislikes/count")
-def get_dislikes_count(request, artwork_uuid: str):
+@conditional_cache(["artwork:{artwork_uuid}:sentiment"])
+def get_dislikes_count(request, artwork_uuid: UUID):
     """Get the number of dislikes for an artwork."""
     user = request.user
     if not user.is_authenticated:
         return {"success": False, "error": "User not authenticated"}
 
     try:
-        artwork = Artwork.objects.get(uuid=artwork_uuid)
+        artwork = Artwork.objects.only("id").get(uuid=artwork_uuid)
     except Artwork.DoesNotExist:
         return {"success": False, "error": "Artwork does not exist"}
-    return {"success": True, "dislikes_count": artwork.get_dislikes_count()}
+    return {"success": True, "dislikes_count": artwork.get_dislike_count()}
 
 
 @router.post("/profile/create")
@@ -204,11 +419,11 @@ def follow_profile(request, profile_uuid: str):
         return {"success": False, "error": "User not authenticated"}
 
     try:
-        profile = Profile.objects.get(uuid=profile_uuid)
+        profile = Profile.objects.only("pk").get(uuid=profile_uuid)
     except Profile.DoesNotExist:
         return {"success": False, "error": "Profile does not exist"}
-    Follow.objects.create(following_profile=user.profile, followed_profile=profile)
-    return {"success": True}
+    Follow.objects.upsert(following_profile_id=user.pk, followed_profile_id=profile.pk)
+    return {"success": True, "following": True}
 
 
 @router.post("/profile/unfollow")
@@ -219,66 +434,468 @@ def unfollow_profile(request, profile_uuid: str):
         return {"success": False, "error": "User not authenticated"}
 
     try:
-        profile = Profile.objects.get(uuid=profile_uuid)
+        profile = Profile.objects.only("pk").get(uuid=profile_uuid)
     except Profile.DoesNotExist:
         return {"success": False, "error": "Profile does not exist"}
-    Follow.objects.get(following_profile=user.profile, followed_profile=profile).delete()
-    return {"success": True}
+    Follow.objects.filter(following_profile_id=user.pk, followed_profile=profile).delete()
+    return {"success": True, "following": False}
 
 
 @router.get("/profile/follows/count")
-def get_follower_count(request, profile_uuid: str):
+@conditional_cache(["profile:{profile_uuid}:followers"])
+def get_follower_count(request, profile_uuid: UUID):
     """Get the number of followers for a profile."""
     user = request.user
     if not user.is_authenticated:
         return {"success": False, "error": "User not authenticated"}
 
     try:
-        profile = Profile.objects.get(uuid=profile_uuid)
+        profile = Profile.objects.only("pk").get(uuid=profile_uuid)
     except Profile.DoesNotExist:
         return {"success": False, "error": "Profile does not exist"}
     return {"success": True, "follower_count": profile.get_followers_count()}
 
 
 @router.get("/profile/following/count")
-def get_following_count(request, profile_uuid: str):
+@conditional_cache(["profile:{profile_uuid}:following"])
+def get_following_count(request, profile_uuid: UUID):
     """Get the number of profiles a profile is following."""
     user = request.user
     if not user.is_authenticated:
         return {"success": False, "error": "User not authenticated"}
 
     try:
-        profile = Profile.objects.get(uuid=profile_uuid)
+        profile = Profile.objects.only("pk").get(uuid=profile_uuid)
     except Profile.DoesNotExist:
         return {"success": False, "error": "Profile does not exist"}
     return {"success": True, "following_count": profile.get_following_count()}
 
 
-@router.get("/profile/following")
-def get_following(request, profile_uuid: str):
-    """Get the profiles that a profile is following."""
+@router.get("/profile/summary")
+@conditional_cache(
+    [
+        "profile:{profile_uuid}",
+        "profile:{profile_uuid}:followers",
+        "profile:{profile_uuid}:following",
+        "profile:{profile_uuid}:sentiment",
+        "profile:{profile_uuid}:artworks",
+    ]
+)
+def get_profile_summary(request, profile_uuid: UUID, limit: Optional[int] = 5):
+    """Get what a profile page shows: follower, following, like, dislike and artwork counts, and recent artworks.
+
+    The counts come from one annotated query and the recent artworks from one more.
+    """
     user = request.user
     if not user.is_authenticated:
         return {"success": False, "error": "User not authenticated"}
 
     try:
-        profile = Profile.objects.get(uuid=profile_uuid)
+        profile = Profile.objects.with_summary().get(uuid=profile_uuid)
     except Profile.DoesNotExist:
         return {"success": False, "error": "Profile does not exist"}
-    following = Follow.objects.filter(following_profile=profile)
-    return {"success": True, "following": list(following)}
+    recent = list(Artwork.objects.filter(profile=profile, is_censored=False).get_recent(clamp_limit(limit, default=5)))
+    for artwork in recent:
+        artwork.profile = profile
+    return {
+        "success": True,
+        "profile_uuid": profile.uuid,
+        "follower_count": profile.follower_count,
+        "following_count": profile.following_count,
+        "likes_count": profile.likes_count,
+        "dislikes_count": profile.dislikes_count,
+        "artwork_count": profile.artwork_count,
+        "recent_artwork": [ArtworkOut.from_orm(artwork) for artwork in recent],
+    }
+
+
+@router.get("/profile/following")
+@conditional_cache(["profile:{profile_uuid}:following", "follower:{user.pk}"], per_user=True)
+def get_following(request, profile_uuid: UUID, cursor: Optional[str] = None, limit: Optional[int] = DEFAULT_PAGE_SIZE):
+    """Get a page of the profiles that a profile is following, most recently followed first.
+
+    Each carries whether the requesting user follows it too. Pass the returned `next_cursor` to get the next page.
+    """
+    return _follow_page(request, profile_uuid, False, cursor, limit)
 
 
 @router.get("/profile/followers")
-def get_followers(request, profile_uuid: str):
-    """Get the profiles that are following a profile."""
+@conditional_cache(["profile:{profile_uuid}:followers", "follower:{user.pk}"], per_user=True)
+def get_followers(request, profile_uuid: UUID, cursor: Optional[str] = None, limit: Optional[int] = DEFAULT_PAGE_SIZE):
+    """Get a page of the profiles that are following a profile, most recent first.
+
+    Each carries whether the requesting user follows it back. Pass the returned `next_cursor` to get the next page.
+    """
+    return _follow_page(request, profile_uuid, True, cursor, limit)
+
+
+def _follow_page(request, profile_uuid, followers, cursor, limit):
     user = request.user
     if not user.is_authenticated:
         return {"success": False, "error": "User not authenticated"}
 
     try:
-        profile = Profile.objects.get(uuid=profile_uuid)
+        profile = Profile.objects.only("pk").get(uuid=profile_uuid)
     except Profile.DoesNotExist:
         return {"success": False, "error": "Profile does not exist"}
-    followers = Follow.objects.filter(followed_profile=profile)
-    return {"success": True, "followers": list(followers)}
+    try:
+        rows, next_cursor = Follow.objects.page(
+            profile.pk, followers=followers, viewer_id=user.pk, cursor=cursor, limit=clamp_limit(limit)
+        )
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
+    return {"success": True, "followers" if followers else "following": rows, "next_cursor": next_cursor}
+
+
+@router.get("/profile/mutuals")
+def get_mutuals(request, profile_uuid: UUID, limit: Optional[int] = DEFAULT_PAGE_SIZE):
+    """Get profiles that a profile follows and that follow it back."""
+    user = request.user
+    if not user.is_authenticated:
+        return {"success": False, "error": "User not authenticated"}
+
+    try:
+        profile = Profile.objects.only("pk").get(uuid=profile_uuid)
+    except Profile.DoesNotExist:
+        return {"success": False, "error": "Profile does not exist"}
+    # Imported by each graph query, so that web workers load NumPy only once one is asked for.
+    from apps.core import graph
+
+    pks = graph.get_graph().mutuals(profile.pk)
+    rows = _profile_rows(pks[: clamp_limit(limit)])
+    for row in rows:
+        del row["pk"]
+    return {"success": True, "mutuals": rows, "count": len(pks)}
+
+
+@router.get("/profile/suggestions")
+def get_suggestions(request, limit: Optional[int] = 10):
+    """Suggest profiles to follow: those followed by the most of the profiles the user follows."""
+    user = request.user
+    if not user.is_authenticated:
+        return {"success": False, "error": "User not authenticated"}
+
+    from apps.core import graph
+
+    suggestions = dict(graph.get_graph().suggestions(user.pk, limit=clamp_limit(limit, default=10)))
+    rows = _profile_rows(suggestions)
+    for row in rows:
+        row["followed_by"] = suggestions[row.pop("pk")]
+    return {"success": True, "suggestions": rows}
+
+
+@router.get("/profile/overlap")
+def get_follower_overlap(request, profile_uuid: UUID, other_uuid: UUID):
+    """Get how many followers two profiles share, and what share of their combined followers that is."""
+    user = request.user
+    if not user.is_authenticated:
+        return {"success": False, "error": "User not authenticated"}
+
+    pks = dict(Profile.objects.filter(uuid__in=[profile_uuid, other_uuid]).values_list("uuid", "pk"))
+    if profile_uuid not in pks or other_uuid not in pks:
+        return {"success": False, "error": "Profile does not exist"}
+    from apps.core import graph
+
+    shared, jaccard = graph.get_graph().follower_overlap(pks[profile_uuid], pks[other_uuid])
+    return {"success": True, "shared_followers": shared, "jaccard": jaccard}
+
+
+@router.get("/profile/reach")
+def get_reach(request, profile_uuid: UUID):
+    """Get how many profiles are within two follows of a profile."""
+    user = request.user
+    if not user.is_authenticated:
+        return {"success": False, "error": "User not authenticated"}
+
+    try:
+        profile = Profile.objects.only("pk").get(uuid=profile_uuid)
+    except Profile.DoesNotExist:
+        return {"success": False, "error": "Profile does not exist"}
+    from apps.core import graph
+
+    return {"success": True, "reach": graph.get_graph().reach(profile.pk)}
+
+
+def _profile_rows(pks):
+    """Load the uuid and name of the active profiles among `pks`, in the order given."""
+    rows = Profile.objects.filter(pk__in=list(pks), account__is_active=True).values("pk", "uuid", "account__name")
+    found = {row["pk"]: {"pk": row["pk"], "profile_uuid": row["uuid"], "name": row["account__name"]} for row in rows}
+    return [found[pk] for pk in pks if pk in found]
+
+
+@router.post("/events/batch", throttle=TokenBucketThrottle("events_batch"))
+def batch_events(request, batch: EventBatch):
+    """Apply a batch of queued likes, dislikes, views and follows in a single transaction.
+
+    Returns one result per submitted event, in order.
+    """
+    user = request.user
+    if not user.is_authenticated:
+        return {"success": False, "error": "User not authenticated"}
+
+    return {"success": True, "results": apply_events(user.pk, batch.events)}
+
+
+@router.post("/collection/create")
+def create_collection(request, title: str, description: str = "", is_public: bool = True):
+    """Create an empty collection."""
+    user = request.user
+    if not user.is_authenticated:
+        return {"success": False, "error": "User not authenticated"}
+
+    if Collection.objects.filter(profile_id=user.pk, title=title).exists():
+        return {"success": False, "error": "Collection already exists"}
+    collection = Collection.objects.create(
+        profile_id=user.pk, title=title, description=description, is_public=is_public
+    )
+    return {"success": True, "collection_uuid": collection.uuid}
+
+
+@router.get("/collection/list")
+def list_collections(request, profile_uuid: UUID):
+    """Get a profile's collections. Private collections are only listed for their curator."""
+    user = request.user
+    if not user.is_authenticated:
+        return {"success": False, "error": "User not authenticated"}
+
+    collections = Collection.objects.filter(profile__uuid=profile_uuid).annotate(item_count=Count("items"))
+    if not Profile.objects.filter(pk=user.pk, uuid=profile_uuid).exists():
+        collections = collections.filter(is_public=True)
+    return {
+        "success": True,
+        "collections": list(
+            collections.values("uuid", "title", "description", "is_public", "item_count", "created_at")
+        ),
+    }
+
+
+@router.post("/collection/items/add")
+def add_to_collection(request, batch: CollectionBatch):
+    """Append artworks to the end of one of the user's collections, in the order given."""
+    user = request.user
+    if not user.is_authenticated:
+        return {"success": False, "error": "User not authenticated"}
+
+    try:
+        collection = Collection.objects.only("pk").get(uuid=batch.collection_uuid, profile_id=user.pk)
+    except Collection.DoesNotExist:
+        return {"success": False, "error": "Collection does not exist"}
+
+    found = dict(Artwork.objects.filter(uuid__in=batch.artworks, is_censored=False).values_list("uuid", "pk"))
+    artwork_ids = [found[artwork_uuid] for artwork_uuid in batch.artworks if artwork_uuid in found]
+    added = CollectionItem.objects.add_many(collection, artwork_ids)
+    return {"success": True, "added": added, "missing": len(set(batch.artworks)) - len(found)}
+
+
+@router.post("/collection/items/remove")
+def remove_from_collection(request, batch: CollectionBatch):
+    """Remove artworks from one of the user's collections."""
+    user = request.user
+    if not user.is_authenticated:
+        return {"success": False, "error": "User not authenticated"}
+
+    try:
+        collection = Collection.objects.only("pk").get(uuid=batch.collection_uuid, profile_id=user.pk)
+    except Collection.DoesNotExist:
+        return {"success": False, "error": "Collection does not exist"}
+
+    # Deleted artworks and those of deactivated accounts can still be taken out.
+    artwork_ids = Artwork.all_objects.filter(uuid__in=batch.artworks).values("pk")
+    return {"success": True, "removed": CollectionItem.objects.remove_many(collection, artwork_ids)}
+
+
+@router.post("/collection/items/move")
+def move_in_collection(request, collection_uuid: UUID, artwork_uuid: UUID, after_uuid: Optional[UUID] = None):
+    """Move an artwork to just after another in one of the user's collections, or to the front."""
+    user = request.user
+    if not user.is_authenticated:
+        return {"success": False, "error": "User not authenticated"}
+
+    try:
+        collection = Collection.objects.only("pk").get(uuid=collection_uuid, profile_id=user.pk)
+    except Collection.DoesNotExist:
+        return {"success": False, "error": "Collection does not exist"}
+
+    found = dict(Artwork.objects.filter(uuid__in=[artwork_uuid, after_uuid]).values_list("uuid", "pk"))
+    if artwork_uuid not in found or (after_uuid is not None and after_uuid not in found):
+        return {"success": False, "error": "Artwork does not exist"}
+
+    with transaction.atomic():
+        moved = CollectionItem.objects.move(collection, found[artwork_uuid], after_artwork_id=found.get(after_uuid))
+    if not moved:
+        return {"success": False, "error": "Artwork is not in the collection"}
+    return {"success": True}
+
+
+@router.get("/collection/items")
+def get_collection_items(
+    request, collection_uuid: UUID, cursor: Optional[str] = None, limit: Optional[int] = DEFAULT_PAGE_SIZE
+):
+    """Get a page of a collection's artworks in curated order.
+
+    Pass the previous response's `next_cursor` for the next page. Each page, artworks included, is one query.
+    """
+    user = request.user
+    if not user.is_authenticated:
+        return {"success": False, "error": "User not authenticated"}
+
+    try:
+        collection = Collection.objects.only("pk", "profile_id", "is_public").get(uuid=collection_uuid)
+    except Collection.DoesNotExist:
+        return {"success": False, "error": "Collection does not exist"}
+    if not collection.is_public and collection.profile_id != user.pk:
+        return {"success": False, "error": "Collection does not exist"}
+
+    try:
+        after = int(cursor) if cursor else None
+    except ValueError:
+        return {"success": False, "error": "Invalid cursor"}
+
+    items, after = CollectionItem.objects.page(collection, after=after, limit=clamp_limit(limit))
+    return {
+        "success": True,
+        "artwork": [ArtworkOut.from_orm(item.artwork) for item in items],
+        "next_cursor": str(after) if after is not None else None,
+    }
+
+
+@router.post("/report", throttle=TokenBucketThrottle("report_create"))
+def create_report(
+    request, target: ReportTarget, uuid: UUID, reason: Report.Reason = Report.Reason.OTHER, details: str = ""
+):
+    """Report an artwork, comment or profile to the moderators."""
+    user = request.user
+    if not user.is_authenticated:
+        return {"success": False, "error": "User not authenticated"}
+
+    model = moderation.TARGET_MODELS[target.value]
+    try:
+        reported = model.objects.get(uuid=uuid)
+    except model.DoesNotExist:
+        return {"success": False, "error": f"{model.__name__} does not exist"}
+
+    report, created = moderation.report(user.pk, reported, reason, details)
+    return {"success": True, "report_uuid": report.uuid, "duplicate": not created}
+
+
+@router.post("/moderation/claim")
+def claim_cases(request, limit: Optional[int] = 10):
+    """Claim the next cases from the moderation queue, most reported first."""
+    user = request.user
+    if not user.is_authenticated or not user.is_staff:
+        return {"success": False, "error": "User is not a moderator"}
+
+    cases = moderation.claim(user.pk, limit=clamp_limit(limit, default=10))
+    reasons = moderation.reason_counts(cases)
+    return {
+        "success": True,
+        "cases": [
+            ModerationCaseOut(
+                uuid=case.uuid,
+                target_type=type(case.target).__name__.lower(),
+                target_uuid=case.target.uuid,
+                report_count=case.report_count,
+                reasons=reasons[case.pk],
+                first_reported_at=case.first_reported_at,
+                last_reported_at=case.last_reported_at,
+            )
+            for case in cases
+        ],
+    }
+
+
+@router.post("/moderation/censor")
+def censor(request, batch: CensorBatch):
+    """Censor artworks and comments in bulk, resolving their cases."""
+    user = request.user
+    if not user.is_authenticated or not user.is_staff:
+        return {"success": False, "error": "User is not a moderator"}
+
+    changed, resolved = moderation.set_censored(user.pk, batch.artworks, batch.comments, censored=True)
+    return {"success": True, "changed": changed, "resolved": resolved}
+
+
+@router.post("/moderation/uncensor")
+def uncensor(request, batch: CensorBatch):
+    """Uncensor artworks and comments in bulk, resolving their cases."""
+    user = request.user
+    if not user.is_authenticated or not user.is_staff:
+        return {"success": False, "error": "User is not a moderator"}
+
+    changed, resolved = moderation.set_censored(user.pk, batch.artworks, batch.comments, censored=False)
+    return {"success": True, "changed": changed, "resolved": resolved}
+
+
+@router.post("/moderation/dismiss")
+def dismiss_cases(request, batch: CaseBatch):
+    """Resolve cases without acting on what was reported."""
+    user = request.user
+    if not user.is_authenticated or not user.is_staff:
+        return {"success": False, "error": "User is not a moderator"}
+
+    return {"success": True, "resolved": moderation.dismiss(user.pk, batch.cases)}
+
+
+@router.get("/notifications")
+def list_notifications(request, cursor: Optional[str] = None, limit: Optional[int] = DEFAULT_PAGE_SIZE):
+    """Get a page of the user's notifications, most recently active first.
+
+    Each counts a burst of comments, likes or follows. Comments and follows name whoever acted last; likes don't.
+    Pass the returned `next_cursor` to get the next page.
+    """
+    user = request.user
+    if not user.is_authenticated:
+        return {"success": False, "error": "User not authenticated"}
+
+    rows = Notification.objects.filter(recipient_id=user.pk).values(
+        "id",
+        "uuid",
+        "kind",
+        "artwork__uuid",
+        "last_actor__uuid",
+        "last_actor__account__name",
+        "actor_count",
+        "is_read",
+        "modified_at",
+    )
+    try:
+        rows, next_cursor = paginate_values(rows, cursor=cursor, limit=clamp_limit(limit), created_field="modified_at")
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
+
+    page = []
+    for row in rows:
+        named = row["kind"] != Notification.Kind.LIKE
+        page.append(
+            {
+                "uuid": row["uuid"],
+                "kind": Notification.Kind(row["kind"]).label,
+                "artwork_uuid": row["artwork__uuid"],
+                "actor_count": row["actor_count"],
+                "last_actor_uuid": row["last_actor__uuid"] if named else None,
+                "last_actor_name": row["last_actor__account__name"] if named else None,
+                "is_read": row["is_read"],
+                "updated_at": row["modified_at"],
+            }
+        )
+    return {"success": True, "notifications": page, "next_cursor": next_cursor}
+
+
+@router.get("/notifications/unread")
+def get_unread_count(request):
+    """Get how many of the user's notifications are unread. Poll this, or stream it from `/notifications/stream`."""
+    user = request.user
+    if not user.is_authenticated:
+        return {"success": False, "error": "User not authenticated"}
+    return {"success": True, "unread_count": notifications.unread_count(user.pk)}
+
+
+@router.post("/notifications/read")
+def mark_notifications_read(request, batch: NotificationReadBatch):
+    """Mark some or all of the user's notifications read."""
+    user = request.user
+    if not user.is_authenticated:
+        return {"success": False, "error": "User not authenticated"}
+
+    marked = notifications.mark_read(user.pk, None if batch.all else batch.notifications)
+    return {"success": True, "marked": marked, "unread_count": notifications.unread_count(user.pk)}
@@ -1,5 +1,120 @@
-"""Views for the unveil core app."""
+"""Views for the unveil core app that the ninja API cannot serve.
 
-from django.shortcuts import render
+Event streams are long-lived responses, so they are plain async Django views: under ASGI, an open stream costs a
+coroutine rather than a worker thread.
+"""
 
-# Create your views here.
+import json
+import time
+
+from apps.core import live, notifications
+from apps.users.tokens import TokenError, decode_token
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+
+KEEPALIVE_INTERVAL = 15
+WSGI_ERROR = "Streaming needs an ASGI server; poll {} instead"
+
+
+def _bearer_token(request):
+    header = request.headers.get("Authorization", "")
+    if header.startswith("Bearer "):
+        return header.removeprefix("Bearer ")
+    # EventSource cannot set headers, so browsers pass the access token in the query string instead.
+    return request.GET.get("access_token", "")
+
+
+async def _authenticate(request):
+    """Return the claims of the request's access token, or None if it has none that can be trusted."""
+    try:
+        return await sync_to_async(decode_token)(_bearer_token(request))
+    except TokenError:
+        return None
+
+
+def _event_stream(events):
+    response = StreamingHttpResponse(events, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Keep proxies such as nginx from buffering the stream.
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+async def notification_stream(request):
+    """Stream the user's unread notification count as server-sent events.
+
+    An `unread` event is sent on connecting and whenever the count changes, as pushed through the live channel (see
+    `apps.core.live`), so an open stream costs no queries while nothing happens. The stream closes after
+    `NOTIFICATION_STREAM_TIMEOUT` seconds and the client reconnects. Under WSGI each stream would hold a worker, so
+    there the client is told to poll `/notifications/unread` instead.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({"success": False, "error": WSGI_ERROR.format("/notifications/unread")}, status=400)
+    claims = await _authenticate(request)
+    if claims is None:
+        return JsonResponse({"detail": "Unauthorized"}, status=401)
+    return _event_stream(_unread_events(int(claims["sub"])))
+
+
+async def _unread_events(profile_id):
+    hub = live.get_hub()
+    hub.start()
+    subscriber = live.Subscriber()
+    # Watch before reading the count, so that no change in between is missed.
+    hub.watch_inbox(subscriber, profile_id)
+    try:
+        deadline = time.monotonic() + settings.NOTIFICATION_STREAM_TIMEOUT
+        yield f"retry: {settings.LIVE_PUSH_INTERVAL * 1000}\n\n"
+        last_count = await notifications.aunread_count(profile_id)
+        yield f"event: unread\ndata: {json.dumps({'unread_count': last_count})}\n\n"
+        while (remaining := deadline - time.monotonic()) > 0:
+            messages = await subscriber.wait(min(KEEPALIVE_INTERVAL, remaining))
+            if messages is None:
+                yield ": keepalive\n\n"
+                continue
+            latest = json.loads(messages)[-1]
+            # After a resync, the pushed counts may have missed a change.
+            count = await notifications.aunread_count(profile_id) if "resync" in latest else latest["unread_count"]
+            if count != last_count:
+                last_count = count
+                yield f"event: unread\ndata: {json.dumps({'unread_count': count})}\n\n"
+    finally:
+        hub.unwatch_inbox(subscriber, profile_id)
+
+
+async def artwork_live(request):
+    """Stream live counter deltas for the artworks in `artwork_uuids`, a comma-separated list, as server-sent events.
+
+    Each `counts` event is a list of deltas (see `apps.core.live`); on a `resync` event, fetch the counts again. To
+    change which artworks are watched without reconnecting, use the `/live` WebSocket instead.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({"success": False, "error": WSGI_ERROR.format("the count endpoints")}, status=400)
+    if await _authenticate(request) is None:
+        return JsonResponse({"detail": "Unauthorized"}, status=401)
+    try:
+        artwork_uuids = live.parse_artwork_uuids(filter(None, request.GET.get("artwork_uuids", "").split(",")))
+    except ValueError:
+        return JsonResponse({"success": False, "error": "Invalid artwork uuid"}, status=400)
+    if not artwork_uuids or len(artwork_uuids) > settings.LIVE_MAX_SUBSCRIPTIONS:
+        return JsonResponse(
+            {"success": False, "error": f"Watch between 1 and {settings.LIVE_MAX_SUBSCRIPTIONS} artworks"}, status=400
+        )
+    return _event_stream(_counter_events(artwork_uuids))
+
+
+async def _counter_events(artwork_uuids):
+    hub = live.get_hub()
+    hub.start()
+    subscriber = live.Subscriber()
+    hub.subscribe(subscriber, artwork_uuids)
+    try:
+        yield f"retry: {settings.LIVE_PUSH_INTERVAL * 1000}\n\n"
+        while True:
+            # Stay open until the client goes away; the hub only pushes while something changes.
+            messages = await subscriber.wait(KEEPALIVE_INTERVAL)
+            yield ": keepalive\n\n" if messages is None else f"event: counts\ndata: {messages}\n\n"
+    finally:
+        hub.unsubscribe(subscriber)
@@ -0,0 +1,53 @@
+"""Measure signup throughput under a burst of registrations."""
+
+import time
+import uuid
+
+from apps.users.models import UserAccount
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+
+
+class Rollback(Exception):
+    """Raised to discard the benchmark's accounts."""
+
+
+class Command(BaseCommand):
+    help = "Benchmark UserAccount.objects.create_account() for each password hasher profile. Nothing is kept."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=50, help="Accounts to register per profile.")
+        parser.add_argument(
+            "--profile",
+            action="append",
+            choices=sorted(settings.PASSWORD_HASHER_PROFILES),
+            help="Hasher profile to benchmark; repeat for several. Defaults to all of them.",
+        )
+
+    def handle(self, *args, **options):
+        count = options["count"]
+        for profile in options["profile"] or sorted(settings.PASSWORD_HASHER_PROFILES):
+            with override_settings(PASSWORD_HASHERS=settings.PASSWORD_HASHER_PROFILES[profile]):
+                elapsed = self.run_burst(count)
+            self.stdout.write(
+                f"{profile:>10}: {count} signups in {elapsed:.3f}s, "
+                f"{count / elapsed:.1f} signups/s, {elapsed / count * 1000:.2f}ms each"
+            )
+
+    def run_burst(self, count):
+        """Register `count` accounts inside a transaction that is rolled back, returning the elapsed time."""
+        prefix = uuid.uuid4().hex[:8]
+        try:
+            with transaction.atomic():
+                start = time.perf_counter()
+                for i in range(count):
+                    UserAccount.objects.create_account(
+                        email=f"benchmark-{prefix}-{i}@example.com", name="Benchmark", password="correct horse"
+                    )
+                elapsed = time.perf_counter() - start
+                raise Rollback
+        except Rollback:
+            pass
+        return elapsed
@@ -7,7 +7,7 @@ from django.contrib.auth.models import (
     BaseUserManager,
     PermissionsMixin,
 )
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
@@ -28,6 +28,53 @@ class UserAccountManager(BaseUserManager):
 
         return user
 
+    def create_account(self, email, name, password):
+        """Sign up a new user: create the account and its Profile atomically.
+
+        Duplicate emails are rejected before the password is hashed, so retried signups don't pay for hashing twice.
+        The unique constraint still guards against a concurrent signup with the same email.
+
+        Raises `ValueError` if the email is missing or already registered.
+        """
+        from apps.core.models import Profile
+
+        if not email:
+            raise ValueError("User must have an email address")
+        email = self.normalize_email(email)
+        if self.filter(email=email).exists():
+            raise ValueError("Email already registered")
+
+        user = self.model(email=email, name=name)
+        user.set_password(password)
+        try:
+            with transaction.atomic(using=self._db):
+                user.save(using=self._db)
+                Profile.objects.using(self._db).create(account=user)
+        except IntegrityError as e:
+            raise ValueError("Email already registered") from e
+        return user
+
+    def set_active(self, account_ids, is_active):
+        """Activate or deactivate accounts, showing or hiding their artworks to match.
+
+        Artworks carry their own copy of the flag (see `Artwork.is_artist_active`), which is brought in line with one
+        bulk UPDATE rather than per row. Deactivated accounts have their tokens revoked once this commits, so they
+        cannot write another artwork under the old flag. Returns the number of accounts changed.
+        """
+        from apps.core.models import Artwork
+        from apps.core.signals import invalidate
+        from apps.users.tokens import revoke_account_tokens
+
+        account_ids = list(account_ids)
+        with transaction.atomic(using=self._db):
+            changed = self.filter(pk__in=account_ids).exclude(is_active=is_active).update(is_active=is_active)
+            artworks = Artwork.all_objects.using(self._db).filter(profile_id__in=account_ids)
+            invalidate(*artworks.exclude(is_artist_active=is_active).only("id", "uuid", "profile_id"))
+            artworks.exclude(is_artist_active=is_active).update(is_artist_active=is_active)
+            if not is_active:
+                transaction.on_commit(lambda: revoke_account_tokens(account_ids), using=self._db)
+        return changed
+
     def create_superuser(self, email, name, password):
         """Create a new superuser account."""
         user = self.create_user(email, name, password)
@@ -1,5 +1,156 @@
 """Tests for the unveil users app."""
 
-from django.test import TestCase
+import time
+from unittest import mock
 
-# Create your tests here.
+from apps.core.models import Profile, ProfileQuerySet
+from apps.core.throttling import get_rate_limiter
+from apps.users.models import UserAccount
+from apps.users.tokens import get_denylist
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+
+# HS256 keys should be at least 32 bytes.
+OLD_KEY = "old-signing-key-" * 2
+NEW_KEY = "new-signing-key-" * 2
+
+
+class TokenTests(TestCase):
+    def setUp(self):
+        # Revocations and rate limits live in process and would outlast the test.
+        get_denylist.cache_clear()
+        get_rate_limiter.cache_clear()
+        self.account = UserAccount.objects.create_account(email="ada@example.com", name="ada", password="password")
+
+    def login(self):
+        return self.client.post("/account/login", {"email": "ada@example.com", "password": "password"}).json()
+
+    def bearer(self, token):
+        return self.client.get("/bearer", headers={"Authorization": f"Bearer {token}"})
+
+    def refresh(self, token):
+        return self.client.post("/account/refresh", {"refresh_token": token}).json()
+
+    def test_login_issues_a_working_pair(self):
+        tokens = self.login()
+        self.assertEqual(tokens["token_type"], "Bearer")
+        self.assertEqual(self.bearer(tokens["access"]).json(), {"user_id": self.account.pk})
+
+    def test_wrong_password(self):
+        response = self.client.post("/account/login", {"email": "ada@example.com", "password": "wrong"}).json()
+        self.assertEqual(response, {"error": "Invalid credentials"})
+
+    def test_refresh_token_is_not_an_access_token(self):
+        self.assertEqual(self.bearer(self.login()["refresh"]).status_code, 401)
+
+    def test_refresh_tokens_are_single_use(self):
+        refresh_token = self.login()["refresh"]
+        tokens = self.refresh(refresh_token)
+        self.assertEqual(self.bearer(tokens["access"]).status_code, 200)
+        self.assertEqual(self.refresh(refresh_token), {"error": "Token has been revoked"})
+        self.assertIn("access", self.refresh(tokens["refresh"]))
+
+    def test_logout_revokes_both_tokens(self):
+        tokens = self.login()
+        response = self.client.post(
+            "/account/logout",
+            {"refresh_token": tokens["refresh"]},
+            headers={"Authorization": f"Bearer {tokens['access']}"},
+        )
+        self.assertEqual(response.json(), {"success": True})
+        self.assertEqual(self.bearer(tokens["access"]).status_code, 401)
+        self.assertEqual(self.refresh(tokens["refresh"]), {"error": "Token has been revoked"})
+
+    def test_inactive_accounts_cannot_refresh(self):
+        refresh_token = self.login()["refresh"]
+        UserAccount.objects.filter(pk=self.account.pk).update(is_active=False)
+        self.assertEqual(self.refresh(refresh_token), {"error": "Account is inactive"})
+
+    def test_key_rotation(self):
+        with override_settings(JWT_SIGNING_KEYS={"old": OLD_KEY}, JWT_ACTIVE_KID="old"):
+            old = self.login()["access"]
+        # Tokens signed with the old key still verify until it is dropped.
+        with override_settings(JWT_SIGNING_KEYS={"old": OLD_KEY, "new": NEW_KEY}, JWT_ACTIVE_KID="new"):
+            new = self.login()["access"]
+            self.assertEqual(self.bearer(old).status_code, 200)
+            self.assertEqual(self.bearer(new).status_code, 200)
+        with override_settings(JWT_SIGNING_KEYS={"new": NEW_KEY}, JWT_ACTIVE_KID="new"):
+            self.assertEqual(self.bearer(old).status_code, 401)
+            self.assertEqual(self.bearer(new).status_code, 200)
+
+    def test_deactivation_revokes_issued_tokens(self):
+        tokens = self.login()
+        with self.captureOnCommitCallbacks(execute=True):
+            UserAccount.objects.set_active([self.account.pk], False)
+        self.assertEqual(self.bearer(tokens["access"]).status_code, 401)
+        self.assertEqual(self.refresh(tokens["refresh"]), {"error": "Token has been revoked"})
+        # Coming back does not bring old tokens back.
+        UserAccount.objects.set_active([self.account.pk], True)
+        self.assertEqual(self.bearer(tokens["access"]).status_code, 401)
+
+    def test_saving_an_inactive_account_revokes_its_tokens(self):
+        tokens = self.login()
+        self.account.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.account.save()
+        self.assertEqual(self.bearer(tokens["access"]).status_code, 401)
+
+    def test_tokens_issued_after_reactivation_work(self):
+        # The cutoff is in whole seconds, so it is moved back out of the way of the new login.
+        with mock.patch("apps.users.tokens.time.time", return_value=time.time() - 5):
+            with self.captureOnCommitCallbacks(execute=True):
+                UserAccount.objects.set_active([self.account.pk], False)
+        UserAccount.objects.set_active([self.account.pk], True)
+        tokens = self.login()
+        self.assertEqual(self.bearer(tokens["access"]).status_code, 200)
+        self.assertIn("access", self.refresh(tokens["refresh"]))
+
+    def test_other_accounts_keep_their_tokens(self):
+        UserAccount.objects.create_account(email="grace@example.com", name="grace", password="password")
+        response = self.client.post("/account/login", {"email": "grace@example.com", "password": "password"})
+        with self.captureOnCommitCallbacks(execute=True):
+            UserAccount.objects.set_active([self.account.pk], False)
+        self.assertEqual(self.bearer(response.json()["access"]).status_code, 200)
+
+
+class AccountCreationTests(TestCase):
+    def setUp(self):
+        get_rate_limiter.cache_clear()
+
+    def test_account_comes_with_a_profile(self):
+        account = UserAccount.objects.create_account(email="ada@EXAMPLE.com", name="ada", password="password")
+        self.assertEqual(account.email, "ada@example.com")
+        self.assertTrue(Profile.objects.filter(pk=account.pk).exists())
+        self.assertTrue(account.check_password("password"))
+
+    def test_duplicate_email_is_refused_before_hashing(self):
+        UserAccount.objects.create_account(email="ada@example.com", name="ada", password="password")
+        with mock.patch.object(UserAccount, "set_password") as set_password:
+            with self.assertRaisesMessage(ValueError, "Email already registered"):
+                UserAccount.objects.create_account(email="ada@EXAMPLE.com", name="ada", password="password")
+        set_password.assert_not_called()
+
+    def test_failed_profile_leaves_no_account(self):
+        with mock.patch.object(ProfileQuerySet, "create", side_effect=IntegrityError):
+            with self.assertRaises(ValueError):
+                UserAccount.objects.create_account(email="ada@example.com", name="ada", password="password")
+        self.assertFalse(UserAccount.objects.exists())
+
+    def test_endpoint(self):
+        params = {"given_name": "ada", "given_password": "password", "given_email": "ada@example.com"}
+        self.assertEqual(self.client.post("/account/create", query_params=params).json(), {"success": True})
+        response = self.client.post("/account/create", query_params=params).json()
+        self.assertEqual(response, {"error": "Email already registered"})
+
+    @override_settings(PASSWORD_HASHERS=settings.PASSWORD_HASHER_PROFILES["argon2"])
+    def test_tuned_argon2_upgrades_other_hashes_on_login(self):
+        account = UserAccount.objects.create_account(email="ada@example.com", name="ada", password="password")
+        self.assertIn("$m=19456,t=2,p=1$", account.password)
+
+        account.password = make_password("password", hasher="pbkdf2_sha256")
+        account.save()
+        self.assertTrue(account.check_password("password"))
+        account.refresh_from_db()
+        self.assertTrue(account.password.startswith("argon2$argon2id$"))
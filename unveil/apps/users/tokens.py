@@ -0,0 +1,248 @@
+"""JSON Web Token issuing and verification for the unveil users app.
+
+Access tokens are short-lived and verified without touching the database: the signature is checked against a
+cached signing key selected by the token's `kid` header, and the token id is checked against a revocation denylist
+held in Redis (or in process memory when Redis is not configured). Deactivating an account revokes every token issued
+to it so far in the same denylist, by the time of deactivation, so that the account loses access at once rather than
+when its access token expires. Refresh tokens are long-lived, single-use, and
+exchanged for a new token pair without re-running the password hasher.
+"""
+
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from functools import cached_property, lru_cache
+
+import jwt
+from apps.core.connections import get_redis
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from ninja.security import HttpBearer
+
+ALGORITHM = "HS256"
+ACCESS = "access"
+REFRESH = "refresh"
+
+
+class TokenError(Exception):
+    """Raised when a token is malformed, expired, revoked, or of the wrong type."""
+
+
+@lru_cache(maxsize=None)
+def get_signing_keys():
+    """Return the configured signing keys, keyed by `kid`."""
+    return {kid: key.encode() for kid, key in settings.JWT_SIGNING_KEYS.items()}
+
+
+@receiver(setting_changed)
+def _reset_signing_keys(setting, **kwargs):
+    if setting in ("JWT_SIGNING_KEYS", "JWT_ACTIVE_KID"):
+        get_signing_keys.cache_clear()
+
+
+class InMemoryDenylist:
+    """A process-local denylist of revoked token ids. Suitable for development, tests and single-process setups."""
+
+    def __init__(self):
+        self._expiries = {}
+        self._accounts = {}
+        self._lock = threading.Lock()
+
+    def add(self, jti, expires_at):
+        """Revoke `jti` until the epoch timestamp `expires_at`. Returns False if it was already revoked."""
+        with self._lock:
+            self._purge()
+            if jti in self._expiries:
+                return False
+            self._expiries[jti] = expires_at
+            return True
+
+    def add_account(self, account_id, issued_before, expires_at):
+        """Revoke every token of `account_id` issued up to `issued_before`, until `expires_at` (epoch timestamps)."""
+        with self._lock:
+            self._purge()
+            self._accounts[str(account_id)] = (issued_before, expires_at)
+
+    def is_revoked(self, claims):
+        """Whether the token with `claims` has been revoked, by its id or with its account's."""
+        if claims["jti"] in self:
+            return True
+        issued_before, expires_at = self._accounts.get(claims["sub"], (None, 0))
+        return expires_at > time.time() and claims["iat"] <= issued_before
+
+    def __contains__(self, jti):
+        expires_at = self._expiries.get(jti)
+        return expires_at is not None and expires_at > time.time()
+
+    def _purge(self):
+        now = time.time()
+        for jti in [jti for jti, expires_at in self._expiries.items() if expires_at <= now]:
+            del self._expiries[jti]
+        for account_id in [account_id for account_id, (_, expires_at) in self._accounts.items() if expires_at <= now]:
+            del self._accounts[account_id]
+
+
+class RedisDenylist:
+    """A denylist of revoked token ids shared by every worker through Redis.
+
+    Each entry expires with the token it revokes, so the denylist never grows beyond the set of live tokens.
+    """
+
+    prefix = "jwt:denylist:"
+
+    def __init__(self, client):
+        self.client = client
+
+    def add(self, jti, expires_at):
+        """Revoke `jti` until the epoch timestamp `expires_at`. Returns False if it was already revoked."""
+        ttl = int(expires_at - time.time()) + 1
+        return bool(self.client.set(self.prefix + jti, 1, ex=max(ttl, 1), nx=True))
+
+    def add_account(self, account_id, issued_before, expires_at):
+        """Revoke every token of `account_id` issued up to `issued_before`, until `expires_at` (epoch timestamps)."""
+        ttl = int(expires_at - time.time()) + 1
+        self.client.set(f"{self.prefix}account:{account_id}", issued_before, ex=max(ttl, 1))
+
+    def is_revoked(self, claims):
+        """Whether the token with `claims` has been revoked, by its id or with its account's."""
+        # One round trip for both, as every authenticated request asks.
+        revoked, issued_before = self.client.mget(self.prefix + claims["jti"], f"{self.prefix}account:{claims['sub']}")
+        return revoked is not None or (issued_before is not None and claims["iat"] <= float(issued_before))
+
+    def __contains__(self, jti):
+        return bool(self.client.exists(self.prefix + jti))
+
+
+@lru_cache(maxsize=None)
+def get_denylist():
+    """Return the denylist backend for this process."""
+    client = get_redis()
+    if client is not None:
+        return RedisDenylist(client)
+    return InMemoryDenylist()
+
+
+def _encode(user_id, token_type, lifetime):
+    now = datetime.now(tz=timezone.utc)
+    payload = {
+        "sub": str(user_id),
+        "typ": token_type,
+        "jti": uuid.uuid4().hex,
+        "iat": now,
+        "exp": now + lifetime,
+    }
+    kid = settings.JWT_ACTIVE_KID
+    return jwt.encode(payload, get_signing_keys()[kid], algorithm=ALGORITHM, headers={"kid": kid})
+
+
+def issue_tokens(user_id):
+    """Issue a new access/refresh token pair for a user."""
+    return {
+        "access": _encode(user_id, ACCESS, settings.JWT_ACCESS_TOKEN_LIFETIME),
+        "refresh": _encode(user_id, REFRESH, settings.JWT_REFRESH_TOKEN_LIFETIME),
+        "token_type": "Bearer",
+        "expires_in": int(settings.JWT_ACCESS_TOKEN_LIFETIME.total_seconds()),
+    }
+
+
+def decode_token(token, token_type=ACCESS):
+    """Verify a token and return its claims.
+
+    Raises `TokenError` if the token cannot be trusted.
+    """
+    try:
+        kid = jwt.get_unverified_header(token).get("kid")
+        key = get_signing_keys().get(kid)
+        if key is None:
+            raise TokenError("Unknown signing key")
+        claims = jwt.decode(token, key, algorithms=[ALGORITHM], options={"require": ["exp", "iat", "sub", "jti"]})
+    except jwt.PyJWTError as e:
+        raise TokenError(str(e)) from e
+
+    if claims.get("typ") != token_type:
+        raise TokenError("Wrong token type")
+    if get_denylist().is_revoked(claims):
+        raise TokenError("Token has been revoked")
+    return claims
+
+
+def revoke_token(claims):
+    """Revoke a decoded token until it would have expired anyway.
+
+    Returns False if the token had already been revoked, which lets concurrent callers race safely for it.
+    """
+    return get_denylist().add(claims["jti"], claims["exp"])
+
+
+def revoke_account_tokens(account_ids):
+    """Revoke every token issued so far to the accounts `account_ids`, as when they are deactivated.
+
+    `iat` is in whole seconds, so a token issued in the same second as the revocation is revoked too.
+    """
+    now = time.time()
+    expires_at = now + max(settings.JWT_ACCESS_TOKEN_LIFETIME, settings.JWT_REFRESH_TOKEN_LIFETIME).total_seconds()
+    for account_id in account_ids:
+        get_denylist().add_account(account_id, now, expires_at)
+
+
+def refresh_tokens(refresh_token):
+    """Exchange a refresh token for a new token pair.
+
+    Refresh tokens are single-use: the one presented is revoked. Inactive accounts cannot refresh, which bounds how
+    long a deactivated user keeps access to the access token lifetime.
+    """
+    from apps.users.models import UserAccount
+
+    claims = decode_token(refresh_token, token_type=REFRESH)
+    if not UserAccount.objects.filter(pk=claims["sub"], is_active=True).exists():
+        raise TokenError("Account is inactive")
+    if not revoke_token(claims):
+        raise TokenError("Token has been revoked")
+    return issue_tokens(claims["sub"])
+
+
+class TokenUser:
+    """A stand-in for `UserAccount` built from verified token claims.
+
+    Exposes the primary key without a database query. The profile is loaded on first access only.
+    """
+
+    is_authenticated = True
+    is_anonymous = False
+    is_active = True
+
+    def __init__(self, claims):
+        self.claims = claims
+        self.pk = self.id = int(claims["sub"])
+
+    def __str__(self):
+        return f"TokenUser {self.pk}"
+
+    @cached_property
+    def profile(self):
+        """The user's Profile, whose primary key is the account id."""
+        from apps.core.models import Profile
+
+        return Profile.objects.get(pk=self.pk)
+
+    @cached_property
+    def is_staff(self):
+        """Whether the account is staff, which makes it a moderator. Loaded on first access only."""
+        from apps.users.models import UserAccount
+
+        return UserAccount.objects.filter(pk=self.pk, is_staff=True).exists()
+
+
+class AuthBearer(HttpBearer):
+    """Bearer token authentication that never touches the session table or the password hasher."""
+
+    def authenticate(self, request, token):
+        """Authenticate the bearer token, exposing the caller as `request.user` and `request.auth`."""
+        try:
+            claims = decode_token(token)
+        except TokenError:
+            return None
+        request.user = TokenUser(claims)
+        return request.user
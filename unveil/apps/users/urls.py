@@ -1,28 +1,28 @@
 """URLs for the unveil users app."""
 
-from datetime import datetime, timedelta
+from typing import Optional
 
-import jwt
+from apps.core.deletion import request_deletion
+from apps.core.models import DeletionJob
+from apps.core.throttling import TokenBucketThrottle
 from apps.users.models import UserAccount
-from django.conf import settings
+from apps.users.tokens import REFRESH, AuthBearer, TokenError, decode_token, issue_tokens, refresh_tokens, revoke_token
 from django.contrib.auth import authenticate
+from django.db import transaction
 from ninja import Form, Router
-from ninja.security import HttpBearer, django_auth
+from ninja.security import django_auth
 
 urlpatterns = []
 
 router = Router()
 
 
-@router.post("/account/create")
+@router.post("/account/create", throttle=TokenBucketThrottle("account_create"))
 def create_account(request, given_name: str, given_password: str, given_email: str):
     """Create a new user account and associated Profile."""
-    from apps.core.models import Profile
-
     try:
-        account = UserAccount.objects.create_user(name=given_name, password=given_password, email=given_email)
-        Profile.objects.create(account=account)
-    except Exception as e:
+        UserAccount.objects.create_account(email=given_email, name=given_name, password=given_password)
+    except ValueError as e:
         return {"error": str(e)}
     return {"success": True}
 
@@ -33,39 +33,58 @@ def test_user(request):
     return f"Authenticated user {request.auth} with UUID {request.auth.uuid}"
 
 
-def create_token(user):
-    """Create a JWT token for the user."""
-    payload = {"user_id": user.id, "exp": datetime.utcnow() + timedelta(days=1), "iat": datetime.utcnow()}
-    return jwt.encode(payload, settings.SECRET_KEY, algorithm="HS256")
-
-
-class AuthBearer(HttpBearer):
-    """Bearer token authentication class."""
-
-    def authenticate(self, request, token):
-        """Authenticate the bearer token."""
-        try:
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
-            user_id = payload.get("user_id")
-            if user_id:
-                return user_id
-        except jwt.PyJWTError:
-            pass
-        return None
-
-
 @router.get("/bearer", auth=AuthBearer())
 def bearer(request):
     """Test the bearer token."""
-    return {"token": request.auth}
+    return {"user_id": request.auth.pk}
 
 
-@router.post("/account/login")
+@router.post("/account/login", throttle=TokenBucketThrottle("login"))
 def login(request, email: Form[str], password: Form[str]):
     """Login to the user account."""
     user = authenticate(request, email=email, password=password)
 
     if user is not None:
-        token = create_token(user)
-        return {"token": token}
+        return issue_tokens(user.pk)
     return {"error": "Invalid credentials"}
+
+
+@router.post("/account/refresh")
+def refresh(request, refresh_token: Form[str]):
+    """Exchange a refresh token for a new access/refresh token pair."""
+    try:
+        return refresh_tokens(refresh_token)
+    except TokenError as e:
+        return {"error": str(e)}
+
+
+@router.post("/account/logout", auth=AuthBearer())
+def logout(request, refresh_token: Form[Optional[str]] = None):
+    """Revoke the current access token and, if given, the refresh token."""
+    revoke_token(request.auth.claims)
+    if refresh_token:
+        try:
+            claims = decode_token(refresh_token, token_type=REFRESH)
+        except TokenError:
+            claims = None
+        if claims and claims["sub"] == request.auth.claims["sub"]:
+            revoke_token(claims)
+    return {"success": True}
+
+
+@router.post("/account/delete", auth=AuthBearer())
+def delete_account(request, password: Form[str]):
+    """Delete the account, its profile and everything it owns.
+
+    The account is deactivated and signed out and its artworks hidden at once; the data is deleted in the background.
+    Poll `/deletion/status` with the returned `job_uuid` to follow progress.
+    """
+    account = UserAccount.objects.filter(pk=request.auth.pk, is_active=True).first()
+    if account is None or not account.check_password(password):
+        return {"success": False, "error": "Invalid credentials"}
+
+    with transaction.atomic():
+        UserAccount.objects.set_active([account.pk], False)
+        job = request_deletion(DeletionJob.Kind.ACCOUNT, account.pk, requested_by=account.pk)
+    revoke_token(request.auth.claims)
+    return {"success": True, "job_uuid": job.uuid}
@@ -3,6 +3,9 @@ ASGI config for unveil project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+HTTP goes to Django. Django does not serve WebSockets, so those go to the live counter channel in
+``apps.core.live`` instead.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
@@ -11,6 +14,15 @@ import os
 
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault("DJANGO_SETTINGS_MODULE", "unveil.settings")
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "unveil.settings.dev")
+
+django_application = get_asgi_application()
+
+# Models can only be imported once Django is set up.
+from apps.core.live import websocket_application  # noqa: E402
+
 
-application = get_asgi_application()
+async def application(scope, receive, send):
+    if scope["type"] == "websocket":
+        return await websocket_application(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -0,0 +1 @@
+"""Settings profiles for the unveil project; see `unveil.settings.base`."""
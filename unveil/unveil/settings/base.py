@@ -0,0 +1,310 @@
+"""
+Django settings shared by every profile of the unveil project.
+
+Pick a profile with DJANGO_SETTINGS_MODULE: unveil.settings.dev (the default), unveil.settings.test or
+unveil.settings.prod. Each one starts from these settings, and every value that differs between deployments is read
+from the environment (or a .env file) here.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/5.1/topics/settings/
+
+For the full list of settings and their values, see
+https://docs.djangoproject.com/en/5.1/ref/settings/
+"""
+
+from datetime import timedelta
+from pathlib import Path
+
+from environs import Env
+
+# Build paths inside the project like this: BASE_DIR / 'subdir'.
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+
+env = Env()
+env.read_env(str(BASE_DIR / ".env"))
+
+# SECURITY WARNING: keep the secret key used in production secret! The production profile refuses this default.
+SECRET_KEY = env("SECRET_KEY", "django-insecure--e#7n97pz*7joqoxutn&gi(7+d*4)$9-3w@yqy_2rgcov&kd00")
+
+# SECURITY WARNING: don't run with debug turned on in production! Only the development profile turns it on.
+DEBUG = False
+
+ALLOWED_HOSTS = env.list("ALLOWED_HOSTS", ["*"])
+
+
+# Application definition
+
+INSTALLED_APPS = [
+    # Admin modules are discovered when the URLconf loads (see unveil/urls.py), not at startup.
+    "django.contrib.admin.apps.SimpleAdminConfig",
+    "django.contrib.auth",
+    "django.contrib.contenttypes",
+    "django.contrib.sessions",
+    "django.contrib.messages",
+    "django.contrib.staticfiles",
+    "corsheaders",
+    "apps.users",
+    "apps.core",
+]
+
+MIDDLEWARE = [
+    "django.middleware.security.SecurityMiddleware",
+    "django.contrib.sessions.middleware.SessionMiddleware",
+    "corsheaders.middleware.CorsMiddleware",
+    "django.middleware.common.CommonMiddleware",
+    "django.middleware.csrf.CsrfViewMiddleware",
+    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "django.contrib.messages.middleware.MessageMiddleware",
+    "django.middleware.clickjacking.XFrameOptionsMiddleware",
+]
+
+ROOT_URLCONF = "unveil.urls"
+
+TEMPLATES = [
+    {
+        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "DIRS": [],
+        "APP_DIRS": True,
+        "OPTIONS": {
+            "context_processors": [
+                "django.template.context_processors.debug",
+                "django.template.context_processors.request",
+                "django.contrib.auth.context_processors.auth",
+                "django.contrib.messages.context_processors.messages",
+            ],
+        },
+    },
+]
+
+WSGI_APPLICATION = "unveil.wsgi.application"
+
+
+# Database
+# https://docs.djangoproject.com/en/5.1/ref/settings/#databases
+
+USE_PLATFORMSH = env.bool("USE_PLATFORMSH", False)
+
+if not USE_PLATFORMSH:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": env("POSTGRES_DB", "postgres"),
+            "USER": env("POSTGRES_USER", "postgres"),
+            "PASSWORD": env("POSTGRES_PASSWORD", "postgres"),
+            "HOST": env("HOST", "localhost"),
+            "PORT": env("PORT", "25432"),
+        }
+    }
+else:
+    from platformshconfig import Config
+
+    config = Config()
+    credentials = config.credentials("database")
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": credentials["path"],
+            "USER": credentials["username"],
+            "PASSWORD": credentials["password"],
+            "HOST": credentials["host"],
+        }
+    }
+
+
+# Password validation
+# https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
+
+AUTH_PASSWORD_VALIDATORS = [
+    {
+        "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
+    },
+    {
+        "NAME": "django.contrib.auth.password_validation.MinimumLengthValidator",
+    },
+    {
+        "NAME": "django.contrib.auth.password_validation.CommonPasswordValidator",
+    },
+    {
+        "NAME": "django.contrib.auth.password_validation.NumericPasswordValidator",
+    },
+]
+
+AUTH_USER_MODEL = "users.UserAccount"
+
+# Password hashing profiles. The first hasher in the list hashes new passwords; the rest only verify existing hashes
+# (and upgrade them on login). "argon2" is the fastest profile that is safe for production. "insecure" is for tests
+# and benchmarks only.
+
+PASSWORD_HASHER_PROFILES = {
+    "default": [
+        "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+        "apps.users.hashers.TunedArgon2PasswordHasher",
+    ],
+    "argon2": [
+        "apps.users.hashers.TunedArgon2PasswordHasher",
+        "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+    ],
+    "insecure": [
+        "django.contrib.auth.hashers.MD5PasswordHasher",
+        "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+        "apps.users.hashers.TunedArgon2PasswordHasher",
+    ],
+}
+PASSWORD_HASHERS = PASSWORD_HASHER_PROFILES[env("PASSWORD_HASHER_PROFILE", "default")]
+
+
+# Internationalization
+# https://docs.djangoproject.com/en/5.1/topics/i18n/
+
+LANGUAGE_CODE = "en-us"
+
+TIME_ZONE = "UTC"
+
+USE_I18N = True
+
+USE_TZ = True
+
+
+# Static files (CSS, JavaScript, Images)
+# https://docs.djangoproject.com/en/5.1/howto/static-files/
+
+STATIC_URL = "static/"
+# Where collectstatic gathers them, and where Platform.sh serves /static from.
+STATIC_ROOT = BASE_DIR / "static"
+
+# Media files
+MEDIA_URL = "media/"
+MEDIA_ROOT = BASE_DIR / "media"
+
+# Default primary key field type
+# https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
+
+DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+CSRF_TRUSTED_ORIGINS = [
+    "http://localhost:61245",
+]
+CORS_ORIGIN_ALLOW_ALL = True
+
+
+# Logging
+# Everything at LOG_LEVEL or above goes to the console. Django's default configuration only logs to the console with
+# DEBUG on, which would leave production errors unlogged.
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "plain": {"format": "{asctime} {levelname} {name}: {message}", "style": "{"},
+    },
+    "handlers": {
+        "console": {"class": "logging.StreamHandler", "formatter": "plain"},
+    },
+    "root": {"handlers": ["console"], "level": env("LOG_LEVEL", "INFO")},
+}
+
+
+# Redis
+# Required in production. When unset, features that can use Redis fall back to in-process backends.
+
+REDIS_URL = env("REDIS_URL", "")
+
+
+# Caching
+# Shared through Redis when it is configured. The local-memory fallback is per process, so cache invalidation only
+# reaches the worker that made the change; use it for development only.
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+
+# Maximum entries in the in-process tag cache used when Redis is not configured (see apps/core/caching.py).
+TAG_CACHE_MAX_ENTRIES = env.int("TAG_CACHE_MAX_ENTRIES", 10_000)
+
+
+# Background jobs
+# Without Redis, jobs run on a local in-process broker; JOBS_EAGER runs them inline as soon as they are enqueued. The
+# development and test profiles turn it on.
+
+JOBS_EAGER = env.bool("JOBS_EAGER", False)
+JOBS_IDEMPOTENCY_TTL = env.int("JOBS_IDEMPOTENCY_TTL", 24 * 60 * 60)
+
+
+# Feeds
+# The random feed favours artists with less exposure, as rolled up from views (see apps/core/exposure.py). Rollups
+# run at most once per EXPOSURE_ROLLUP_INTERVAL seconds after views come in, and skip the newest
+# EXPOSURE_ROLLUP_LAG seconds of views so none are missed while their transactions commit.
+
+FEED_BOOST_UNDEREXPOSED = env.bool("FEED_BOOST_UNDEREXPOSED", True)
+
+# Feeds are served from per-profile queues of upcoming artworks (see apps/core/feeds.py), refilled in the background
+# to FEED_QUEUE_SIZE once a page leaves fewer than FEED_QUEUE_LOW_WATER, at most once per FEED_QUEUE_REFILL_INTERVAL
+# seconds.
+FEED_QUEUE_SIZE = env.int("FEED_QUEUE_SIZE", 50)
+FEED_QUEUE_LOW_WATER = env.int("FEED_QUEUE_LOW_WATER", 15)
+FEED_QUEUE_REFILL_INTERVAL = env.int("FEED_QUEUE_REFILL_INTERVAL", 5)
+EXPOSURE_ROLLUP_INTERVAL = env.int("EXPOSURE_ROLLUP_INTERVAL", 60)
+EXPOSURE_ROLLUP_LAG = env.int("EXPOSURE_ROLLUP_LAG", 5)
+
+# Follow graph
+# Mutuals, suggestions and follower overlap are read from an in-memory snapshot of the follow graph (see
+# apps/core/graph.py), refreshed with the latest follows at most once per GRAPH_REFRESH_INTERVAL seconds and rebuilt
+# every GRAPH_REBUILD_INTERVAL seconds. Follow changes from the last GRAPH_CHANGE_LAG seconds are read again by the
+# next refresh, so none are missed while their transactions commit.
+GRAPH_REFRESH_INTERVAL = env.int("GRAPH_REFRESH_INTERVAL", 30)
+GRAPH_REBUILD_INTERVAL = env.int("GRAPH_REBUILD_INTERVAL", 3600)
+GRAPH_CHANGE_LAG = env.int("GRAPH_CHANGE_LAG", 5)
+
+# Notifications
+# Comments, likes and follows within NOTIFICATION_COALESCE_WINDOW seconds are counted on one notification. Events
+# wait in an outbox for up to NOTIFICATION_FLUSH_INTERVAL seconds so that bursts are written together (see
+# apps/core/notifications.py). The event stream is pushed changes to the unread count through the live channel, and
+# closes after NOTIFICATION_STREAM_TIMEOUT seconds, when clients reconnect.
+NOTIFICATION_COALESCE_WINDOW = env.int("NOTIFICATION_COALESCE_WINDOW", 60 * 60)
+NOTIFICATION_FLUSH_INTERVAL = env.int("NOTIFICATION_FLUSH_INTERVAL", 2)
+NOTIFICATION_STREAM_TIMEOUT = env.int("NOTIFICATION_STREAM_TIMEOUT", 5 * 60)
+
+
+# Live counters
+# Like, dislike, view and comment deltas are pushed to the connections watching an artwork every LIVE_PUSH_INTERVAL
+# seconds (see apps/core/live.py). A connection may watch up to LIVE_MAX_SUBSCRIPTIONS artworks, and is told to
+# fetch its counts again once LIVE_MAX_QUEUED messages are waiting for it.
+LIVE_PUSH_INTERVAL = env.int("LIVE_PUSH_INTERVAL", 1)
+LIVE_MAX_SUBSCRIPTIONS = env.int("LIVE_MAX_SUBSCRIPTIONS", 100)
+LIVE_MAX_QUEUED = env.int("LIVE_MAX_QUEUED", 200)
+
+
+# JSON Web Tokens
+# Tokens are signed with the key named by JWT_ACTIVE_KID. To rotate, add a new key, make it active, and drop the old
+# one once every token signed with it has expired.
+
+JWT_SIGNING_KEYS = env.dict("JWT_SIGNING_KEYS", {"default": SECRET_KEY})
+JWT_ACTIVE_KID = env("JWT_ACTIVE_KID", "default")
+JWT_ACCESS_TOKEN_LIFETIME = timedelta(minutes=env.int("JWT_ACCESS_TOKEN_MINUTES", 15))
+JWT_REFRESH_TOKEN_LIFETIME = timedelta(days=env.int("JWT_REFRESH_TOKEN_DAYS", 30))
+
+
+# Rate limiting
+# Token-bucket rates for throttled API routes, as "<requests>/<s|m|h|d>". Override any of them with e.g.
+# THROTTLE_RATES=login=5/m,artwork_create=20/h
+
+THROTTLE_RATES = {
+    "account_create": "5/h",
+    "login": "10/m",
+    "artwork_create": "20/h",
+    "comment_create": "30/m",
+    "events_batch": "60/m",
+    "report_create": "20/h",
+    **env.dict("THROTTLE_RATES", {}),
+}
@@ -0,0 +1,11 @@
+"""Settings for local development: DEBUG on, and the development tools from requirements-dev.txt installed."""
+
+from unveil.settings.base import *  # noqa: F401, F403
+from unveil.settings.base import INSTALLED_APPS, env
+
+DEBUG = True
+
+INSTALLED_APPS = [*INSTALLED_APPS, "django_extensions"]
+
+# Without Redis, run background jobs inline rather than needing a worker.
+JOBS_EAGER = env.bool("JOBS_EAGER", True)
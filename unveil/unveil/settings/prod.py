@@ -0,0 +1,62 @@
+"""Settings for production.
+
+DEBUG is off, which among other things stops Django keeping every query it runs in memory. On top of the shared
+settings, everything shared between workers goes through Redis, database connections are kept open between requests,
+sessions are read from the cache, and responses are compressed. Templates need nothing here: Django already keeps
+them compiled through the cached template loader.
+"""
+
+from django.core.exceptions import ImproperlyConfigured
+
+from unveil.settings.base import *  # noqa: F401, F403
+from unveil.settings.base import DATABASES, MIDDLEWARE, USE_PLATFORMSH, env
+
+if USE_PLATFORMSH:
+    from urllib.parse import urlsplit
+
+    from platformshconfig import Config
+
+    platform = Config()
+    default_secret_key = platform.projectEntropy
+    default_hosts = sorted({urlsplit(url).hostname for url in platform.get_upstream_routes(platform.applicationName)})
+    redis = platform.credentials("redis")
+    default_redis_url = f"redis://{redis['host']}:{redis['port']}"
+else:
+    default_secret_key = None
+    default_hosts = []
+    default_redis_url = ""
+
+# SECURITY WARNING: keep the secret key used in production secret!
+SECRET_KEY = env("SECRET_KEY", default_secret_key)
+if not SECRET_KEY:
+    raise ImproperlyConfigured("Set SECRET_KEY for production")
+JWT_SIGNING_KEYS = env.dict("JWT_SIGNING_KEYS", {"default": SECRET_KEY})
+
+ALLOWED_HOSTS = env.list("ALLOWED_HOSTS", default_hosts)
+if not ALLOWED_HOSTS:
+    raise ImproperlyConfigured("Set ALLOWED_HOSTS for production")
+
+# Every worker must share the caches and their tag versions, feed queues, token revocations, rate limits and jobs,
+# which only Redis does; the in-process fallbacks would leave each worker with its own.
+REDIS_URL = env("REDIS_URL", default_redis_url)
+if not REDIS_URL:
+    raise ImproperlyConfigured("Set REDIS_URL for production")
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": REDIS_URL,
+    }
+}
+
+# Reuse each worker's database connection for up to CONN_MAX_AGE seconds instead of opening one per request, checking
+# it is still alive before each request that reuses it. Under ASGI every request may run on a fresh thread, and so
+# open its own connection; set CONN_MAX_AGE=0 there, or put a pooler in front of the database.
+DATABASES["default"]["CONN_MAX_AGE"] = env.int("CONN_MAX_AGE", 10 * 60)
+DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+
+# Only the admin uses sessions. Read them from the cache, falling back to the database, which every write also goes to.
+SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+
+# Compress responses, with Brotli where the client accepts it (see apps/core/compression.py). First, so that it sees
+# the response last.
+MIDDLEWARE = ["apps.core.compression.CompressionMiddleware", *MIDDLEWARE]
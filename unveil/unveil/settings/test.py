@@ -0,0 +1,24 @@
+"""Settings for running the test suite: fast password hashing, jobs run inline, and nothing shared through Redis."""
+
+from unveil.settings.base import *  # noqa: F401, F403
+from unveil.settings.base import PASSWORD_HASHER_PROFILES
+
+PASSWORD_HASHERS = PASSWORD_HASHER_PROFILES["insecure"]
+
+# Tests must not see each other's cache entries, jobs or rate limits, so every backend stays in process.
+REDIS_URL = ""
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+JOBS_EAGER = True
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "root": {"handlers": ["console"], "level": "WARNING"},
+}
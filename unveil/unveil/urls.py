@@ -16,6 +16,7 @@ Including another URLconf
 """
 
 from apps.core.urls import router as core_router
+from apps.core.views import artwork_live, notification_stream
 from apps.users.urls import router as users_router
 from django.conf import settings
 from django.conf.urls.static import static
@@ -23,6 +24,9 @@ from django.contrib import admin
 from django.urls import path
 from ninja import NinjaAPI
 
+# Deferred from startup by SimpleAdminConfig; workers only pay for the admin modules once they route a request.
+admin.autodiscover()
+
 api = NinjaAPI(csrf=False)
 
 api.add_router("", core_router)
@@ -30,6 +34,8 @@ api.add_router("", users_router)
 
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("notifications/stream", notification_stream),
+    path("artwork/live", artwork_live),
     path("", api.urls),
 ]
 